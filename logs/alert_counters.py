@@ -0,0 +1,203 @@
+"""
+Alert Counters Module
+Materialised alert counts by zone × severity, overall and per minute/hour/day
+bucket. Counters follow the alert store by row ID: they are caught up after each
+write batch, snapshotted to disk with the last row they cover, and caught up from
+that row on startup, so dashboard statistics are dictionary lookups instead of
+log scans.
+"""
+
+import os
+import json
+import threading
+import logging
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = {"minute": 60, "hour": 3600, "day": 86400}
+
+# Finer buckets are only kept for recent history
+DEFAULT_BUCKET_RETENTION = {"minute": 2 * 86400, "hour": 90 * 86400, "day": None}
+
+
+class AlertCounters:
+    """Zone × severity × time-bucket alert counters."""
+
+    def __init__(self, snapshot_path: str, bucket_retention: Optional[Dict[str, Optional[float]]] = None):
+        """
+        Initialize alert counters.
+
+        Args:
+            snapshot_path: JSON file the counters are persisted to
+            bucket_retention: Seconds of buckets kept per granularity (None = forever)
+        """
+        self.snapshot_path = snapshot_path
+        self.bucket_retention = {**DEFAULT_BUCKET_RETENTION, **(bucket_retention or {})}
+        self.last_id = 0
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.totals: Dict[str, Dict[str, int]] = {}
+        self.buckets: Dict[str, Dict[Tuple[int, str], Dict[str, int]]] = {g: {} for g in GRANULARITIES}
+
+    def _add(self, zone_id: str, severity: str, ts: Optional[float]) -> None:
+        severity = severity or 'MEDIUM'
+        zone_counts = self.totals.setdefault(zone_id, {})
+        zone_counts[severity] = zone_counts.get(severity, 0) + 1
+        if ts is None:
+            return
+        for granularity, width in GRANULARITIES.items():
+            key = (int(ts // width * width), zone_id)
+            counts = self.buckets[granularity].setdefault(key, {})
+            counts[severity] = counts.get(severity, 0) + 1
+
+    def zone_totals(self, zone_id: str) -> Dict[str, int]:
+        """All-time counts per severity for a zone."""
+        with self._lock:
+            return dict(self.totals.get(zone_id, {}))
+
+    def series(self, zone_id: str, granularity: str, start_ts: float, end_ts: float) -> List[Dict[str, Any]]:
+        """
+        Per-bucket counts for a zone between two times.
+
+        Args:
+            zone_id: Zone identifier
+            granularity: 'minute', 'hour' or 'day'
+            start_ts: Range start (epoch seconds)
+            end_ts: Range end (epoch seconds)
+
+        Returns:
+            List of {"bucket": start epoch seconds, "counts": {severity: n}}, one per bucket
+        """
+        width = GRANULARITIES[granularity]
+        bucket = int(start_ts // width * width)
+        series = []
+        with self._lock:
+            buckets = self.buckets[granularity]
+            while bucket <= end_ts:
+                series.append({"bucket": bucket, "counts": dict(buckets.get((bucket, zone_id), {}))})
+                bucket += width
+        return series
+
+    def prune(self, now: float) -> None:
+        """Drop buckets older than their granularity's retention."""
+        with self._lock:
+            for granularity, keep in self.bucket_retention.items():
+                if keep is None:
+                    continue
+                horizon = now - keep
+                buckets = self.buckets[granularity]
+                for key in [key for key in buckets if key[0] < horizon]:
+                    del buckets[key]
+
+    def persist(self) -> None:
+        """Atomically write a snapshot of the counters."""
+        with self._lock:
+            snapshot = {
+                "version": 1,
+                "last_id": self.last_id,
+                "totals": self.totals,
+                "buckets": {
+                    granularity: [[start, zone_id, counts] for (start, zone_id), counts in buckets.items()]
+                    for granularity, buckets in self.buckets.items()
+                }
+            }
+            data = json.dumps(snapshot, separators=(",", ":"))
+
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+    def load(self) -> bool:
+        """
+        Load the snapshot, if there is a readable one.
+
+        Returns:
+            True if counters were restored
+        """
+        if not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with open(self.snapshot_path, "r") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable counter snapshot {self.snapshot_path}: {e}")
+            return False
+
+        with self._lock:
+            self._reset()
+            self.last_id = snapshot.get("last_id", 0)
+            self.totals = snapshot.get("totals", {})
+            for granularity, rows in snapshot.get("buckets", {}).items():
+                if granularity in self.buckets:
+                    self.buckets[granularity] = {(start, zone_id): counts for start, zone_id, counts in rows}
+        return True
+
+    def rebuild(self, alerts: Iterable[Tuple[int, str, str, float]]) -> None:
+        """Recount from scratch from (row_id, zone_id, severity, ts) alerts."""
+        with self._lock:
+            self._reset()
+            self.last_id = 0
+        self.catch_up(alerts)
+
+    def add_archived(self, alerts: Iterable[Tuple[str, str, Optional[float]]]) -> int:
+        """
+        Count (zone_id, severity, ts) alerts that live outside the store (archives).
+
+        Returns:
+            Number of alerts counted
+        """
+        counted = 0
+        with self._lock:
+            for zone_id, severity, ts in alerts:
+                if zone_id is not None:
+                    self._add(zone_id, severity, ts)
+                    counted += 1
+        return counted
+
+    def catch_up(self, alerts: Iterable[Tuple[int, str, str, float]]) -> int:
+        """
+        Count (row_id, zone_id, severity, ts) alerts newer than the snapshot.
+
+        Returns:
+            Number of alerts counted
+        """
+        counted = 0
+        with self._lock:
+            for row_id, zone_id, severity, ts in alerts:
+                if row_id <= self.last_id:
+                    continue
+                self.last_id = row_id
+                if zone_id is None:
+                    continue
+                self._add(zone_id, severity, ts)
+                counted += 1
+        return counted
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    counters = AlertCounters(os.path.join(tempfile.mkdtemp(), "alert_counters.json"))
+    base = 1769594400  # 2026-01-28T10:00:00Z
+    severities = ["LOW", "MEDIUM", "HIGH", "CRITICAL"]
+    counters.catch_up(
+        (i + 1, f"ZONE_{'AB'[i % 2]}", severities[i % 4], base + i * 7) for i in range(100000)
+    )
+    counters.persist()
+
+    start = time.perf_counter()
+    for _ in range(10000):
+        counters.zone_totals("ZONE_A")
+    print(f"✓ Zone totals in {(time.perf_counter() - start) / 10000 * 1e6:.2f}µs: {counters.zone_totals('ZONE_A')}")
+
+    restored = AlertCounters(counters.snapshot_path)
+    restored.load()
+    print(f"✓ Restored snapshot covers row {restored.last_id}")
+    print(f"✓ First hours of ZONE_B: {restored.series('ZONE_B', 'hour', base, base + 2 * 3600)}")
@@ -0,0 +1,230 @@
+"""
+Alert Store Module
+Indexed SQLite store behind AlertLogger's query methods. Every record written to
+the alert log is mirrored here, so zone and severity lookups are index seeks over
+the full retained history instead of scans of the log files.
+"""
+
+import json
+import sqlite3
+import threading
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    record_id TEXT,
+    kind TEXT NOT NULL,
+    zone_id TEXT,
+    severity TEXT,
+    ts REAL,
+    body TEXT NOT NULL,
+    UNIQUE (kind, record_id)
+);
+CREATE INDEX IF NOT EXISTS idx_records_zone ON records (zone_id, id);
+CREATE INDEX IF NOT EXISTS idx_records_ts ON records (ts);
+CREATE INDEX IF NOT EXISTS idx_records_zone_severity ON records (zone_id, severity);
+"""
+
+LOG_SEPARATOR = ' - INFO - '
+
+
+def parse_timestamp(value: Any) -> Optional[float]:
+    """
+    Convert an ISO timestamp (naive values are UTC) to epoch seconds.
+
+    Args:
+        value: ISO 8601 string, optionally ending in 'Z'
+
+    Returns:
+        Epoch seconds, or None if the value isn't a valid timestamp
+    """
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def record_kind(record: Dict[str, Any]) -> str:
+    """'feedback' for feedback entries, 'alert' for everything else."""
+    return 'feedback' if record.get('action') == 'FEEDBACK_RECORDED' else 'alert'
+
+
+class AlertStore:
+    """SQLite (WAL mode) index of alert and feedback records."""
+
+    def __init__(self, db_path: str):
+        """
+        Initialize alert store.
+
+        Args:
+            db_path: SQLite database file
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: commits don't fsync, a crash can only lose the last transactions
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM records LIMIT 1").fetchone() is None
+
+    @staticmethod
+    def _row(record: Dict[str, Any], body: Optional[str] = None, ts: Optional[float] = None) -> tuple:
+        kind = record_kind(record)
+        record_id = record.get('feedback_id') if kind == 'feedback' else record.get('alert_id')
+        return (
+            record_id,
+            kind,
+            record.get('zone_id'),
+            record.get('severity'),
+            ts if ts is not None else parse_timestamp(record.get('timestamp')),
+            body if body is not None else json.dumps(record)
+        )
+
+    def add(self, record: Dict[str, Any], body: Optional[str] = None) -> None:
+        """
+        Index one record.
+
+        Args:
+            record: Alert or feedback entry as written to the alert log
+            body: Its serialized JSON (avoids re-encoding)
+        """
+        self.add_many([(record, body)])
+
+    def add_many(self, records: Iterable[tuple]) -> int:
+        """
+        Index (record, body) or (record, body, epoch ts) tuples in one
+        transaction; duplicates are ignored.
+
+        Returns:
+            Number of records inserted
+        """
+        rows = [
+            self._row(item[0], item[1] if len(item) > 1 else None, ts=item[2] if len(item) > 2 else None)
+            for item in records
+        ]
+        with self._lock:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO records (record_id, kind, zone_id, severity, ts, body) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self.conn.commit()
+            return self.conn.total_changes - before
+
+    def by_zone(self, zone_id: str) -> List[Dict[str, Any]]:
+        """All records for a zone in write order."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT body FROM records WHERE zone_id = ? ORDER BY id", (zone_id,)
+            ).fetchall()
+        return [json.loads(body) for (body,) in rows]
+
+    def by_time_range(self, start_ts: float, end_ts: float) -> List[Dict[str, Any]]:
+        """Records with start_ts <= timestamp <= end_ts (epoch seconds), in write order."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT body FROM records WHERE ts BETWEEN ? AND ? ORDER BY id", (start_ts, end_ts)
+            ).fetchall()
+        return [json.loads(body) for (body,) in rows]
+
+    def count_by_severity(self, zone_id: str) -> Dict[str, int]:
+        """Alert counts per severity for a zone (feedback records excluded)."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT severity, COUNT(*) FROM records WHERE zone_id = ? AND kind = 'alert' "
+                "GROUP BY severity", (zone_id,)
+            ).fetchall()
+        return {severity: count for severity, count in rows}
+
+    def max_id(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM records").fetchone()[0]
+
+    def alerts_after(self, row_id: int) -> List[Tuple[int, str, str, float]]:
+        """(row_id, zone_id, severity, ts) of alert records after row_id, in row order."""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT id, zone_id, severity, ts FROM records WHERE id > ? AND kind = 'alert' ORDER BY id",
+                (row_id,)
+            ).fetchall()
+
+    def backfill(self, records: Iterable[tuple]) -> int:
+        """
+        Index existing (record, body) pairs, e.g. when the store is first created.
+
+        Returns:
+            Number of records inserted
+        """
+        inserted = 0
+        batch = []
+        for pair in records:
+            batch.append(pair)
+            if len(batch) >= 5000:
+                inserted += self.add_many(batch)
+                batch = []
+        inserted += self.add_many(batch)
+        logger.info(f"Backfilled {inserted} records into {self.db_path}")
+        return inserted
+
+    def delete_before(self, cutoff_ts: float) -> int:
+        """
+        Remove records older than cutoff_ts (epoch seconds), e.g. after retention.
+
+        Returns:
+            Number of records removed
+        """
+        with self._lock:
+            deleted = self.conn.execute("DELETE FROM records WHERE ts < ?", (cutoff_ts,)).rowcount
+            self.conn.commit()
+        return deleted
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+    import time
+
+    logging.basicConfig(level=logging.INFO)
+
+    store = AlertStore(os.path.join(tempfile.mkdtemp(), "alerts.db"))
+    zones = ["ZONE_A", "ZONE_B", "ZONE_C", "ZONE_D"]
+    records = [
+        ({
+            'alert_id': f'ALT-{i}',
+            'zone_id': zones[i % 4],
+            'severity': ['LOW', 'MEDIUM', 'HIGH', 'CRITICAL'][i % 3],
+            'timestamp': datetime.fromtimestamp(1769596200 + i, tz=timezone.utc).isoformat(),
+            'status': 'LOGGED'
+        }, None)
+        for i in range(200000)
+    ]
+    store.add_many(records)
+
+    start = time.perf_counter()
+    zone_a = store.by_zone("ZONE_A")
+    print(f"✓ {len(zone_a)} ZONE_A records in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    start = time.perf_counter()
+    window = store.by_time_range(1769596200 + 1000, 1769596200 + 1600)
+    print(f"✓ {len(window)} records in a 10-minute window in {(time.perf_counter() - start) * 1000:.2f}ms")
+    print(f"✓ Severity breakdown: {store.count_by_severity('ZONE_A')}")
@@ -0,0 +1,382 @@
+"""
+Archive Module
+Compressed columnar archive for aged alert history and feedback.
+
+Each archive file stores one batch of records column by column:
+    magic    4s   b"COLA"
+    hdr_len  u32  length of the JSON header
+    header        JSON: row count, time range, codec and per-column
+                  {name, encoding, offset, length, dictionary}
+    blobs         one compressed blob per column
+
+Encodings:
+    float  array of float64 (NaN = missing); `int` columns decode back to ints
+    dict   uint16 codes into a dictionary of repeated values (zone IDs,
+           severities, feedback types, ...)
+    json   JSON list of values, for everything else
+
+Queries read the header, skip files whose time range doesn't overlap, then
+decompress only the filter columns and the columns asked for.
+"""
+
+import os
+import io
+import json
+import fcntl
+import lzma
+import math
+import zlib
+import time
+import struct
+import logging
+from array import array
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Tuple
+
+from alert_store import parse_timestamp
+from segmented_log import SEGMENT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"COLA"
+HEADER_LEN = struct.Struct("<I")
+
+TIME_COLUMN = "_ts"
+MAX_DICTIONARY = 65535
+
+CODECS = {
+    "lzma": (lambda data: lzma.compress(data, preset=6), lzma.decompress),
+    "zlib": (lambda data: zlib.compress(data, 9), zlib.decompress),
+}
+
+
+def _encode_column(values: List[Any]) -> Tuple[str, bytes, Optional[List[Any]]]:
+    """Pick an encoding for one column: (encoding, raw bytes, dictionary)."""
+    present = [v for v in values if v is not None]
+    if present and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        floats = array("d", (math.nan if v is None else float(v) for v in values))
+        if all(isinstance(v, float) for v in present):
+            return "float", floats.tobytes(), None
+        # Ints are only stored as floats when they survive the round trip
+        if all(isinstance(v, int) and abs(v) < 2 ** 53 for v in present):
+            return "int", floats.tobytes(), None
+
+    if all(isinstance(v, str) or v is None for v in values):
+        dictionary: Dict[Any, int] = {}
+        codes = array("H")
+        for v in values:
+            code = dictionary.get(v)
+            if code is None:
+                if len(dictionary) >= MAX_DICTIONARY:
+                    break
+                code = dictionary[v] = len(dictionary)
+            codes.append(code)
+        else:
+            # Dictionary encoding only pays off for repeated values
+            if len(dictionary) <= max(16, len(values) // 4):
+                return "dict", codes.tobytes(), list(dictionary)
+
+    return "json", json.dumps(values, separators=(",", ":")).encode("utf-8"), None
+
+
+def write_archive(path: str, records: List[Dict[str, Any]], timestamps: List[float], codec: str = "lzma") -> int:
+    """
+    Write records to a columnar archive file.
+
+    Args:
+        path: Output file (written atomically)
+        records: Records to archive
+        timestamps: Epoch time of each record (the time column)
+        codec: 'lzma' or 'zlib'
+
+    Returns:
+        Size of the archive in bytes
+    """
+    compress, _ = CODECS[codec]
+
+    names: List[str] = []
+    seen = set()
+    for record in records:
+        for key in record:
+            if key not in seen:
+                seen.add(key)
+                names.append(key)
+
+    columns = [(TIME_COLUMN, list(timestamps))] + [(name, [r.get(name) for r in records]) for name in names]
+
+    blobs = []
+    column_meta = []
+    offset = 0
+    for name, values in columns:
+        encoding, raw, dictionary = _encode_column(values)
+        blob = compress(raw)
+        column_meta.append({
+            "name": name, "encoding": encoding, "offset": offset,
+            "length": len(blob), "dictionary": dictionary
+        })
+        blobs.append(blob)
+        offset += len(blob)
+
+    header = json.dumps({
+        "version": 1,
+        "rows": len(records),
+        "codec": codec,
+        "min_ts": min(timestamps) if timestamps else None,
+        "max_ts": max(timestamps) if timestamps else None,
+        "columns": column_meta
+    }, separators=(",", ":")).encode("utf-8")
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(HEADER_LEN.pack(len(header)))
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+class ArchiveReader:
+    """Column-selective reader for one archive file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(4) != MAGIC:
+                raise ValueError(f"Not a columnar archive: {path}")
+            (header_len,) = HEADER_LEN.unpack(f.read(HEADER_LEN.size))
+            self.header = json.loads(f.read(header_len))
+        self.data_offset = 4 + HEADER_LEN.size + header_len
+        self.columns = {c["name"]: c for c in self.header["columns"]}
+        self._decompress = CODECS[self.header["codec"]][1]
+        self._cache: Dict[str, List[Any]] = {}
+
+    @property
+    def rows(self) -> int:
+        return self.header["rows"]
+
+    def overlaps(self, start_ts: Optional[float], end_ts: Optional[float]) -> bool:
+        if not self.rows:
+            return False
+        if start_ts is not None and self.header["max_ts"] < start_ts:
+            return False
+        if end_ts is not None and self.header["min_ts"] > end_ts:
+            return False
+        return True
+
+    def column(self, name: str) -> List[Any]:
+        """Decode one column (None for every row if the column doesn't exist)."""
+        if name in self._cache:
+            return self._cache[name]
+        meta = self.columns.get(name)
+        if meta is None:
+            return [None] * self.rows
+
+        with open(self.path, "rb") as f:
+            f.seek(self.data_offset + meta["offset"])
+            raw = self._decompress(f.read(meta["length"]))
+
+        if meta["encoding"] in ("float", "int"):
+            floats = array("d")
+            floats.frombytes(raw)
+            cast = int if meta["encoding"] == "int" else float
+            values = [None if math.isnan(v) else cast(v) for v in floats]
+        elif meta["encoding"] == "dict":
+            codes = array("H")
+            codes.frombytes(raw)
+            dictionary = meta["dictionary"]
+            values = [dictionary[c] for c in codes]
+        else:
+            values = json.loads(raw)
+
+        self._cache[name] = values
+        return values
+
+
+def archive_files(archive_dir: str, prefix: str) -> List[str]:
+    """Archive files for a dataset ('alerts' or 'feedback'), oldest first."""
+    if not os.path.isdir(archive_dir):
+        return []
+    return sorted(
+        os.path.join(archive_dir, name) for name in os.listdir(archive_dir)
+        if name.startswith(prefix + "-") and name.endswith(".col")
+    )
+
+
+def query_archive(
+    paths: Iterable[str],
+    zone_id: Optional[str] = None,
+    start_ts: Optional[float] = None,
+    end_ts: Optional[float] = None,
+    severity: Optional[str] = None,
+    columns: Optional[List[str]] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield archived records matching the filters.
+
+    Args:
+        paths: Archive files to search
+        zone_id: Only this zone
+        start_ts: Only records at or after this epoch time
+        end_ts: Only records at or before this epoch time
+        severity: Only this severity
+        columns: Fields to return (None = full records); only these and the
+                 filter columns are decompressed
+
+    Yields:
+        Record dicts (missing fields omitted)
+    """
+    for path in paths:
+        reader = ArchiveReader(path)
+        if not reader.overlaps(start_ts, end_ts):
+            continue
+
+        selected = range(reader.rows)
+        if start_ts is not None or end_ts is not None:
+            ts = reader.column(TIME_COLUMN)
+            lo = -math.inf if start_ts is None else start_ts
+            hi = math.inf if end_ts is None else end_ts
+            selected = [i for i in selected if lo <= ts[i] <= hi]
+        for name, wanted in (("zone_id", zone_id), ("severity", severity)):
+            if wanted is not None and selected:
+                values = reader.column(name)
+                selected = [i for i in selected if values[i] == wanted]
+        if not selected:
+            continue
+
+        names = columns if columns is not None else [c for c in reader.columns if c != TIME_COLUMN]
+        decoded = [(name, reader.column(name)) for name in names]
+        for i in selected:
+            yield {name: values[i] for name, values in decoded if values[i] is not None}
+
+
+def _archive_path(archive_dir: str, prefix: str, first_ts: float, last_ts: float) -> str:
+    """`<prefix>-<first hour>-<last hour>[.n].col`, never reusing an existing name."""
+    first = time.strftime("%Y%m%d%H", time.gmtime(first_ts))
+    last = time.strftime("%Y%m%d%H", time.gmtime(last_ts))
+    path = os.path.join(archive_dir, f"{prefix}-{first}-{last}.col")
+    n = 1
+    while os.path.exists(path):
+        path = os.path.join(archive_dir, f"{prefix}-{first}-{last}.{n}.col")
+        n += 1
+    return path
+
+
+def archive_segments(segment_log: Any, archive_dir: str, cutoff_ts: float, codec: str = "lzma") -> Dict[str, int]:
+    """
+    Move alert segments ending at or before cutoff_ts into archive files, one per UTC day.
+
+    Args:
+        segment_log: SegmentedLog holding the alert history
+        archive_dir: Directory for archive files
+        cutoff_ts: Segments entirely older than this epoch time are archived
+        codec: 'lzma' or 'zlib'
+
+    Returns:
+        Counts of archived segments, rows and bytes before/after
+    """
+    result = {"segments": 0, "rows": 0, "bytes_before": 0, "bytes_after": 0}
+    days: Dict[int, List[Tuple[int, str]]] = {}
+    for start, path in segment_log.segments():
+        if start + SEGMENT_SECONDS <= cutoff_ts:
+            days.setdefault(start // 86400, []).append((start, path))
+    if not days:
+        return result
+
+    os.makedirs(archive_dir, exist_ok=True)
+    for day in sorted(days):
+        aged = days[day]
+        records, timestamps = [], []
+        for ts, body in segment_log.iter_records([path for _, path in aged]):
+            records.append(json.loads(body))
+            timestamps.append(ts)
+
+        path = _archive_path(archive_dir, segment_log.prefix, aged[0][0], aged[-1][0])
+        result["bytes_before"] += sum(os.path.getsize(p) for _, p in aged)
+        result["bytes_after"] += write_archive(path, records, timestamps, codec)
+        result["segments"] += len(aged)
+        result["rows"] += len(records)
+
+        # Only drop the segments once their archive is safely on disk
+        segment_log.delete_before(aged[-1][0] + SEGMENT_SECONDS)
+        logger.info(f"Archived {len(aged)} segment(s), {len(records)} records into {path}")
+
+    return result
+
+
+def archive_feedback(feedback_file: str, archive_dir: str, cutoff_ts: float, codec: str = "lzma") -> Dict[str, int]:
+    """
+    Move feedback records older than cutoff_ts from a JSONL file into an archive.
+
+    The remaining records are written back atomically.
+
+    Returns:
+        Counts of archived rows and bytes before/after
+    """
+    result = {"rows": 0, "bytes_before": 0, "bytes_after": 0}
+    if not os.path.exists(feedback_file):
+        return result
+
+    aged, timestamps = [], []
+    kept = io.StringIO()
+    aged_bytes = 0
+    with open(feedback_file, "r") as f:
+        # Same lock FeedbackStore writers take, so no append lands between
+        # reading the file and replacing it
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                kept.write(line)
+                continue
+            ts = parse_timestamp(record.get("timestamp"))
+            if ts is not None and ts < cutoff_ts:
+                aged.append(record)
+                timestamps.append(ts)
+                aged_bytes += len(line.encode("utf-8"))
+            else:
+                kept.write(line)
+        if not aged:
+            return result
+
+        os.makedirs(archive_dir, exist_ok=True)
+        path = _archive_path(archive_dir, "feedback", min(timestamps), max(timestamps))
+        result["bytes_after"] = write_archive(path, aged, timestamps, codec)
+        result["bytes_before"] = aged_bytes
+        result["rows"] = len(aged)
+
+        tmp_path = feedback_file + ".tmp"
+        with open(tmp_path, "w") as out:
+            out.write(kept.getvalue())
+        os.replace(tmp_path, feedback_file)
+    logger.info(f"Archived {len(aged)} feedback records into {path}")
+    return result
+
+
+def main() -> None:
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Archive aged alert segments and feedback")
+    parser.add_argument("--logs-dir", default="./logs")
+    parser.add_argument("--older-than-hours", type=float, default=24 * 7)
+    parser.add_argument("--codec", choices=sorted(CODECS), default="lzma")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from logging_system import AlertLogger
+
+    logging.basicConfig(level=logging.INFO)
+    alert_logger = AlertLogger(args.logs_dir)
+    result = alert_logger.archive(args.older_than_hours, codec=args.codec)
+    alert_logger.close()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Audit Export Module
+Streams the audit trail (alerts joined with their feedback) to NDJSON or JSON in
+a single pass over the alert history, in constant memory.
+
+Feedback is indexed by alert_id in a temporary on-disk SQLite table first (one
+pass over feedback.jsonl and feedback archives); alerts are then streamed from
+the archive and the hot segments and written out with their feedback attached.
+"""
+
+import os
+import gzip
+import json
+import lzma
+import sqlite3
+import tempfile
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional, Iterator, Iterable, TextIO
+
+import archive
+from alert_store import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+FEEDBACK_ACTION = 'FEEDBACK_RECORDED'
+
+
+def open_output(path: str, compression: Optional[str] = None) -> TextIO:
+    """
+    Open an export file for text writing.
+
+    Args:
+        path: Output path
+        compression: 'gzip', 'lzma' or None; inferred from a .gz/.xz suffix when None
+    """
+    if compression is None:
+        if path.endswith(".gz"):
+            compression = "gzip"
+        elif path.endswith(".xz"):
+            compression = "lzma"
+    if compression == "gzip":
+        return gzip.open(path, "wt", encoding="utf-8")
+    if compression == "lzma":
+        return lzma.open(path, "wt", encoding="utf-8")
+    return open(path, "w", encoding="utf-8")
+
+
+class FeedbackIndex:
+    """Temporary on-disk alert_id → feedback index for the join."""
+
+    def __init__(self, work_dir: Optional[str] = None):
+        handle, self.path = tempfile.mkstemp(suffix=".db", prefix="audit-feedback-", dir=work_dir)
+        os.close(handle)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=OFF")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute(
+            "CREATE TABLE feedback (seq INTEGER PRIMARY KEY, alert_id TEXT, zone_id TEXT, ts REAL, body TEXT)"
+        )
+        self.count = 0
+
+    def add_all(self, records: Iterable[Dict[str, Any]]) -> None:
+        batch = []
+        for record in records:
+            batch.append((record.get('alert_id'), record.get('zone_id'),
+                          parse_timestamp(record.get('timestamp')), json.dumps(record)))
+            if len(batch) >= 5000:
+                self._insert(batch)
+                batch = []
+        self._insert(batch)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_alert ON feedback (alert_id)")
+        self.conn.commit()
+
+    def _insert(self, batch) -> None:
+        self.conn.executemany("INSERT INTO feedback (alert_id, zone_id, ts, body) VALUES (?, ?, ?, ?)", batch)
+        self.count += len(batch)
+
+    def for_alert(self, alert_id: Optional[str]) -> list:
+        if alert_id is None:
+            return []
+        rows = self.conn.execute("SELECT body FROM feedback WHERE alert_id = ? ORDER BY seq", (alert_id,))
+        return [json.loads(body) for (body,) in rows]
+
+    def in_scope(
+        self,
+        zone_id: Optional[str],
+        start_ts: Optional[float],
+        end_ts: Optional[float]
+    ) -> Iterator[Dict[str, Any]]:
+        query = "SELECT body FROM feedback WHERE 1 = 1"
+        params = []
+        if zone_id is not None:
+            query += " AND zone_id = ?"
+            params.append(zone_id)
+        if start_ts is not None:
+            query += " AND ts >= ?"
+            params.append(start_ts)
+        if end_ts is not None:
+            query += " AND ts <= ?"
+            params.append(end_ts)
+        for (body,) in self.conn.execute(query + " ORDER BY seq", params):
+            yield json.loads(body)
+
+    def close(self) -> None:
+        self.conn.close()
+        os.remove(self.path)
+
+
+def _read_feedback_file(path: str) -> Iterator[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return
+    with open(path, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(record, dict):
+                yield record
+
+
+def iter_alerts(
+    segment_log: Any,
+    archive_dir: str,
+    zone_id: Optional[str] = None,
+    start_ts: Optional[float] = None,
+    end_ts: Optional[float] = None
+) -> Iterator[Dict[str, Any]]:
+    """Alerts from the archive, then the hot segments, oldest first."""
+    archived = archive.query_archive(
+        archive.archive_files(archive_dir, segment_log.prefix),
+        zone_id=zone_id, start_ts=start_ts, end_ts=end_ts
+    )
+    for record in archived:
+        if record.get('action') != FEEDBACK_ACTION:
+            yield record
+
+    if start_ts is not None or end_ts is not None:
+        records = segment_log.read_range(
+            float("-inf") if start_ts is None else start_ts,
+            float("inf") if end_ts is None else end_ts
+        )
+    else:
+        records = segment_log.iter_records()
+    for _, body in records:
+        record = json.loads(body)
+        if record.get('action') == FEEDBACK_ACTION:
+            continue
+        if zone_id is None or record.get('zone_id') == zone_id:
+            yield record
+
+
+def export_audit_trail(
+    output_file: str,
+    segment_log: Any,
+    archive_dir: str,
+    feedback_file: str,
+    zone_id: Optional[str] = None,
+    start_time: Optional[str] = None,
+    end_time: Optional[str] = None,
+    fmt: Optional[str] = None,
+    compression: Optional[str] = None
+) -> Dict[str, int]:
+    """
+    Stream alerts with their feedback to output_file.
+
+    Args:
+        output_file: Output path
+        segment_log: SegmentedLog with the hot alert history
+        archive_dir: Columnar archive directory
+        feedback_file: FeedbackStore's feedback.jsonl
+        zone_id: Optional zone filter
+        start_time: Optional ISO format start time
+        end_time: Optional ISO format end time
+        fmt: 'ndjson' or 'json'; inferred from the file name when None
+        compression: 'gzip', 'lzma' or None (inferred from .gz/.xz)
+
+    NDJSON output is a header line, one {"type": "alert", ...} line per alert
+    with a "feedback" list, one {"type": "feedback", ...} line per feedback
+    record in scope and a summary line. JSON output has the same content as
+    {"exported_at", "zone_id", "alerts": [...], "feedback": [...], "summary"},
+    written incrementally.
+
+    Returns:
+        Counts of exported alerts and feedback records
+    """
+    if fmt is None:
+        base = output_file[:-3] if output_file.endswith((".gz", ".xz")) else output_file
+        fmt = "ndjson" if base.endswith((".ndjson", ".jsonl")) else "json"
+    if fmt not in ("ndjson", "json"):
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    start_ts = parse_timestamp(start_time) if start_time else None
+    end_ts = parse_timestamp(end_time) if end_time else None
+    header = {
+        'exported_at': datetime.utcnow().isoformat() + "Z",
+        'zone_id': zone_id,
+        'start_time': start_time,
+        'end_time': end_time
+    }
+    summary = {'alerts': 0, 'feedback': 0, 'alerts_with_feedback': 0}
+
+    index = FeedbackIndex(os.path.dirname(os.path.abspath(output_file)))
+    try:
+        index.add_all(_read_feedback_file(feedback_file))
+        index.add_all(archive.query_archive(archive.archive_files(archive_dir, "feedback")))
+
+        with open_output(output_file, compression) as out:
+            if fmt == "ndjson":
+                out.write(json.dumps({'type': 'header', **header}) + "\n")
+            else:
+                out.write(json.dumps(header)[:-1] + ', "alerts": [\n')
+
+            separator = ""
+            for alert in iter_alerts(segment_log, archive_dir, zone_id, start_ts, end_ts):
+                alert['feedback'] = index.for_alert(alert.get('alert_id'))
+                summary['alerts'] += 1
+                if alert['feedback']:
+                    summary['alerts_with_feedback'] += 1
+                if fmt == "ndjson":
+                    out.write(json.dumps({'type': 'alert', **alert}, default=str) + "\n")
+                else:
+                    out.write(separator + json.dumps(alert, default=str))
+                    separator = ",\n"
+
+            if fmt == "json":
+                out.write('\n], "feedback": [\n')
+            separator = ""
+            for feedback in index.in_scope(zone_id, start_ts, end_ts):
+                summary['feedback'] += 1
+                if fmt == "ndjson":
+                    out.write(json.dumps({'type': 'feedback', **feedback}, default=str) + "\n")
+                else:
+                    out.write(separator + json.dumps(feedback, default=str))
+                    separator = ",\n"
+
+            if fmt == "ndjson":
+                out.write(json.dumps({'type': 'summary', **summary}) + "\n")
+            else:
+                out.write('\n], "summary": ' + json.dumps(summary) + "}\n")
+    finally:
+        index.close()
+
+    logger.info(f"Exported {summary['alerts']} alerts and {summary['feedback']} feedback records to {output_file}")
+    return summary
@@ -0,0 +1,341 @@
+"""
+Log Tail Module
+Live follow API over the segmented alert log. A single reader thread tails the
+recent segments from remembered byte offsets, decodes each new record once and
+appends it to a shared ring buffer; any number of subscriptions consume the
+buffer from their own position, so a live view costs proportional to the new
+records rather than the history.
+
+Cursors are per-segment byte offsets (`<segment start>:<offset>,...`), so they
+stay valid across segment rollover and restarts. A subscription resumed from a
+cursor, or one that falls behind the ring buffer, catches up by reading the
+files directly from its offsets.
+"""
+
+import os
+import json
+import threading
+import logging
+from collections import deque
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+
+from segmented_log import SegmentedLog
+
+logger = logging.getLogger(__name__)
+
+
+def encode_cursor(offsets: Dict[int, int]) -> str:
+    """`<segment start>:<offset>,...` for a {segment start: byte offset} map."""
+    return ",".join(f"{start}:{offset}" for start, offset in sorted(offsets.items()))
+
+
+def decode_cursor(cursor: str) -> Dict[int, int]:
+    """Inverse of encode_cursor; raises ValueError for malformed cursors."""
+    offsets = {}
+    for part in cursor.split(","):
+        if part:
+            start, offset = part.split(":")
+            offsets[int(start)] = int(offset)
+    return offsets
+
+
+def _read_lines(path: str, begin: int, end: int) -> List[bytes]:
+    """Complete segment lines between two byte offsets (a torn final line is left out)."""
+    with open(path, "rb") as f:
+        f.seek(begin)
+        data = f.read(end - begin)
+    lines = data.split(b"\n")
+    return lines[:-1]
+
+
+def _decode(line: bytes) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(line.split(b"\t", 1)[1])
+    except (IndexError, ValueError):
+        return None
+
+
+class Subscription:
+    """One consumer's position in the tail, with an optional zone filter."""
+
+    def __init__(self, tailer: "LogTailer", offsets: Dict[int, int], seq: int,
+                 zone_id: Optional[str], backlog: List[Dict[str, Any]]):
+        self._tailer = tailer
+        self.offsets = offsets
+        self.seq = seq
+        self.zone_id = zone_id
+        self._backlog = backlog
+        self.closed = False
+
+    @property
+    def cursor(self) -> str:
+        """Resumable position: pass to AlertLogger.follow(cursor=...) later."""
+        return encode_cursor(self.offsets)
+
+    def poll(self, timeout: Optional[float] = None, max_records: int = 1000) -> List[Dict[str, Any]]:
+        """
+        New records since the last poll, waiting up to timeout seconds for some.
+
+        Args:
+            timeout: Seconds to wait when nothing is pending (None = don't wait)
+            max_records: Maximum records returned
+
+        Returns:
+            Record dicts in log order (shared between subscribers; don't mutate)
+        """
+        if self._backlog:
+            records, self._backlog = self._backlog[:max_records], self._backlog[max_records:]
+            return records
+        return self._tailer._consume(self, timeout, max_records)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Block and yield records until the subscription or tailer is closed."""
+        while not self.closed and not self._tailer.closed:
+            for record in self.poll(timeout=1.0):
+                yield record
+
+    def close(self) -> None:
+        self.closed = True
+        self._tailer._unsubscribe(self)
+
+
+class LogTailer:
+    """Single reader over the newest segments fanning records out to subscriptions."""
+
+    def __init__(self, segment_log: SegmentedLog, poll_interval: float = 0.5, buffer_records: int = 10000):
+        """
+        Initialize log tailer.
+
+        Args:
+            segment_log: SegmentedLog to follow
+            poll_interval: Seconds between file checks when not notified by the writer
+            buffer_records: Records kept in the shared ring buffer
+        """
+        self.segment_log = segment_log
+        self.poll_interval = poll_interval
+        # (seq, segment start, end offset, record)
+        self._buffer: deque = deque(maxlen=buffer_records)
+        self._next_seq = 0
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._subscriptions: List[Subscription] = []
+        self.closed = False
+
+        # Start at the current end of the segments that can still receive records
+        self._offsets: Dict[int, int] = {
+            start: os.path.getsize(path)
+            for start, path in segment_log.segments()[-segment_log.max_open:]
+        }
+        # Segments older than this are no longer followed; newer unseen ones are read from 0
+        self._floor: Optional[int] = min(self._offsets) if self._offsets else None
+        self._reader = threading.Thread(target=self._reader_loop, name="alert-log-tail", daemon=True)
+        self._reader.start()
+
+    def notify(self) -> None:
+        """Called after a write so the reader picks it up without waiting for the poll."""
+        self._wake.set()
+
+    def subscribe(self, cursor: Optional[str] = None, zone_id: Optional[str] = None) -> Subscription:
+        """
+        Register a subscription.
+
+        Args:
+            cursor: Position from Subscription.cursor (None = only new records)
+            zone_id: Only deliver records for this zone
+
+        Returns:
+            Subscription to poll or iterate
+        """
+        with self._cond:
+            offsets = dict(self._offsets)
+            seq = self._next_seq
+        backlog = []
+        if cursor:
+            start_offsets = decode_cursor(cursor)
+            backlog = [
+                record for _, _, record in self._read_between(start_offsets, offsets)
+                if zone_id is None or record.get('zone_id') == zone_id
+            ]
+        subscription = Subscription(self, offsets, seq, zone_id, backlog)
+        with self._cond:
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        with self._cond:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+            self._cond.notify_all()
+
+    def _read_between(
+        self, start: Dict[int, int], end: Dict[int, int]
+    ) -> Iterator[Tuple[int, int, Dict[str, Any]]]:
+        """
+        (segment start, end offset, record) from the `start` positions up to the
+        `end` positions (the reader's at some moment). Segments older than the
+        reader's are read to their end; newer ones are left to the reader.
+        """
+        first = min(start) if start else None
+        reader_first = min(end) if end else None
+        for segment_start, path in self.segment_log.segments():
+            if segment_start in end:
+                stop = end[segment_start]
+            elif reader_first is not None and segment_start < reader_first:
+                try:
+                    stop = os.path.getsize(path)
+                except FileNotFoundError:
+                    continue
+            else:
+                continue
+            if segment_start in start:
+                begin = start[segment_start]
+            elif first is not None and segment_start < first:
+                continue  # older than anything the cursor had seen
+            else:
+                begin = 0
+            if begin >= stop:
+                continue
+            try:
+                lines = _read_lines(path, begin, stop)
+            except FileNotFoundError:
+                continue  # removed by retention or archiving
+            offset = begin
+            for line in lines:
+                offset += len(line) + 1
+                record = _decode(line)
+                if record is not None:
+                    yield segment_start, offset, record
+
+    def _consume(self, subscription: Subscription, timeout: Optional[float], max_records: int) -> List[Dict[str, Any]]:
+        with self._cond:
+            if timeout and subscription.seq >= self._next_seq and not self.closed:
+                self._cond.wait_for(
+                    lambda: subscription.seq < self._next_seq or self.closed or subscription.closed, timeout
+                )
+            first_seq = self._buffer[0][0] if self._buffer else self._next_seq
+            if subscription.seq < first_seq:
+                # Fell behind the ring buffer: catch up from the files
+                lagging = True
+                target = dict(self._offsets)
+                target_seq = self._next_seq
+            else:
+                lagging = False
+                start = subscription.seq - first_seq
+                entries = [self._buffer[i] for i in range(start, min(len(self._buffer), start + max_records))]
+
+        if lagging:
+            records = [
+                record for _, _, record in self._read_between(subscription.offsets, target)
+                if subscription.zone_id is None or record.get('zone_id') == subscription.zone_id
+            ]
+            subscription.offsets = target
+            subscription.seq = target_seq
+            subscription._backlog = records[max_records:]
+            return records[:max_records]
+
+        records = []
+        for seq, segment_start, offset, record in entries:
+            subscription.seq = seq + 1
+            subscription.offsets[segment_start] = offset
+            if subscription.zone_id is None or record.get('zone_id') == subscription.zone_id:
+                records.append(record)
+        return records
+
+    def _reader_loop(self) -> None:
+        while not self.closed:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            if self.closed:
+                return
+            try:
+                self._read_new()
+            except Exception as e:
+                logger.error(f"Log tail read failed: {e}")
+
+    def _read_new(self) -> None:
+        """Read records appended since the last check into the ring buffer."""
+        self.segment_log.flush()
+        segments = self.segment_log.segments()
+        if not segments:
+            return
+        # Only this thread changes _offsets; the new positions are published
+        # together with the records they cover, so a snapshot taken under
+        # _cond never runs ahead of _next_seq
+        offsets = dict(self._offsets)
+        present = set()
+        new_entries = []
+        for segment_start, path in segments:
+            if self._floor is not None and segment_start < self._floor:
+                continue
+            present.add(segment_start)
+            begin = offsets.get(segment_start, 0)
+            try:
+                size = os.path.getsize(path)
+            except FileNotFoundError:
+                continue
+            if size < begin:
+                begin = size  # torn tail truncated on recovery
+            if size == begin:
+                offsets[segment_start] = begin
+                continue
+            offset = begin
+            # A partially written final line is left for the next read
+            for line in _read_lines(path, begin, size):
+                offset += len(line) + 1
+                record = _decode(line)
+                if record is not None:
+                    new_entries.append((segment_start, offset, record))
+            offsets[segment_start] = offset
+
+        # Forget segments that were deleted or are too old to receive records
+        keep = sorted(present)[-self.segment_log.max_open:]
+        with self._cond:
+            self._offsets = {start: offsets[start] for start in keep if start in offsets}
+            if keep:
+                self._floor = keep[0]
+            for segment_start, offset, record in new_entries:
+                self._buffer.append((self._next_seq, segment_start, offset, record))
+                self._next_seq += 1
+            if new_entries:
+                self._cond.notify_all()
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                'subscribers': len(self._subscriptions),
+                'buffered': len(self._buffer),
+                'records_read': self._next_seq
+            }
+
+    def close(self) -> None:
+        self.closed = True
+        self._wake.set()
+        with self._cond:
+            self._cond.notify_all()
+        self._reader.join(timeout=5)
+
+
+if __name__ == "__main__":
+    import time
+    import tempfile
+
+    log = SegmentedLog(tempfile.mkdtemp())
+    tailer = LogTailer(log, poll_interval=0.05)
+    subscribers = [tailer.subscribe(zone_id=None if i % 2 else "ZONE_A") for i in range(100)]
+
+    base = time.time()
+    log.append_many([
+        (json.dumps({"alert_id": f"ALT-{i}", "zone_id": f"ZONE_{'AB'[i % 2]}"}), base + i) for i in range(5000)
+    ])
+    tailer.notify()
+    received = [len(s.poll(timeout=2.0, max_records=10000)) for s in subscribers]
+    print(f"✓ 100 subscribers received {min(received)}–{max(received)} records from one reader")
+
+    cursor = subscribers[0].cursor
+    log.append_many([(json.dumps({"alert_id": "ALT-late", "zone_id": "ZONE_A"}), base + 3600)])
+    tailer.notify()
+    time.sleep(0.2)
+    resumed = tailer.subscribe(cursor=cursor)
+    print(f"✓ Resumed from cursor {cursor!r}: {[r['alert_id'] for r in resumed.poll()]}")
+    tailer.close()
+    log.close()
@@ -1,37 +1,233 @@
 """
 Logging System Module - ISHTA
 Maintains alert history with structured timestamps and persistence.
+Records are written to hourly alert segments (segmented_log.py) and indexed in
+an SQLite store (alert_store.py). Time-range queries read only the overlapping
+segments; zone queries use the store, and severity statistics come from
+counters maintained on write (alert_counters.py). Retention drops whole
+segments by age.
+
+Writes happen on a background thread: logging a record is an enqueue, and the
+writer commits whatever has queued up in one segment write and one SQLite
+transaction, fsyncing by interval or record count.
 """
 
 import logging
 import json
 import os
-from typing import Dict, Any, List, Optional
+import sys
+import time
+import queue
+import atexit
+import threading
+from typing import Dict, Any, List, Optional, Iterator, Tuple
 from datetime import datetime
 from logging.handlers import RotatingFileHandler
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from alert_store import AlertStore, parse_timestamp, LOG_SEPARATOR  # noqa: E402
+from segmented_log import SegmentedLog, SEGMENT_SECONDS  # noqa: E402
+from alert_counters import AlertCounters, GRANULARITIES  # noqa: E402
+import archive  # noqa: E402
+import audit_export  # noqa: E402
+from log_tail import LogTailer, Subscription  # noqa: E402
+
 
 class AlertLogger:
     """Structured logging system for alert history and audit trail."""
+
+    MAX_BYTES = 5 * 1024 * 1024
+    BACKUP_COUNT = 10
     
-    def __init__(self, logs_dir: str = "./logs"):
+    def __init__(
+        self,
+        logs_dir: str = "./logs",
+        retention_hours: Optional[float] = None,
+        background: bool = True,
+        queue_size: int = 10000,
+        batch_size: int = 512,
+        fsync_interval: float = 1.0,
+        fsync_batch: int = 1000,
+        counters_persist_interval: float = 30.0
+    ):
         """
         Initialize alert logger.
         
         Args:
             logs_dir: Directory for log files
+            retention_hours: Age after which alert segments are deleted
+                             by apply_retention() (None = keep forever)
+            background: Write from a background thread (False = write inline)
+            queue_size: Records buffered for the writer before new ones are dropped
+            batch_size: Maximum records committed per write
+            fsync_interval: Seconds between fsyncs while records are unsynced
+            fsync_batch: Unsynced records that force an fsync
+            counters_persist_interval: Seconds between counter snapshots
         """
         self.logs_dir = logs_dir
         self.alerts_log = f"{logs_dir}/alerts.log"
         self.errors_log = f"{logs_dir}/errors.log"
+        self.segments_dir = f"{logs_dir}/segments"
+        self.archive_dir = f"{logs_dir}/archive"
+        self.feedback_file = f"{logs_dir}/feedback.jsonl"
+        self.retention_hours = retention_hours
         
         # Create logs directory if it doesn't exist
         os.makedirs(logs_dir, exist_ok=True)
         
         # Setup loggers
-        self.alert_logger = self._setup_logger("alerts", self.alerts_log)
         self.error_logger = self._setup_logger("errors", self.errors_log)
         self.system_logger = logging.getLogger(__name__)
+
+        # Alert history: hourly segments, plus an index for zone/severity queries
+        self.segments = SegmentedLog(self.segments_dir)
+        if not self.segments.segments() and self.legacy_log_files():
+            self._migrate_legacy_logs()
+
+        self.store_path = f"{logs_dir}/alerts.db"
+        self.store = AlertStore(self.store_path)
+        if self.store.is_empty():
+            self.store.backfill(
+                (json.loads(body), body.decode("utf-8")) for _, body in self.segments.iter_records()
+            )
+
+        # Severity counters: restore the snapshot, then count what was written after it
+        self.counters = AlertCounters(f"{logs_dir}/alert_counters.json")
+        self.counters_persist_interval = counters_persist_interval
+        if not self.counters.load() or self.counters.last_id > self.store.max_id():
+            self._rebuild_counters()
+        else:
+            self.counters.catch_up(self.store.alerts_after(self.counters.last_id))
+        self._last_persist = time.monotonic()
+
+        self.batch_size = batch_size
+        self.fsync_interval = fsync_interval
+        self.fsync_batch = fsync_batch
+        self.writer_stats = {'written': 0, 'batches': 0, 'fsyncs': 0, 'dropped': 0, 'failed': 0}
+        self._stats_lock = threading.Lock()  # 'dropped' is counted on producer threads
+        self._unsynced = 0
+        self._last_fsync = time.monotonic()
+        self._closed = False
+        self._tailer: Optional[LogTailer] = None
+        self._queue: Optional[queue.Queue] = None
+        self._writer: Optional[threading.Thread] = None
+        if background:
+            self._queue = queue.Queue(maxsize=queue_size)
+            self._writer = threading.Thread(target=self._writer_loop, name="alert-log-writer", daemon=True)
+            self._writer.start()
+            atexit.register(self.close)
+
+    def legacy_log_files(self) -> List[str]:
+        """Size-rotated alerts.log and its backups from before segments, oldest first."""
+        backups = [f"{self.alerts_log}.{i}" for i in range(self.BACKUP_COUNT, 0, -1)]
+        return [path for path in backups + [self.alerts_log] if os.path.exists(path)]
+
+    def _migrate_legacy_logs(self) -> None:
+        """Copy records from the legacy rotating log into time segments."""
+        batch = []
+        for path in self.legacy_log_files():
+            for record, body in _read_legacy_log(path):
+                batch.append((body, parse_timestamp(record.get('timestamp'))))
+                if len(batch) >= 5000:
+                    self.segments.append_many(batch)
+                    batch = []
+        self.segments.append_many(batch)
+        self.system_logger.info(f"Migrated legacy alert logs into {self.segments_dir}")
+
+    def _submit(self, kind: str, entry: Dict[str, Any]) -> bool:
+        """Queue a record for the writer (or write it inline); False if dropped."""
+        if self._queue is None:
+            self._write_batch([(kind, entry)])
+            return True
+        try:
+            self._queue.put_nowait((kind, entry))
+            return True
+        except queue.Full:
+            self._count('dropped')
+            return False
+
+    def _writer_loop(self) -> None:
+        """Drain the queue in batches until the None sentinel arrives."""
+        while True:
+            try:
+                # Wake up while idle so unsynced records still get fsynced on time
+                timeout = self.fsync_interval if self._unsynced else None
+                batch = [self._queue.get(timeout=timeout)]
+            except queue.Empty:
+                self._fsync()
+                continue
+
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stopping = batch[-1] is None
+            records = batch[:-1] if stopping else batch
+            if records:
+                self._write_batch(records)
+            for _ in batch:
+                self._queue.task_done()
+            if stopping:
+                return
+
+    def _write_batch(self, items: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Append records to their segments, index them in one transaction, maybe fsync."""
+        try:
+            records = []
+            for kind, entry in items:
+                if kind == 'error':
+                    self.error_logger.error(json.dumps(entry))
+                else:
+                    records.append((entry, json.dumps(entry), parse_timestamp(entry.get('timestamp'))))
+
+            if records:
+                self.segments.append_many([(body, ts) for _, body, ts in records])
+                self.store.add_many(records)
+                self.counters.catch_up(self.store.alerts_after(self.counters.last_id))
+                self._count('written', len(records))
+                self._count('batches')
+                self._unsynced += len(records)
+                if self._tailer is not None:
+                    self._tailer.notify()
+
+            if self._unsynced >= self.fsync_batch or (
+                self._unsynced and time.monotonic() - self._last_fsync >= self.fsync_interval
+            ):
+                self._fsync()
+            if time.monotonic() - self._last_persist >= self.counters_persist_interval:
+                self._persist_counters()
+        except Exception as e:
+            self._count('failed', len(items))
+            self.system_logger.error(f"Failed to write {len(items)} log record(s): {str(e)}")
+
+    def _count(self, stat: str, n: int = 1) -> None:
+        with self._stats_lock:
+            self.writer_stats[stat] += n
+
+    def _fsync(self) -> None:
+        if self._unsynced:
+            self.segments.fsync()
+            self._count('fsyncs')
+            self._unsynced = 0
+        self._last_fsync = time.monotonic()
+
+    def _persist_counters(self) -> None:
+        self.counters.prune(time.time())
+        self.counters.persist()
+        self._last_persist = time.monotonic()
+
+    def flush(self) -> None:
+        """Wait until every queued record has been written."""
+        if self._queue is not None and self._writer.is_alive():
+            self._queue.join()
+
+    def get_writer_stats(self) -> Dict[str, int]:
+        """Background writer counters plus the current queue depth."""
+        depth = self._queue.qsize() if self._queue is not None else 0
+        with self._stats_lock:
+            return {**self.writer_stats, 'queue_depth': depth}
     
     @staticmethod
     def _setup_logger(name: str, log_file: str) -> logging.Logger:
@@ -51,8 +247,8 @@ class AlertLogger:
         # Rotating file handler (5MB per file, keep 10 backups)
         handler = RotatingFileHandler(
             log_file,
-            maxBytes=5 * 1024 * 1024,
-            backupCount=10
+            maxBytes=AlertLogger.MAX_BYTES,
+            backupCount=AlertLogger.BACKUP_COUNT
         )
         
         # JSON formatter for structured logging
@@ -65,15 +261,17 @@ class AlertLogger:
         
         return logger
     
-    def log_alert(self, alert: Dict[str, Any]) -> bool:
+    def log_alert(self, alert: Dict[str, Any], trace: Any = None) -> bool:
         """
-        Log alert to alerts.log with structured format.
+        Log alert to the alert history with structured format.
         
         Args:
             alert: Alert dictionary
+            trace: Sampled TraceContext of the alert's frame; handing the
+                record to the writer is recorded as its "logging" stage
             
         Returns:
-            Success flag
+            Success flag (False if the writer queue was full and it was dropped)
         """
         try:
             alert_entry = {
@@ -84,9 +282,14 @@ class AlertLogger:
                 'rule_results': alert.get('rule_results', {}),
                 'status': 'LOGGED'
             }
+            stage_timings = (alert.get('metadata') or {}).get('trace')
+            if stage_timings:
+                alert_entry['trace'] = stage_timings
             
-            self.alert_logger.info(json.dumps(alert_entry))
-            return True
+            queued = self._submit('alert', alert_entry)
+            if trace is not None:
+                trace.mark("logging")
+            return queued
         except Exception as e:
             self.error_logger.error(f"Failed to log alert: {str(e)}")
             return False
@@ -111,8 +314,7 @@ class AlertLogger:
                 'context': context or {}
             }
             
-            self.error_logger.error(json.dumps(error_entry))
-            return True
+            return self._submit('error', error_entry)
         except Exception as e:
             self.system_logger.error(f"Failed to log error: {str(e)}")
             return False
@@ -137,8 +339,7 @@ class AlertLogger:
                 'action': 'FEEDBACK_RECORDED'
             }
             
-            self.alert_logger.info(json.dumps(feedback_entry))
-            return True
+            return self._submit('feedback', feedback_entry)
         except Exception as e:
             self.error_logger.error(f"Failed to log feedback: {str(e)}")
             return False
@@ -155,20 +356,8 @@ class AlertLogger:
         """
         alerts = []
         try:
-            if not os.path.exists(self.alerts_log):
-                return alerts
-            
-            with open(self.alerts_log, 'r') as f:
-                for line in f:
-                    try:
-                        # Parse JSON from log line (after timestamp and level)
-                        if ' - INFO - ' in line:
-                            json_part = line.split(' - INFO - ', 1)[1]
-                            alert = json.loads(json_part)
-                            if alert.get('zone_id') == zone_id:
-                                alerts.append(alert)
-                    except json.JSONDecodeError:
-                        continue
+            self.flush()
+            alerts = self.store.by_zone(zone_id)
         except Exception as e:
             self.error_logger.error(f"Error retrieving alerts: {str(e)}")
         
@@ -191,26 +380,13 @@ class AlertLogger:
         """
         alerts = []
         try:
-            start_dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-            end_dt = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-            
-            if not os.path.exists(self.alerts_log):
-                return alerts
+            start_ts = parse_timestamp(start_time)
+            end_ts = parse_timestamp(end_time)
+            if start_ts is None or end_ts is None:
+                raise ValueError(f"Invalid time range: {start_time} - {end_time}")
             
-            with open(self.alerts_log, 'r') as f:
-                for line in f:
-                    try:
-                        if ' - INFO - ' in line:
-                            json_part = line.split(' - INFO - ', 1)[1]
-                            alert = json.loads(json_part)
-                            alert_time = datetime.fromisoformat(
-                                alert.get('timestamp', '').replace('Z', '+00:00')
-                            )
-                            
-                            if start_dt <= alert_time <= end_dt:
-                                alerts.append(alert)
-                    except (json.JSONDecodeError, ValueError):
-                        continue
+            self.flush()
+            alerts = [json.loads(body) for _, body in self.segments.read_range(start_ts, end_ts)]
         except Exception as e:
             self.error_logger.error(f"Error in time range query: {str(e)}")
         
@@ -228,47 +404,232 @@ class AlertLogger:
         """
         counts = {'LOW': 0, 'MEDIUM': 0, 'HIGH': 0, 'CRITICAL': 0}
         
-        for alert in self.retrieve_alerts_by_zone(zone_id):
-            severity = alert.get('severity', 'MEDIUM')
-            if severity in counts:
-                counts[severity] += 1
+        try:
+            self.flush()
+            for severity, count in self.counters.zone_totals(zone_id).items():
+                if severity in counts:
+                    counts[severity] += count
+        except Exception as e:
+            self.error_logger.error(f"Error counting alerts: {str(e)}")
         
         return counts
     
-    def export_audit_trail(self, output_file: str, zone_id: Optional[str] = None) -> bool:
+    def get_alert_counts_over_time(
+        self,
+        zone_id: str,
+        start_time: str,
+        end_time: str,
+        granularity: str = 'hour'
+    ) -> List[Dict[str, Any]]:
         """
-        Export audit trail (alerts + feedback) to JSON file.
+        Get per-bucket alert counts by severity for a zone.
         
         Args:
-            output_file: Output file path
-            zone_id: Optional zone filter
+            zone_id: Zone identifier
+            start_time: ISO format start time
+            end_time: ISO format end time
+            granularity: 'minute', 'hour' or 'day'
             
         Returns:
-            Success flag
+            List of {"bucket": ISO bucket start, "counts": {severity: n}}
         """
-        try:
-            audit_data = {
-                'exported_at': datetime.utcnow().isoformat() + "Z",
-                'zone_id': zone_id,
-                'alerts': [],
-                'feedback': []
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        start_ts = parse_timestamp(start_time)
+        end_ts = parse_timestamp(end_time)
+        if start_ts is None or end_ts is None:
+            raise ValueError(f"Invalid time range: {start_time} - {end_time}")
+        
+        self.flush()
+        return [
+            {
+                'bucket': datetime.utcfromtimestamp(row['bucket']).isoformat() + "Z",
+                'counts': row['counts']
             }
+            for row in self.counters.series(zone_id, granularity, start_ts, end_ts)
+        ]
+    
+    def apply_retention(self, now: Optional[float] = None) -> int:
+        """
+        Delete alert segments older than retention_hours and their index rows.
+        
+        Args:
+            now: Reference epoch time (defaults to now)
             
-            # Add alerts
-            if zone_id:
-                audit_data['alerts'] = self.retrieve_alerts_by_zone(zone_id)
+        Returns:
+            Number of segments deleted
+        """
+        if self.retention_hours is None:
+            return 0
+        cutoff = (time.time() if now is None else now) - self.retention_hours * 3600
+        self.flush()
+        deleted = self.segments.delete_before(cutoff)
+        if deleted:
+            # Only whole segments go, so drop index rows up to the segment
+            # boundary; rows of the kept segment stay queryable
+            self.store.delete_before(cutoff // SEGMENT_SECONDS * SEGMENT_SECONDS)
+            self._rebuild_counters()
+            self._persist_counters()
+        return len(deleted)
+    
+    def _rebuild_counters(self) -> None:
+        """Recount alerts from the store and the archive."""
+        self.counters.rebuild(self.store.alerts_after(0))
+        archived = archive.query_archive(
+            archive.archive_files(self.archive_dir, self.segments.prefix),
+            columns=['zone_id', 'severity', archive.TIME_COLUMN, 'action']
+        )
+        self.counters.add_archived(
+            (row.get('zone_id'), row.get('severity'), row.get(archive.TIME_COLUMN))
+            for row in archived if row.get('action') != 'FEEDBACK_RECORDED'
+        )
+    
+    def archive(self, older_than_hours: float, codec: str = "lzma") -> Dict[str, Any]:
+        """
+        Move alert segments and feedback older than older_than_hours into the
+        compressed columnar archive and drop them from the hot index.
+        
+        Args:
+            older_than_hours: Age at which history is archived
+            codec: 'lzma' (smaller) or 'zlib' (faster)
             
-            # Write export
-            with open(output_file, 'w') as f:
-                json.dump(audit_data, f, indent=2, default=str)
+        Returns:
+            Archived row and byte counts for alerts and feedback
+        """
+        cutoff = time.time() - older_than_hours * 3600
+        self.flush()
+        alerts = archive.archive_segments(self.segments, self.archive_dir, cutoff, codec)
+        if alerts['segments']:
+            # Rows covered by archived segments (whole hours before the cutoff)
+            self.store.delete_before(cutoff // SEGMENT_SECONDS * SEGMENT_SECONDS)
+        feedback = archive.archive_feedback(self.feedback_file, self.archive_dir, cutoff, codec)
+        return {'alerts': alerts, 'feedback': feedback}
+    
+    def query_archive(
+        self,
+        zone_id: Optional[str] = None,
+        start_time: Optional[str] = None,
+        end_time: Optional[str] = None,
+        severity: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+        dataset: str = 'alerts'
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Query archived history, decompressing only the columns needed.
+        
+        Args:
+            zone_id: Optional zone filter
+            start_time: Optional ISO format start time
+            end_time: Optional ISO format end time
+            severity: Optional severity filter
+            columns: Fields to return (None = full records)
+            dataset: 'alerts' or 'feedback'
             
-            self.system_logger.info(f"Audit trail exported to {output_file}")
+        Returns:
+            Iterator of matching records
+        """
+        return archive.query_archive(
+            archive.archive_files(self.archive_dir, dataset),
+            zone_id=zone_id,
+            start_ts=parse_timestamp(start_time) if start_time else None,
+            end_ts=parse_timestamp(end_time) if end_time else None,
+            severity=severity,
+            columns=columns
+        )
+    
+    def follow(self, cursor: Optional[str] = None, zone_id: Optional[str] = None) -> Subscription:
+        """
+        Subscribe to records as they are written, for live views.
+        
+        All subscriptions share one reader thread that tails the newest
+        segments; each poll returns only records after the subscription's
+        position. `subscription.cursor` can be saved and passed back here to
+        resume (e.g. after a dashboard restart) without gaps or rescans.
+        
+        Args:
+            cursor: Position from a previous subscription (None = new records only)
+            zone_id: Only deliver records for this zone
+            
+        Returns:
+            Subscription with poll(timeout) and blocking iteration
+        """
+        if self._tailer is None:
+            self._tailer = LogTailer(self.segments)
+        return self._tailer.subscribe(cursor=cursor, zone_id=zone_id)
+    
+    def close(self) -> None:
+        """Write out queued records, fsync and close segments and the store."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+        if self._tailer is not None:
+            self._tailer.close()
+        self._fsync()
+        self._persist_counters()
+        self.segments.close()
+        self.store.close()
+    
+    def export_audit_trail(
+        self,
+        output_file: str,
+        zone_id: Optional[str] = None,
+        start_time: Optional[str] = None,
+        end_time: Optional[str] = None,
+        fmt: Optional[str] = None,
+        compression: Optional[str] = None
+    ) -> bool:
+        """
+        Export audit trail (alerts + feedback) by streaming archived and live
+        history to NDJSON or JSON (see audit_export.py). Each alert carries the
+        feedback recorded for it.
+        
+        Args:
+            output_file: Output file path (.ndjson/.jsonl selects NDJSON,
+                         a .gz/.xz suffix selects compression)
+            zone_id: Optional zone filter (None = all zones)
+            start_time: Optional ISO format start time
+            end_time: Optional ISO format end time
+            fmt: 'ndjson' or 'json' (overrides the file name)
+            compression: 'gzip', 'lzma' or None (overrides the file name)
+            
+        Returns:
+            Success flag
+        """
+        try:
+            self.flush()
+            summary = audit_export.export_audit_trail(
+                output_file, self.segments, self.archive_dir, self.feedback_file,
+                zone_id=zone_id, start_time=start_time, end_time=end_time,
+                fmt=fmt, compression=compression
+            )
+            self.system_logger.info(
+                f"Audit trail exported to {output_file}: "
+                f"{summary['alerts']} alerts, {summary['feedback']} feedback records"
+            )
             return True
         except Exception as e:
             self.error_logger.error(f"Failed to export audit trail: {str(e)}")
             return False
 
 
+def _read_legacy_log(path: str) -> Iterator[Tuple[Dict[str, Any], str]]:
+    """(record, JSON text) pairs from a legacy `asctime - INFO - {json}` log file."""
+    with open(path, 'r') as f:
+        for line in f:
+            if LOG_SEPARATOR not in line:
+                continue
+            body = line.split(LOG_SEPARATOR, 1)[1].strip()
+            try:
+                record = json.loads(body)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(record, dict):
+                yield record, body
+
+
 # Example usage
 if __name__ == "__main__":
     # Setup logging for this script
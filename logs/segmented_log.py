@@ -0,0 +1,299 @@
+"""
+Segmented Log Module
+Time-partitioned append log: one segment per hour of record time, each with a
+sparse sidecar index of blocks (byte range + min/max timestamp). Time-range reads
+open only overlapping segments and seek straight to overlapping blocks; retention
+deletes whole segments.
+
+Segment lines are `<epoch seconds>\t<record JSON>\n`, so reads filter on time
+without decoding records.
+"""
+
+import os
+import time
+import calendar
+import threading
+import logging
+from typing import Dict, List, Optional, Iterator, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SECONDS = 3600
+
+
+class _OpenSegment:
+    """Append handle and current (unindexed) block of one segment."""
+
+    __slots__ = ("path", "index_path", "handle", "block_start", "block_count", "block_min", "block_max")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.handle = open(path, "ab")
+        self.block_start = self.handle.tell()
+        self.block_count = 0
+        self.block_min = float("inf")
+        self.block_max = float("-inf")
+
+
+class SegmentedLog:
+    """Hourly log segments with sparse (timestamp → byte offset) block indexes."""
+
+    def __init__(self, directory: str, prefix: str = "alerts", block_records: int = 128, max_open: int = 4):
+        """
+        Initialize segmented log.
+
+        Args:
+            directory: Directory holding segments and their .idx files
+            prefix: Segment file name prefix
+            block_records: Records per index entry
+            max_open: Segments kept open for appending (late records may
+                      land in older hours)
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.block_records = block_records
+        self.max_open = max_open
+        self._lock = threading.Lock()
+        self._open: Dict[int, _OpenSegment] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def segment_path(self, segment_start: int) -> str:
+        return os.path.join(
+            self.directory, f"{self.prefix}-{time.strftime('%Y%m%d%H', time.gmtime(segment_start))}.log"
+        )
+
+    def segments(self) -> List[Tuple[int, str]]:
+        """(segment start epoch seconds, path) for every segment, oldest first."""
+        found = []
+        for name in os.listdir(self.directory):
+            if not (name.startswith(self.prefix + "-") and name.endswith(".log")):
+                continue
+            stamp = name[len(self.prefix) + 1:-len(".log")]
+            try:
+                start = calendar.timegm(time.strptime(stamp, "%Y%m%d%H"))
+            except ValueError:
+                continue
+            found.append((start, os.path.join(self.directory, name)))
+        return sorted(found)
+
+    def append(self, body: str, ts: Optional[float] = None) -> None:
+        """
+        Append one serialized record.
+
+        Args:
+            body: JSON text of the record (no trailing newline)
+            ts: Record time in epoch seconds (None = now); selects the segment
+        """
+        self.append_many([(body, ts)])
+
+    def append_many(self, records: List[Tuple[str, Optional[float]]]) -> None:
+        """Append (body, ts) pairs, one write per segment touched."""
+        now = time.time()
+        by_segment: Dict[int, List[Tuple[bytes, float]]] = {}
+        for body, ts in records:
+            ts = now if ts is None else ts
+            start = int(ts // SEGMENT_SECONDS * SEGMENT_SECONDS)
+            by_segment.setdefault(start, []).append((f"{ts!r}\t{body}\n".encode("utf-8"), ts))
+
+        with self._lock:
+            for start, lines in by_segment.items():
+                segment = self._segment(start)
+                offset = segment.handle.tell()
+                index_lines = []
+                for line, ts in lines:
+                    offset += len(line)
+                    segment.block_count += 1
+                    if ts < segment.block_min:
+                        segment.block_min = ts
+                    if ts > segment.block_max:
+                        segment.block_max = ts
+                    if segment.block_count >= self.block_records:
+                        index_lines.append(self._close_block(segment, offset))
+                segment.handle.write(b"".join(line for line, _ in lines))
+                segment.handle.flush()
+                if index_lines:
+                    with open(segment.index_path, "a") as f:
+                        f.write("".join(index_lines))
+
+    @staticmethod
+    def _close_block(segment: _OpenSegment, end: int) -> str:
+        entry = f"{segment.block_start} {end} {segment.block_min!r} {segment.block_max!r}\n"
+        segment.block_start = end
+        segment.block_count = 0
+        segment.block_min = float("inf")
+        segment.block_max = float("-inf")
+        return entry
+
+    def _segment(self, start: int) -> _OpenSegment:
+        segment = self._open.get(start)
+        if segment is not None:
+            return segment
+
+        if len(self._open) >= self.max_open:
+            oldest = min(self._open)
+            self._seal(self._open.pop(oldest))
+
+        path = self.segment_path(start)
+        self._index_tail(path)
+        segment = self._open[start] = _OpenSegment(path)
+        return segment
+
+    def _seal(self, segment: _OpenSegment) -> None:
+        """Index the open block and close the handle."""
+        end = segment.handle.tell()
+        if segment.block_count:
+            with open(segment.index_path, "a") as f:
+                f.write(self._close_block(segment, end))
+        segment.handle.close()
+
+    def _index_tail(self, path: str) -> None:
+        """Index records past the last indexed block and drop a torn final line (crash recovery)."""
+        if not os.path.exists(path):
+            return
+        blocks = _load_index(path + ".idx")
+        indexed_end = blocks[-1][1] if blocks else 0
+        size = os.path.getsize(path)
+        if size <= indexed_end:
+            return
+
+        lo, hi = float("inf"), float("-inf")
+        end = indexed_end
+        with open(path, "rb") as f:
+            f.seek(indexed_end)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                end += len(line)
+                ts = _record_ts(line)
+                if ts is not None:
+                    lo, hi = min(lo, ts), max(hi, ts)
+        if end < size:
+            with open(path, "r+b") as f:
+                f.truncate(end)
+        if end > indexed_end:
+            if lo > hi:
+                lo = hi = 0.0
+            with open(path + ".idx", "a") as f:
+                f.write(f"{indexed_end} {end} {lo!r} {hi!r}\n")
+
+    def flush(self) -> None:
+        with self._lock:
+            for segment in self._open.values():
+                segment.handle.flush()
+
+    def fsync(self) -> None:
+        with self._lock:
+            for segment in self._open.values():
+                segment.handle.flush()
+                os.fsync(segment.handle.fileno())
+
+    def close(self) -> None:
+        with self._lock:
+            for segment in self._open.values():
+                self._seal(segment)
+            self._open.clear()
+
+    def read_range(self, start_ts: float, end_ts: float) -> Iterator[Tuple[float, bytes]]:
+        """
+        Yield (ts, record JSON) for records with start_ts <= ts <= end_ts.
+
+        Only segments overlapping the range are opened, and only index blocks
+        overlapping it (plus any unindexed tail) are read.
+        """
+        self.flush()
+        for segment_start, path in self.segments():
+            if segment_start + SEGMENT_SECONDS <= start_ts or segment_start > end_ts:
+                continue
+
+            blocks = _load_index(path + ".idx")
+            ranges = [(begin, end) for begin, end, lo, hi in blocks if hi >= start_ts and lo <= end_ts]
+            indexed_end = blocks[-1][1] if blocks else 0
+            ranges.append((indexed_end, None))
+
+            with open(path, "rb") as f:
+                for begin, end in ranges:
+                    f.seek(begin)
+                    data = f.read() if end is None else f.read(end - begin)
+                    for line in data.splitlines():
+                        ts = _record_ts(line)
+                        if ts is not None and start_ts <= ts <= end_ts:
+                            yield ts, line.split(b"\t", 1)[1]
+
+    def iter_records(self, segment_paths: Optional[List[str]] = None) -> Iterator[Tuple[float, bytes]]:
+        """(ts, record JSON) for every complete record, oldest segment first."""
+        self.flush()
+        paths = segment_paths if segment_paths is not None else [path for _, path in self.segments()]
+        for path in paths:
+            with open(path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    ts, _, body = line.partition(b"\t")
+                    yield float(ts), body.rstrip(b"\n")
+
+    def delete_before(self, cutoff_ts: float) -> List[str]:
+        """
+        Delete whole segments ending at or before cutoff_ts.
+
+        Returns:
+            Paths of deleted segments
+        """
+        deleted = []
+        with self._lock:
+            for segment_start, path in self.segments():
+                if segment_start + SEGMENT_SECONDS > cutoff_ts:
+                    break
+                segment = self._open.pop(segment_start, None)
+                if segment is not None:
+                    segment.handle.close()
+                for victim in (path, path + ".idx"):
+                    if os.path.exists(victim):
+                        os.remove(victim)
+                deleted.append(path)
+        if deleted:
+            logger.info(f"Retention removed {len(deleted)} segment(s) before {cutoff_ts}")
+        return deleted
+
+
+def _load_index(index_path: str) -> List[Tuple[int, int, float, float]]:
+    if not os.path.exists(index_path):
+        return []
+    blocks = []
+    with open(index_path, "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 4:
+                blocks.append((int(parts[0]), int(parts[1]), float(parts[2]), float(parts[3])))
+    return blocks
+
+
+def _record_ts(line: bytes) -> Optional[float]:
+    """Record time from a segment line's prefix."""
+    try:
+        return float(line[:line.index(b"\t")])
+    except ValueError:
+        return None
+
+
+if __name__ == "__main__":
+    import json
+    import tempfile
+
+    log = SegmentedLog(tempfile.mkdtemp())
+    base = 1769594400  # 2026-01-28T10:00:00Z
+    records = []
+    for i in range(50000):
+        ts = base + i * 0.5  # ~7 hours
+        records.append((json.dumps({"alert_id": f"ALT-{i}", "zone_id": "ZONE_A"}), ts))
+    log.append_many(records)
+
+    print(f"✓ {len(log.segments())} hourly segments")
+
+    start = time.perf_counter()
+    hits = list(log.read_range(base + 9000, base + 9600))
+    print(f"✓ {len(hits)} records in a 10-minute window in {(time.perf_counter() - start) * 1000:.2f}ms")
+
+    deleted = log.delete_before(base + 3 * SEGMENT_SECONDS)
+    print(f"✓ Retention deleted {len(deleted)} segments, {len(log.segments())} left")
+    log.close()
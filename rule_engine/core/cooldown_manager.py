@@ -1,15 +1,18 @@
 import time
+from collections import OrderedDict
 
 class CooldownManager:
     def __init__(self, cooldown_seconds=60):
         self.cooldown_seconds = cooldown_seconds
-        self.last_alert_time = {}
+        # key -> time of its last allowed alert, oldest first
+        self.last_alert_time = OrderedDict()
 
     def is_allowed(self, key):
         """
         key can be (zone + action) or person_id
         """
         current_time = time.time()
+        self.expire(current_time)
 
         if key not in self.last_alert_time:
             self.last_alert_time[key] = current_time
@@ -19,6 +22,17 @@ class CooldownManager:
 
         if elapsed >= self.cooldown_seconds:
             self.last_alert_time[key] = current_time
+            self.last_alert_time.move_to_end(key)
             return True
 
         return False
+
+    def expire(self, now):
+        """Forget keys whose cooldown has run out (per-track keys would otherwise pile up)."""
+        horizon = now - self.cooldown_seconds
+
+        while self.last_alert_time:
+            key, last = next(iter(self.last_alert_time.items()))
+            if last > horizon:
+                break
+            self.last_alert_time.popitem(last=False)
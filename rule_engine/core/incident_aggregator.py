@@ -0,0 +1,224 @@
+"""
+Incident aggregation: coalesces related alerts into one evolving incident.
+
+Alerts sharing (camera, zone, track or rule) within `window_seconds` of each other
+update one incident in place and emit open/update/close events, instead of a
+stream of disconnected alerts.
+"""
+
+import time
+from collections import OrderedDict
+
+
+class Incident:
+    __slots__ = (
+        "incident_id", "key", "camera_id", "zone_id", "subject", "start_time",
+        "end_time", "peak_confidence", "frame_count", "alert_count", "severity",
+        "reasons", "first_alert_id", "last_alert_id", "snapshot", "last_emitted",
+        "emitted_peak", "last_frame"
+    )
+
+    def __init__(self, incident_id, key, now, alert):
+        self.incident_id = incident_id
+        self.key = key
+        self.camera_id, self.zone_id, self.subject = key
+        self.start_time = now
+        self.end_time = now
+        self.peak_confidence = -1.0
+        self.frame_count = 0
+        self.alert_count = 0
+        self.severity = alert.get("severity", "MEDIUM")
+        self.reasons = []
+        self.first_alert_id = alert.get("alert_id")
+        self.last_alert_id = None
+        self.snapshot = None
+        self.last_emitted = now
+        self.emitted_peak = 0.0
+        self.last_frame = None
+
+    def to_dict(self, status):
+        return {
+            "incident_id": self.incident_id,
+            "status": status,
+            "camera_id": self.camera_id,
+            "zone_id": self.zone_id,
+            "subject": self.subject,
+            "severity": self.severity,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration_seconds": round(self.end_time - self.start_time, 3),
+            "peak_confidence": self.peak_confidence,
+            "frame_count": self.frame_count,
+            "alert_count": self.alert_count,
+            "reasons": list(self.reasons),
+            "first_alert_id": self.first_alert_id,
+            "last_alert_id": self.last_alert_id,
+            "snapshot": self.snapshot
+        }
+
+
+SEVERITY_RANK = {"LOW": 1, "MEDIUM": 2, "HIGH": 3, "CRITICAL": 4}
+
+
+class IncidentAggregator:
+    def __init__(self, window_seconds=30, max_duration_seconds=3600, update_interval_seconds=10,
+                 confidence_step=0.05):
+        """
+        window_seconds: idle gap after which an incident closes
+        max_duration_seconds: incidents longer than this close and a new one opens
+        update_interval_seconds: minimum spacing of update events unless the
+            incident escalates (higher severity, or peak confidence up by
+            at least confidence_step since the last event)
+        """
+        self.window_seconds = window_seconds
+        self.max_duration_seconds = max_duration_seconds
+        self.update_interval_seconds = update_interval_seconds
+        self.confidence_step = confidence_step
+
+        # key -> Incident, ordered by last update so expiry only looks at the front
+        self.open_incidents = OrderedDict()
+        self.counter = 0
+        self.stats = {"alerts": 0, "opened": 0, "updates": 0, "closed": 0}
+
+    @staticmethod
+    def incident_key(alert):
+        """(camera, zone, track or rule) for a formatted alert."""
+        data = alert.get("data") or {}
+        track_id = data.get("track_id", data.get("id"))
+        if track_id is not None:
+            subject = f"track:{track_id}"
+        else:
+            rules = (alert.get("metadata") or {}).get("evaluated_rules") or ["unknown"]
+            subject = f"rule:{rules[0]}"
+        return (data.get("camera_id", "default"), alert.get("zone_id"), subject)
+
+    def add(self, alert, now=None):
+        """
+        Fold an alert into its incident.
+
+        Returns a list of {"event": "open"|"update"|"close", "incident": {...}} dicts.
+        """
+        data = alert.get("data") or {}
+        if now is None:
+            frame_time = data.get("timestamp")
+            now = frame_time if isinstance(frame_time, (int, float)) else time.time()
+
+        events = self.expire(now)
+        self.stats["alerts"] += 1
+
+        key = self.incident_key(alert)
+        incident = self.open_incidents.get(key)
+
+        if incident is not None and now - incident.start_time > self.max_duration_seconds:
+            events.append(self._close(key))
+            incident = None
+
+        opened = incident is None
+        if opened:
+            self.counter += 1
+            incident = Incident(f"INC-{alert.get('alert_id') or self.counter}", key, now, alert)
+            self.open_incidents[key] = incident
+            self.stats["opened"] += 1
+        else:
+            self.open_incidents.move_to_end(key)
+
+        escalated = self._fold(incident, alert, data, now)
+        escalated = escalated or incident.peak_confidence - incident.emitted_peak >= self.confidence_step
+
+        if opened:
+            incident.emitted_peak = incident.peak_confidence
+            events.append({"event": "open", "incident": incident.to_dict("OPEN")})
+        elif escalated or now - incident.last_emitted >= self.update_interval_seconds:
+            incident.last_emitted = now
+            incident.emitted_peak = incident.peak_confidence
+            self.stats["updates"] += 1
+            events.append({"event": "update", "incident": incident.to_dict("UPDATED")})
+
+        return events
+
+    def expire(self, now=None):
+        """Close incidents idle for longer than window_seconds."""
+        now = time.time() if now is None else now
+        horizon = now - self.window_seconds
+        events = []
+
+        while self.open_incidents:
+            key, incident = next(iter(self.open_incidents.items()))
+            if incident.end_time >= horizon:
+                break
+            events.append(self._close(key))
+
+        return events
+
+    def close_all(self):
+        """Close every open incident (shutdown)."""
+        return [self._close(key) for key in list(self.open_incidents)]
+
+    def _close(self, key):
+        incident = self.open_incidents.pop(key)
+        self.stats["closed"] += 1
+        return {"event": "close", "incident": incident.to_dict("CLOSED")}
+
+    @staticmethod
+    def _fold(incident, alert, data, now):
+        """Update incident in place; True if its severity escalated."""
+        escalated = False
+
+        incident.end_time = max(incident.end_time, now)
+        incident.alert_count += 1
+        # Alerts arrive in frame order, so a frame's alerts are consecutive
+        frame = data.get("frame_id", data.get("timestamp", now))
+        if frame != incident.last_frame:
+            incident.last_frame = frame
+            incident.frame_count += 1
+        incident.last_alert_id = alert.get("alert_id")
+
+        severity = alert.get("severity", "MEDIUM")
+        if SEVERITY_RANK.get(severity, 0) > SEVERITY_RANK.get(incident.severity, 0):
+            incident.severity = severity
+            escalated = incident.alert_count > 1
+
+        reason = alert.get("reason")
+        if reason and reason not in incident.reasons and len(incident.reasons) < 10:
+            incident.reasons.append(reason)
+
+        confidence = data.get("confidence")
+        if confidence is None:
+            confidence = 0.0
+        if confidence > incident.peak_confidence:
+            # The highest-confidence frame is the incident's representative snapshot
+            incident.peak_confidence = confidence
+            incident.snapshot = {
+                "alert_id": alert.get("alert_id"),
+                "timestamp": data.get("timestamp", now),
+                "bbox": data.get("bbox"),
+                "action": data.get("action"),
+                "confidence": confidence
+            }
+
+        return escalated
+
+
+if __name__ == "__main__":
+    aggregator = IncidentAggregator(window_seconds=5, update_interval_seconds=60)
+
+    emitted = []
+    # A person climbing for five minutes at 1 alert/frame (5 fps), then leaving
+    for i in range(1500):
+        alert = {
+            "alert_id": f"ALT-{i}",
+            "zone_id": "private_area",
+            "severity": "HIGH",
+            "reason": "Suspicious action in restricted zone",
+            "data": {"camera_id": "cam0", "track_id": 7, "timestamp": i * 0.2,
+                     "bbox": [100, 100, 140, 180], "action": "climbing",
+                     "confidence": 0.8 + (i % 100) / 1000}
+        }
+        emitted.extend(aggregator.add(alert))
+    emitted.extend(aggregator.expire(1500 * 0.2 + 10))
+
+    print(f"✓ {aggregator.stats['alerts']} alerts -> {len(emitted)} incident events")
+    for event in emitted:
+        incident = event["incident"]
+        print(f"  {event['event']:6s} {incident['incident_id']} frames={incident['frame_count']} "
+              f"peak={incident['peak_confidence']:.3f} duration={incident['duration_seconds']}s")
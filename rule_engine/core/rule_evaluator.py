@@ -1,13 +1,20 @@
 class RuleEvaluator:
-    def __init__(self, confidence_threshold=0.8):
+    def __init__(self, confidence_threshold=0.8, thresholds=None):
         self.confidence_threshold = confidence_threshold
+        # Optional per-zone/per-rule overrides: thresholds.get(zone_id, rule_id, default)
+        self.thresholds = thresholds
         self.suspicious_actions = ["climbing", "intrusion", "jumping"]
 
-    def evaluate(self, person_detected, action, zone, confidence):
+    def threshold_for(self, zone_id=None, rule_id="suspicious_action"):
+        if self.thresholds is None:
+            return self.confidence_threshold
+        return self.thresholds.get(zone_id, rule_id, self.confidence_threshold)
+
+    def evaluate(self, person_detected, action, zone, confidence, zone_id=None, rule_id="suspicious_action"):
         if not person_detected:
             return False, "No person detected"
 
-        if confidence < self.confidence_threshold:
+        if confidence < self.threshold_for(zone_id, rule_id):
             return False, "Low confidence detection"
 
         if action not in self.suspicious_actions:
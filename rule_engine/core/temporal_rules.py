@@ -0,0 +1,262 @@
+"""
+Temporal rules over tracked people (dwell/loitering, zone transitions, occupancy).
+
+Each detection updates the state of its track incrementally, so an update
+costs O(1) amortised no matter how long the track has been observed.
+Timestamps are frame times in seconds and are expected to be non-decreasing.
+"""
+
+import json
+import time
+from collections import OrderedDict, deque
+
+
+class DwellRule:
+    """
+    Track stays in `zone` for at least `min_seconds`.
+
+    Without `window_seconds` the dwell must be continuous (leaving the zone
+    resets it). With a window, time in the zone is accumulated over the last
+    `window_seconds`, which catches loitering that steps in and out.
+    """
+
+    kind = "dwell"
+
+    def __init__(self, rule_id, zone, min_seconds, window_seconds=None,
+                 max_gap_seconds=2.0):
+        self.rule_id = rule_id
+        self.zone = zone
+        self.min_seconds = min_seconds
+        self.window_seconds = window_seconds
+        self.max_gap_seconds = max_gap_seconds
+
+    def new_state(self):
+        # [accumulated seconds, fired flag, samples of (time, credited seconds)]
+        return [0.0, False, deque() if self.window_seconds else None]
+
+    def update(self, state, prev_zone, zone, prev_seen, now):
+        samples = state[2]
+
+        if zone == self.zone and prev_zone == self.zone:
+            dt = now - prev_seen
+            if 0 < dt <= self.max_gap_seconds:
+                state[0] += dt
+                if samples is not None:
+                    samples.append((now, dt))
+        elif zone != self.zone and samples is None:
+            state[0] = 0.0
+            state[1] = False
+
+        if samples is not None:
+            horizon = now - self.window_seconds
+            while samples and samples[0][0] <= horizon:
+                state[0] -= samples.popleft()[1]
+            if state[0] < self.min_seconds:
+                state[1] = False
+
+        if not state[1] and state[0] >= self.min_seconds:
+            state[1] = True
+            return f"In {self.zone} for {state[0]:.1f}s (limit {self.min_seconds}s)"
+
+        return None
+
+
+class TransitionRule:
+    """Track enters `to_zone` within `within_seconds` of being seen in `from_zone`."""
+
+    kind = "transition"
+
+    def __init__(self, rule_id, from_zone, to_zone, within_seconds):
+        self.rule_id = rule_id
+        self.from_zone = from_zone
+        self.to_zone = to_zone
+        self.within_seconds = within_seconds
+
+    def new_state(self):
+        # [last time seen in from_zone]
+        return [None]
+
+    def update(self, state, prev_zone, zone, prev_seen, now):
+        if zone == self.from_zone:
+            state[0] = now
+            return None
+
+        if zone == self.to_zone and prev_zone != self.to_zone and state[0] is not None:
+            elapsed = now - state[0]
+            state[0] = None
+            if elapsed <= self.within_seconds:
+                return f"Moved {self.from_zone} -> {self.to_zone} in {elapsed:.1f}s"
+
+        return None
+
+
+class OccupancyRule:
+    """More than `max_count` tracks in `zone` of one camera at the same time."""
+
+    kind = "occupancy"
+
+    def __init__(self, rule_id, zone, max_count):
+        self.rule_id = rule_id
+        self.zone = zone
+        self.max_count = max_count
+
+
+RULE_TYPES = {
+    "dwell": DwellRule,
+    "transition": TransitionRule,
+    "occupancy": OccupancyRule,
+}
+
+
+def build_rule(config):
+    """Create a rule from a `temporal_rules` entry of zones.json."""
+    params = dict(config)
+    rule_type = params.pop("type")
+    rule_id = params.pop("id")
+    if rule_type not in RULE_TYPES:
+        raise ValueError(f"Unknown temporal rule type: {rule_type}")
+    return RULE_TYPES[rule_type](rule_id, **params)
+
+
+class TrackState:
+    __slots__ = ("camera_id", "track_id", "zone", "last_seen", "rule_state")
+
+    def __init__(self, camera_id, track_id, now, rule_state):
+        self.camera_id = camera_id
+        self.track_id = track_id
+        self.zone = None
+        self.last_seen = now
+        self.rule_state = rule_state
+
+
+class TemporalRuleEngine:
+    def __init__(self, rules, track_timeout=5.0):
+        """
+        rules: list of DwellRule / TransitionRule / OccupancyRule
+        track_timeout: seconds without a detection before a track is dropped
+        """
+        self.track_timeout = track_timeout
+        self.track_rules = [r for r in rules if r.kind != "occupancy"]
+        self.occupancy_rules = {}
+        for rule in rules:
+            if rule.kind == "occupancy":
+                self.occupancy_rules.setdefault(rule.zone, []).append(rule)
+
+        # (camera_id, track_id) -> TrackState, ordered by last update
+        self.tracks = OrderedDict()
+        # (camera_id, zone) -> number of live tracks in that zone
+        self.zone_counts = {}
+        self._occupancy_fired = set()
+
+    @classmethod
+    def from_config(cls, zone_config_path, track_timeout=5.0):
+        with open(zone_config_path, "r") as f:
+            config = json.load(f)
+        rules = [build_rule(r) for r in config.get("temporal_rules", [])]
+        return cls(rules, track_timeout=track_timeout)
+
+    def update(self, camera_id, track_id, zone, timestamp=None):
+        """
+        Record that a track was seen in `zone` (zone name or "none").
+
+        Returns a list of triggered rule events.
+        """
+        now = time.time() if timestamp is None else timestamp
+        events = self.expire(now)
+
+        key = (camera_id, track_id)
+        track = self.tracks.get(key)
+        if track is None:
+            track = TrackState(
+                camera_id, track_id, now,
+                {r.rule_id: r.new_state() for r in self.track_rules}
+            )
+            self.tracks[key] = track
+        else:
+            self.tracks.move_to_end(key)
+
+        prev_zone, prev_seen = track.zone, track.last_seen
+        track.zone = zone
+        track.last_seen = now
+
+        if zone != prev_zone:
+            self._move(camera_id, prev_zone, zone, now, events)
+
+        for rule in self.track_rules:
+            reason = rule.update(track.rule_state[rule.rule_id], prev_zone, zone, prev_seen, now)
+            if reason:
+                events.append(self._event(rule, camera_id, track_id, zone, reason, now))
+
+        return events
+
+    def expire(self, now):
+        """Drop tracks not seen for `track_timeout` seconds."""
+        events = []
+        horizon = now - self.track_timeout
+
+        while self.tracks:
+            key, track = next(iter(self.tracks.items()))
+            if track.last_seen >= horizon:
+                break
+            self.tracks.popitem(last=False)
+            self._move(track.camera_id, track.zone, None, now, events)
+
+        return events
+
+    def get_zone_count(self, camera_id, zone):
+        return self.zone_counts.get((camera_id, zone), 0)
+
+    def _move(self, camera_id, old_zone, new_zone, now, events):
+        if old_zone is not None:
+            key = (camera_id, old_zone)
+            self.zone_counts[key] -= 1
+            if not self.zone_counts[key]:
+                del self.zone_counts[key]
+            self._check_occupancy(camera_id, old_zone, now, events)
+
+        if new_zone is not None:
+            key = (camera_id, new_zone)
+            self.zone_counts[key] = self.zone_counts.get(key, 0) + 1
+            self._check_occupancy(camera_id, new_zone, now, events)
+
+    def _check_occupancy(self, camera_id, zone, now, events):
+        rules = self.occupancy_rules.get(zone)
+        if not rules:
+            return
+
+        count = self.zone_counts.get((camera_id, zone), 0)
+        for rule in rules:
+            fired_key = (camera_id, rule.rule_id)
+            if count > rule.max_count:
+                if fired_key not in self._occupancy_fired:
+                    self._occupancy_fired.add(fired_key)
+                    reason = f"{count} people in {zone} (limit {rule.max_count})"
+                    events.append(self._event(rule, camera_id, None, zone, reason, now))
+            else:
+                self._occupancy_fired.discard(fired_key)
+
+    @staticmethod
+    def _event(rule, camera_id, track_id, zone, reason, now):
+        return {
+            "rule_id": rule.rule_id,
+            "rule_type": rule.kind,
+            "camera_id": camera_id,
+            "track_id": track_id,
+            "zone": zone,
+            "reason": reason,
+            "timestamp": now
+        }
+
+
+if __name__ == "__main__":
+    engine = TemporalRuleEngine([
+        DwellRule("loitering", "private_area", min_seconds=3),
+        TransitionRule("entry", "public_area", "private_area", within_seconds=2),
+        OccupancyRule("crowding", "private_area", max_count=1),
+    ])
+
+    for t in range(6):
+        for event in engine.update("cam0", 1, "public_area" if t < 1 else "private_area", t):
+            print(event)
+        for event in engine.update("cam0", 2, "private_area", t):
+            print(event)
@@ -1,5 +1,7 @@
 import json
 
+import numpy as np
+
 class ZoneChecker:
     def __init__(self, zone_config_path):
         with open(zone_config_path, "r") as f:
@@ -23,16 +25,62 @@ class ZoneChecker:
 
         return inside
 
-    def get_zone(self, bbox):
+    def get_zone_info(self, bbox):
         """
         bbox: [x1, y1, x2, y2]
-        Uses bbox center for zone detection
+        Returns the first zone dict containing the bbox center, or None
         """
         cx = int((bbox[0] + bbox[2]) / 2)
         cy = int((bbox[1] + bbox[3]) / 2)
 
         for zone in self.zones:
             if self._point_in_polygon((cx, cy), zone["polygon"]):
-                return zone["type"]
+                return zone
+
+        return None
+
+    def get_zone_indices(self, boxes):
+        """
+        boxes: (N, 4) array of [x1, y1, x2, y2]
+        Returns an (N,) array with the index in self.zones of the first zone
+        containing each bbox center (-1 for none); same rule as get_zone_info
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        cx = np.trunc((boxes[:, 0] + boxes[:, 2]) / 2)
+        cy = np.trunc((boxes[:, 1] + boxes[:, 3]) / 2)
+        result = np.full(len(boxes), -1, dtype=np.int64)
+
+        for index, zone in enumerate(self.zones):
+            pending = result < 0
+            if not pending.any():
+                break
+            polygon = np.asarray(zone["polygon"], dtype=np.float64)
+            x, y = cx[pending], cy[pending]
+            inside = np.zeros(len(x), dtype=bool)
+            for (px1, py1), (px2, py2) in zip(polygon, np.roll(polygon, -1, axis=0)):
+                if py1 == py2:
+                    continue  # a horizontal edge is never crossed
+                crosses = (min(py1, py2) < y) & (y <= max(py1, py2)) & (x <= max(px1, px2))
+                if px1 != px2:
+                    crosses &= x <= (y - py1) * (px2 - px1) / (py2 - py1) + px1
+                inside ^= crosses
+            hit = np.flatnonzero(pending)[inside]
+            result[hit] = index
+
+        return result
 
-        return "none"
+    def get_zone(self, bbox):
+        """
+        bbox: [x1, y1, x2, y2]
+        Uses bbox center for zone detection
+        """
+        zone = self.get_zone_info(bbox)
+        return zone["type"] if zone else "none"
+
+    def get_zone_name(self, bbox):
+        """
+        bbox: [x1, y1, x2, y2]
+        Returns the name of the zone containing the bbox center
+        """
+        zone = self.get_zone_info(bbox)
+        return zone["name"] if zone else "none"
@@ -3,13 +3,26 @@ Feedback Manager Module - ISHTA (RLHF Component)
 Handles user feedback, stores validation results, and manages weight/threshold adjustments.
 """
 
+import os
+import sys
 import json
+import fcntl
+import atexit
 import logging
-from typing import Dict, Any, List, Tuple, Optional
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List, Tuple, Optional, BinaryIO, Iterator
 from datetime import datetime
 from dataclasses import dataclass, asdict
 from enum import Enum
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from feedback_stats import FeedbackStats, FeedbackKey, feedback_key  # noqa: E402
+
+# rule_engine/io shares its name with the stdlib io module (see pipeline.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "io"))
+from id_generator import SnowflakeGenerator  # noqa: E402
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -38,12 +51,243 @@ class FeedbackRecord:
 
 
 class FeedbackStore:
-    """Persistent feedback storage and retrieval."""
+    """
+    Persistent feedback storage and retrieval.
+    
+    Records are appended to feedback.jsonl through a persistent handle and
+    indexed in memory as alert_id → byte offsets, so lookups by alert read only
+    that alert's lines. The index is saved to a sidecar file (feedback.jsonl.idx)
+    together with the file offset it covers; on startup only the tail past that
+    offset is scanned, and a missing or stale sidecar falls back to a full scan.
+    A record re-submitted with the same feedback_id supersedes the earlier one;
+    superseded bytes are reclaimed by compaction.
+    
+    Per-zone and per-rule statistics (feedback_stats.py) are updated as records
+    are indexed and saved in the same sidecar, so they always cover exactly the
+    indexed part of the file.
+    
+    Several processes may write the same file: appends and compaction hold an
+    exclusive flock on feedback.jsonl, each batch is one write, and records
+    appended by other writers are indexed before the next operation.
+    """
     
-    def __init__(self, logs_dir: str = "./logs"):
+    def __init__(
+        self,
+        logs_dir: str = "./logs",
+        compact_ratio: float = 0.3,
+        compact_min_bytes: int = 1024 * 1024,
+        index_persist_every: int = 10000
+    ):
+        """
+        Initialize feedback store.
+        
+        Args:
+            logs_dir: Directory holding feedback.jsonl
+            compact_ratio: Fraction of superseded bytes that triggers compaction
+            compact_min_bytes: Superseded bytes required before compacting
+            index_persist_every: Appends between sidecar index saves
+        """
         self.logs_dir = logs_dir
         self.feedback_file = f"{logs_dir}/feedback.jsonl"
+        self.index_file = self.feedback_file + ".idx"
         self.counter = 0
+        self.compact_ratio = compact_ratio
+        self.compact_min_bytes = compact_min_bytes
+        self.index_persist_every = index_persist_every
+        
+        self._lock = threading.RLock()
+        self._offsets: Dict[str, List[int]] = {}
+        self._covered = 0
+        self._dead_bytes = 0
+        self.stats = FeedbackStats()
+        self._unpersisted = 0
+        self._inode: Optional[int] = None
+        self._append: Optional[BinaryIO] = None
+        self._reader: Optional[BinaryIO] = None
+        
+        os.makedirs(logs_dir, exist_ok=True)
+        with self._lock:
+            self._open()
+            if not self._load_index():
+                self._rebuild_index()
+            else:
+                self._scan_tail()
+        atexit.register(self.close)
+    
+    def _open(self) -> None:
+        """(Re)open the append and read handles."""
+        for handle in (self._append, self._reader):
+            if handle is not None:
+                handle.close()
+        self._append = open(self.feedback_file, 'ab', buffering=0)
+        self._reader = open(self.feedback_file, 'rb')
+        self._inode = os.fstat(self._append.fileno()).st_ino
+    
+    def _check_file(self) -> None:
+        """Reopen and reindex if feedback.jsonl was replaced (e.g. by archiving)."""
+        try:
+            st = os.stat(self.feedback_file)
+        except FileNotFoundError:
+            st = None
+        if st is None or st.st_ino != self._inode or st.st_size < self._covered:
+            logger.info(f"{self.feedback_file} changed on disk; reindexing")
+            self._open()
+            self._rebuild_index()
+    
+    def _load_index(self) -> bool:
+        """Restore the sidecar index if it matches the current file."""
+        if not os.path.exists(self.index_file):
+            return False
+        try:
+            with open(self.index_file, 'r') as f:
+                header = json.loads(f.readline())
+                if header.get('inode') != self._inode or header.get('covered', 0) > os.path.getsize(self.feedback_file):
+                    return False
+                if header.get('version') != 2:
+                    return False
+                covered = header['covered']
+                stats = FeedbackStats.from_dict(header['stats'])
+                if covered:
+                    self._reader.seek(covered - 1)
+                    if self._reader.read(1) != b'\n':
+                        return False
+                offsets = {}
+                for line in f:
+                    alert_id, alert_offsets = json.loads(line)
+                    offsets[alert_id] = alert_offsets
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable feedback index {self.index_file}: {e}")
+            return False
+        
+        self._offsets = offsets
+        self._covered = covered
+        self._dead_bytes = header.get('dead_bytes', 0)
+        self.stats = stats
+        return True
+    
+    def _persist_index(self) -> None:
+        """Atomically write the sidecar index."""
+        tmp_path = f"{self.index_file}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(json.dumps({
+                'version': 2,
+                'inode': self._inode,
+                'covered': self._covered,
+                'dead_bytes': self._dead_bytes,
+                'stats': self.stats.to_dict()
+            }) + '\n')
+            for alert_id, alert_offsets in self._offsets.items():
+                f.write(json.dumps([alert_id, alert_offsets]) + '\n')
+        os.replace(tmp_path, self.index_file)
+        self._unpersisted = 0
+    
+    def _rebuild_index(self) -> None:
+        """Index the whole file from scratch."""
+        self._offsets = {}
+        self._covered = 0
+        self._dead_bytes = 0
+        self.stats = FeedbackStats()
+        self._scan_tail()
+        self._persist_index()
+    
+    def _scan_tail(self) -> None:
+        """Index complete lines past the covered offset."""
+        offset = scan_start = self._covered
+        seen: Dict[Tuple[str, str], Tuple[int, int, FeedbackKey]] = {}  # (alert_id, feedback_id) → (offset, length, key) in this scan
+        with open(self.feedback_file, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # torn write; the next append starts after it
+                self._index_line(line, offset, scan_start, seen)
+                offset += len(line)
+        self._covered = offset
+    
+    def _index_line(
+        self,
+        line: bytes,
+        offset: int,
+        scan_start: Optional[int] = None,
+        seen: Optional[Dict[Tuple[str, str], Tuple[int, int, FeedbackKey]]] = None
+    ) -> None:
+        """
+        Add one line to the index and statistics, superseding an earlier record
+        with the same alert_id and feedback_id (a resubmission); a feedback_id
+        reused under another alert never drops that alert's record. Records
+        before scan_start are checked by reading them back; later ones are
+        looked up in `seen`.
+        """
+        try:
+            record = json.loads(line)
+            record['alert_id']
+        except (ValueError, KeyError, TypeError):
+            self._dead_bytes += len(line)
+            return
+        self._index_record(record, offset, len(line), scan_start, seen)
+    
+    def _index_record(
+        self,
+        record: Dict[str, Any],
+        offset: int,
+        length: int,
+        scan_start: Optional[int] = None,
+        seen: Optional[Dict[Tuple[str, str], Tuple[int, int, FeedbackKey]]] = None
+    ) -> None:
+        alert_id = record['alert_id']
+        key = feedback_key(record)
+        alert_offsets = self._offsets.setdefault(alert_id, [])
+        feedback_id = record.get('feedback_id')
+        if feedback_id is not None:
+            if seen is not None and (alert_id, feedback_id) in seen:
+                previous_offset, previous_length, previous_key = seen[(alert_id, feedback_id)]
+                if previous_offset in alert_offsets:
+                    alert_offsets.remove(previous_offset)
+                    self._dead_bytes += previous_length
+                    self.stats.add(previous_key, -1)
+            else:
+                for existing in alert_offsets:
+                    if scan_start is not None and existing >= scan_start:
+                        continue
+                    previous = self._read_line(existing)
+                    previous_record = json.loads(previous)
+                    if previous_record.get('feedback_id') == feedback_id:
+                        alert_offsets.remove(existing)
+                        self._dead_bytes += len(previous)
+                        self.stats.add(feedback_key(previous_record), -1)
+                        break
+            if seen is not None:
+                seen[(alert_id, feedback_id)] = (offset, length, key)
+        alert_offsets.append(offset)
+        self.stats.add(key)
+    
+    def _sync(self) -> None:
+        """Pick up a replaced file or records appended by another writer."""
+        self._check_file()
+        if self._covered < os.fstat(self._append.fileno()).st_size:
+            self._scan_tail()
+    
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Exclusive flock on the current feedback.jsonl, shared with other processes."""
+        while True:
+            self._check_file()
+            fcntl.flock(self._append.fileno(), fcntl.LOCK_EX)
+            try:
+                current = os.stat(self.feedback_file).st_ino
+            except FileNotFoundError:
+                current = None
+            if current == self._inode:
+                break
+            # Replaced (compacted/archived) while we waited: lock the new file
+            fcntl.flock(self._append.fileno(), fcntl.LOCK_UN)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._append.fileno(), fcntl.LOCK_UN)
+    
+    def _read_line(self, offset: int) -> bytes:
+        self._reader.seek(offset)
+        return self._reader.readline()
     
     def store_feedback(self, feedback: Dict[str, Any]) -> bool:
         """
@@ -55,16 +299,51 @@ class FeedbackStore:
         Returns:
             Success flag
         """
-        try:
-            # Append to JSONL file (one JSON per line)
-            with open(self.feedback_file, 'a') as f:
-                f.write(json.dumps(feedback) + '\n')
-            
+        success = self.store_feedback_batch([feedback]) == 1
+        if success:
             logger.info(f"Feedback stored: {feedback.get('feedback_id')}")
-            return True
+        return success
+    
+    def store_feedback_batch(self, records: List[Dict[str, Any]]) -> int:
+        """
+        Append feedback records in a single locked write.
+        
+        Args:
+            records: Feedback dictionaries
+            
+        Returns:
+            Number of records stored (0 on failure)
+        """
+        if not records:
+            return 0
+        try:
+            lines = [(json.dumps(record) + '\n').encode('utf-8') for record in records]
+            data = b''.join(lines)
+            with self._lock, self._file_lock():
+                self._sync()  # index what other writers appended first
+                # Append to JSONL file (one JSON per line)
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(self._append.fileno(), view):]
+                for record, line in zip(records, lines):
+                    if 'alert_id' in record:
+                        self._index_record(record, self._covered, len(line))
+                    else:
+                        self._dead_bytes += len(line)
+                    self._covered += len(line)
+                self._unpersisted += len(lines)
+                if self._unpersisted >= self.index_persist_every:
+                    self._persist_index()
+                compact = (
+                    self._dead_bytes >= self.compact_min_bytes
+                    and self._dead_bytes >= self.compact_ratio * self._covered
+                )
+            if compact:
+                self.compact()
+            return len(lines)
         except Exception as e:
             logger.error(f"Failed to store feedback: {str(e)}")
-            return False
+            return 0
     
     def retrieve_feedback(self, alert_id: str) -> List[Dict[str, Any]]:
         """
@@ -78,19 +357,49 @@ class FeedbackStore:
         """
         feedback_records = []
         try:
-            with open(self.feedback_file, 'r') as f:
-                for line in f:
-                    if line.strip():
-                        record = json.loads(line)
-                        if record.get('alert_id') == alert_id:
-                            feedback_records.append(record)
-        except FileNotFoundError:
-            logger.warning(f"Feedback file not found: {self.feedback_file}")
+            with self._lock:
+                self._sync()
+                for offset in self._offsets.get(alert_id, ()):
+                    feedback_records.append(json.loads(self._read_line(offset)))
         except Exception as e:
             logger.error(f"Error retrieving feedback: {str(e)}")
         
         return feedback_records
     
+    def compact(self) -> Dict[str, int]:
+        """
+        Rewrite feedback.jsonl without superseded or unreadable lines.
+        
+        Returns:
+            File size before and after
+        """
+        with self._lock, self._file_lock():
+            self._scan_tail()
+            before = self._covered
+            live = sorted(offset for alert_offsets in self._offsets.values() for offset in alert_offsets)
+            tmp_path = self.feedback_file + ".compact"
+            with open(tmp_path, 'wb') as out:
+                for offset in live:
+                    out.write(self._read_line(offset))
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(tmp_path, self.feedback_file)
+            self._open()
+            self._rebuild_index()
+            logger.info(f"Compacted {self.feedback_file}: {before} -> {self._covered} bytes")
+            return {'bytes_before': before, 'bytes_after': self._covered}
+    
+    def close(self) -> None:
+        """Save the index and close file handles."""
+        with self._lock:
+            if self._append is None:
+                return
+            if self._unpersisted:
+                self._persist_index()
+            self._append.close()
+            self._reader.close()
+            self._append = self._reader = None
+    
     def get_zone_feedback_stats(self, zone_id: str) -> Dict[str, Any]:
         """
         Get feedback statistics for a zone.
@@ -99,57 +408,64 @@ class FeedbackStore:
             zone_id: Zone identifier
             
         Returns:
-            Statistics dictionary
+            Statistics dictionary (counts per type, accuracy rate,
+            confidence-weighted accuracy rate and mean confidence)
         """
-        stats = {
-            'total_feedback': 0,
-            'valid': 0,
-            'invalid': 0,
-            'partial': 0,
-            'accuracy_rate': 0.0
-        }
+        with self._lock:
+            self._sync()
+            return self.stats.zone_stats(zone_id)
+    
+    def get_rule_feedback_stats(self, rule_id: str) -> Dict[str, Any]:
+        """
+        Get feedback statistics for a rule.
         
-        try:
-            with open(self.feedback_file, 'r') as f:
-                for line in f:
-                    if line.strip():
-                        record = json.loads(line)
-                        if record.get('zone_id') == zone_id:
-                            stats['total_feedback'] += 1
-                            feedback_type = record.get('feedback_type')
-                            
-                            if feedback_type == 'VALID':
-                                stats['valid'] += 1
-                            elif feedback_type == 'INVALID':
-                                stats['invalid'] += 1
-                            elif feedback_type == 'PARTIAL':
-                                stats['partial'] += 1
+        Args:
+            rule_id: Rule identifier
             
-            # Calculate accuracy rate
-            if stats['total_feedback'] > 0:
-                stats['accuracy_rate'] = round(
-                    stats['valid'] / stats['total_feedback'], 3
-                )
-        except Exception as e:
-            logger.error(f"Error calculating feedback stats: {str(e)}")
+        Returns:
+            Statistics dictionary (same fields as get_zone_feedback_stats)
+        """
+        with self._lock:
+            self._sync()
+            return self.stats.rule_stats(rule_id)
+    
+    def get_all_feedback_stats(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        Get feedback statistics for every zone and rule.
         
-        return stats
+        Returns:
+            {"zones": {zone_id: stats}, "rules": {rule_id: stats}}
+        """
+        with self._lock:
+            self._sync()
+            return {'zones': self.stats.all_zone_stats(), 'rules': self.stats.all_rule_stats()}
 
 
 class FeedbackProcessor:
     """Processes feedback and generates learning signals for weight adjustment."""
     
-    def __init__(self, logs_dir: str = "./logs"):
+    def __init__(self, logs_dir: str = "./logs", threshold_service: Any = None, worker_id: Optional[int] = None):
+        """
+        Initialize feedback processor.
+        
+        Args:
+            logs_dir: Directory holding feedback.jsonl
+            threshold_service: Optional ThresholdService that each stored
+                               feedback's learning signal is folded into
+            worker_id: Snowflake worker ID for feedback IDs (default
+                       SNOWFLAKE_WORKER_ID, else a slot leased under
+                       `<logs_dir>/.feedback_workers`, so every live writer
+                       of this feedback file holds a distinct ID)
+        """
         self.store = FeedbackStore(logs_dir)
-        self.feedback_counter = 0
+        self.threshold_service = threshold_service
+        self.id_generator = SnowflakeGenerator(worker_id, lock_dir=os.path.join(logs_dir, ".feedback_workers"))
     
     def create_feedback_id(self) -> str:
-        """Generate unique feedback ID."""
-        self.feedback_counter += 1
-        timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-        return f"FB-{timestamp}-{self.feedback_counter:05d}"
+        """Generate unique feedback ID (unique across threads and processes)."""
+        return f"FB-{self.id_generator.next_id()}"
     
-    def process_user_feedback(
+    def _build_feedback(
         self,
         alert_id: str,
         zone_id: str,
@@ -157,34 +473,20 @@ class FeedbackProcessor:
         user_comment: str = "",
         rule_id: str = "",
         confidence_score: float = 0.5
-    ) -> Tuple[bool, Dict[str, Any]]:
-        """
-        Process and store user feedback.
-        
-        Args:
-            alert_id: Alert being reviewed
-            zone_id: Zone identifier
-            feedback_type: Type of feedback (VALID, INVALID, etc.)
-            user_comment: Optional user comment
-            rule_id: Rule that generated the alert
-            confidence_score: User's confidence in feedback (0-1)
-            
-        Returns:
-            Tuple of (success, feedback_record)
-        """
+    ) -> Dict[str, Any]:
+        """Validated feedback record, or {"error": ...}."""
         # Validate feedback type
         valid_types = {member.value for member in FeedbackType}
         if feedback_type not in valid_types:
             error_msg = f"Invalid feedback type: {feedback_type}"
             logger.error(error_msg)
-            return False, {"error": error_msg}
+            return {"error": error_msg}
         
         # Validate confidence score
         if not 0.0 <= confidence_score <= 1.0:
             confidence_score = max(0.0, min(1.0, confidence_score))
         
-        # Create feedback record
-        feedback = {
+        return {
             'feedback_id': self.create_feedback_id(),
             'alert_id': alert_id,
             'zone_id': zone_id,
@@ -194,15 +496,87 @@ class FeedbackProcessor:
             'rule_id': rule_id,
             'confidence_score': confidence_score
         }
+    
+    def _apply_learning_signals(self, records: List[Dict[str, Any]]) -> None:
+        """Fold stored feedback into the threshold service (one snapshot per call)."""
+        if self.threshold_service is not None:
+            self.threshold_service.apply_signals([
+                (
+                    self.generate_learning_signal(
+                        feedback['alert_id'], feedback['feedback_type'], feedback['confidence_score']
+                    ),
+                    feedback['zone_id'],
+                    feedback['rule_id'] or None,
+                    None
+                )
+                for feedback in records
+            ])
+    
+    def process_user_feedback(
+        self,
+        alert_id: str,
+        zone_id: str,
+        feedback_type: str,
+        user_comment: str = "",
+        rule_id: str = "",
+        confidence_score: float = 0.5
+    ) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Process and store user feedback.
+        
+        Args:
+            alert_id: Alert being reviewed
+            zone_id: Zone identifier
+            feedback_type: Type of feedback (VALID, INVALID, etc.)
+            user_comment: Optional user comment
+            rule_id: Rule that generated the alert
+            confidence_score: User's confidence in feedback (0-1)
+            
+        Returns:
+            Tuple of (success, feedback_record)
+        """
+        feedback = self._build_feedback(alert_id, zone_id, feedback_type, user_comment, rule_id, confidence_score)
+        if 'error' in feedback:
+            return False, feedback
         
         # Store feedback
         success = self.store.store_feedback(feedback)
         
         if success:
             logger.info(f"Feedback processed: {feedback['feedback_id']} ({feedback_type})")
+            self._apply_learning_signals([feedback])
         
         return success, feedback
     
+    def process_feedback_batch(self, items: List[Dict[str, Any]]) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Validate and store many feedback submissions with one locked append.
+        
+        Args:
+            items: Dicts with process_user_feedback's arguments (alert_id,
+                   zone_id, feedback_type, and optionally user_comment,
+                   rule_id, confidence_score)
+            
+        Returns:
+            Tuple of (records stored, per-item feedback records or {"error": ...})
+        """
+        results = []
+        valid = []
+        for item in items:
+            try:
+                feedback = self._build_feedback(**item)
+            except TypeError as e:
+                feedback = {"error": f"Invalid feedback submission: {e}"}
+            results.append(feedback)
+            if 'error' not in feedback:
+                valid.append(feedback)
+        
+        stored = self.store.store_feedback_batch(valid)
+        if stored:
+            logger.info(f"Feedback batch processed: {stored} records")
+            self._apply_learning_signals(valid)
+        return stored, results
+    
     def generate_learning_signal(
         self,
         alert_id: str,
@@ -260,6 +634,25 @@ class FeedbackProcessor:
         }
         return directions.get(feedback_type, 'maintain')
     
+    def get_all_zone_insights(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get learning insights for every zone with feedback.
+        
+        Returns:
+            Insights dictionary per zone_id
+        """
+        zone_stats = self.store.get_all_feedback_stats()['zones']
+        timestamp = datetime.utcnow().isoformat() + "Z"
+        return {
+            zone_id: {
+                'zone_id': zone_id,
+                'statistics': stats,
+                'timestamp': timestamp,
+                'recommendations': self._generate_recommendations(stats)
+            }
+            for zone_id, stats in zone_stats.items()
+        }
+    
     def get_zone_insights(self, zone_id: str) -> Dict[str, Any]:
         """
         Get learning insights for a zone.
@@ -0,0 +1,111 @@
+"""
+Feedback Statistics Module - ISHTA (RLHF Component)
+Running feedback aggregates per zone and per rule, updated as each record is
+stored (and reversed when a record is superseded), so statistics and insights
+are lookups instead of scans of feedback.jsonl.
+"""
+
+from typing import Dict, Any, List, Optional, Tuple
+
+# (zone_id, rule_id, feedback_type, confidence_score) of one feedback record
+FeedbackKey = Tuple[Optional[str], Optional[str], Optional[str], float]
+
+
+def feedback_key(record: Dict[str, Any]) -> FeedbackKey:
+    """The fields of a feedback record the aggregates depend on."""
+    try:
+        confidence = float(record.get('confidence_score', 0.5))
+    except (TypeError, ValueError):
+        confidence = 0.5
+    return record.get('zone_id'), record.get('rule_id') or None, record.get('feedback_type'), confidence
+
+
+class _Aggregate:
+    """Counts and confidence sums per feedback type."""
+
+    __slots__ = ("counts", "confidence")
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self.confidence: Dict[str, float] = {}
+
+    def add(self, feedback_type: str, confidence: float, sign: int) -> None:
+        self.counts[feedback_type] = self.counts.get(feedback_type, 0) + sign
+        self.confidence[feedback_type] = self.confidence.get(feedback_type, 0.0) + sign * confidence
+        if self.counts[feedback_type] <= 0:
+            del self.counts[feedback_type]
+            del self.confidence[feedback_type]
+
+    def summary(self) -> Dict[str, Any]:
+        total = sum(self.counts.values())
+        total_confidence = sum(self.confidence.values())
+        valid = self.counts.get('VALID', 0)
+        return {
+            'total_feedback': total,
+            'valid': valid,
+            'invalid': self.counts.get('INVALID', 0),
+            'partial': self.counts.get('PARTIAL', 0),
+            'by_type': dict(self.counts),
+            'accuracy_rate': round(valid / total, 3) if total else 0.0,
+            'weighted_accuracy_rate': (
+                round(self.confidence.get('VALID', 0.0) / total_confidence, 3) if total_confidence > 0 else 0.0
+            ),
+            'mean_confidence': round(total_confidence / total, 3) if total else 0.0
+        }
+
+
+class FeedbackStats:
+    """Feedback aggregates per zone_id and per rule_id."""
+
+    def __init__(self):
+        self.zones: Dict[str, _Aggregate] = {}
+        self.rules: Dict[str, _Aggregate] = {}
+
+    def add(self, key: FeedbackKey, sign: int = 1) -> None:
+        """Count a record (sign=-1 to remove one, e.g. when superseded)."""
+        zone_id, rule_id, feedback_type, confidence = key
+        if feedback_type is None:
+            return
+        for table, name in ((self.zones, zone_id), (self.rules, rule_id)):
+            if name is None:
+                continue
+            aggregate = table.get(name)
+            if aggregate is None:
+                aggregate = table[name] = _Aggregate()
+            aggregate.add(feedback_type, confidence, sign)
+            if not aggregate.counts:
+                del table[name]
+
+    def zone_stats(self, zone_id: str) -> Dict[str, Any]:
+        return self.zones.get(zone_id, _Aggregate()).summary()
+
+    def rule_stats(self, rule_id: str) -> Dict[str, Any]:
+        return self.rules.get(rule_id, _Aggregate()).summary()
+
+    def all_zone_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {zone_id: aggregate.summary() for zone_id, aggregate in self.zones.items()}
+
+    def all_rule_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {rule_id: aggregate.summary() for rule_id, aggregate in self.rules.items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            table_name: {
+                name: {'counts': aggregate.counts, 'confidence': aggregate.confidence}
+                for name, aggregate in table.items()
+            }
+            for table_name, table in (('zones', self.zones), ('rules', self.rules))
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FeedbackStats":
+        stats = cls()
+        for table_name, table in (('zones', stats.zones), ('rules', stats.rules)):
+            for name, values in data.get(table_name, {}).items():
+                aggregate = table[name] = _Aggregate()
+                aggregate.counts = dict(values['counts'])
+                aggregate.confidence = dict(values['confidence'])
+        return stats
+
+    def zone_ids(self) -> List[str]:
+        return sorted(self.zones)
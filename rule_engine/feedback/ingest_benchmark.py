@@ -0,0 +1,126 @@
+"""
+Feedback Ingestion Benchmark - ISHTA
+Runs several writer processes that submit feedback concurrently to one
+feedback.jsonl through FeedbackProcessor.process_feedback_batch, then checks
+the file (every line complete and parseable, every feedback_id unique, one
+snowflake worker ID per writer, no records lost) and reports records/sec.
+
+Usage:
+    python ingest_benchmark.py --writers 4 --records 20000 --batch-size 100
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import multiprocessing
+from typing import Dict, Any
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from feedback_manager import FeedbackProcessor, FeedbackType  # noqa: E402
+from id_generator import id_worker  # noqa: E402  (path set up by feedback_manager)
+
+
+def _writer(logs_dir: str, writer: int, records: int, batch_size: int, start_event: Any) -> None:
+    processor = FeedbackProcessor(logs_dir=logs_dir)
+    types = [member.value for member in FeedbackType]
+    batch = []
+    start_event.wait()
+    for i in range(records):
+        batch.append({
+            'alert_id': f"ALT-{writer}-{i // 3}",
+            'zone_id': f"ZONE_{'ABCD'[i % 4]}",
+            'feedback_type': types[i % len(types)],
+            'user_comment': "benchmark",
+            'rule_id': "suspicious_action",
+            'confidence_score': 0.9
+        })
+        if len(batch) >= batch_size:
+            processor.process_feedback_batch(batch)
+            batch = []
+    if batch:
+        processor.process_feedback_batch(batch)
+    processor.store.close()
+
+
+def run_benchmark(logs_dir: str, writers: int, records: int, batch_size: int) -> Dict[str, Any]:
+    """
+    Run concurrent writers and verify the resulting feedback file.
+
+    Args:
+        logs_dir: Directory for feedback.jsonl (should start empty)
+        writers: Writer processes
+        records: Records per writer
+        batch_size: Records per process_feedback_batch call
+
+    Returns:
+        Throughput and integrity report
+    """
+    ctx = multiprocessing.get_context("fork")
+    start_event = ctx.Event()
+    processes = [
+        ctx.Process(target=_writer, args=(logs_dir, w, records, batch_size, start_event))
+        for w in range(writers)
+    ]
+    for process in processes:
+        process.start()
+    time.sleep(0.5)  # let writers open the store before the clock starts
+
+    start = time.perf_counter()
+    start_event.set()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+
+    lines = torn = 0
+    ids = set()
+    workers_seen = set()
+    with open(os.path.join(logs_dir, "feedback.jsonl"), "rb") as f:
+        for line in f:
+            lines += 1
+            try:
+                feedback_id = json.loads(line)['feedback_id']
+                ids.add(feedback_id)
+                workers_seen.add(id_worker(int(feedback_id[3:])))
+            except (ValueError, KeyError):
+                torn += 1
+
+    expected = writers * records
+    return {
+        'writers': writers,
+        'batch_size': batch_size,
+        'expected_records': expected,
+        'lines': lines,
+        'unique_ids': len(ids),
+        'corrupt_lines': torn,
+        'worker_ids': len(workers_seen),
+        'ok': lines == expected and len(ids) == expected and torn == 0 and len(workers_seen) == writers,
+        'elapsed_s': round(elapsed, 3),
+        'records_per_sec': round(expected / elapsed, 1)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Concurrent feedback ingestion benchmark")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--records", type=int, default=20000, help="Records per writer")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--logs-dir", help="Directory to write to (default: a temporary directory)")
+    args = parser.parse_args()
+
+    logs_dir = args.logs_dir or tempfile.mkdtemp(prefix="feedback-bench-")
+    try:
+        report = run_benchmark(logs_dir, args.writers, args.records, args.batch_size)
+    finally:
+        if not args.logs_dir:
+            shutil.rmtree(logs_dir, ignore_errors=True)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main()
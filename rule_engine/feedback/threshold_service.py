@@ -0,0 +1,488 @@
+"""
+Threshold Service Module - ISHTA (RLHF Component)
+Folds feedback learning signals into per-zone/per-rule confidence thresholds
+and publishes them as versioned parameter snapshots for the rule engine.
+
+Each (zone_id, rule_id) keeps exponentially decayed evidence (signal weight)
+and pressure (signed, weighted threshold direction). Once the evidence reaches
+a minimum, the threshold moves towards base + gain × pressure/evidence by at
+most max_step per signal, within [min_threshold, max_threshold]; below it, it
+drifts back towards the base. Snapshots are written atomically;
+ThresholdSnapshotReader picks up new versions by file mtime, so a running
+RuleEvaluator switches parameters without a restart.
+
+The snapshot is also the shared state between processes: with auto_publish,
+each call's signals (one, or a whole feedback batch via apply_signals) are
+applied under an exclusive flock on `<params>.lock` to the latest snapshot
+(reloaded if another process published since) and published as one new
+version, so several feedback workers never overwrite each other's evidence. Without auto_publish the service is the snapshot's single owner
+(e.g. the rebuild CLI) and publish() replaces it.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import fcntl
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Tuple, Callable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULE = "suspicious_action"
+ANY_ZONE = "*"
+DIRECTIONS = {'raise': 1.0, 'lower': -1.0, 'maintain': 0.0}
+
+
+def threshold_key(zone_id: Optional[str], rule_id: Optional[str]) -> str:
+    """Snapshot key for a zone/rule pair."""
+    return f"{zone_id or ANY_ZONE}/{rule_id or DEFAULT_RULE}"
+
+
+class _KeyState:
+    """Decayed evidence and pressure for one zone/rule pair."""
+
+    __slots__ = ("evidence", "pressure", "threshold", "updated_at", "signals")
+
+    def __init__(self, threshold: float, now: float):
+        self.evidence = 0.0
+        self.pressure = 0.0
+        self.threshold = threshold
+        self.updated_at = now
+        self.signals = 0
+
+
+class ThresholdService:
+    """Per-zone/per-rule confidence thresholds adapted from feedback."""
+
+    def __init__(
+        self,
+        params_path: str,
+        base_threshold: float = 0.8,
+        gain: float = 0.1,
+        max_step: float = 0.01,
+        min_threshold: float = 0.5,
+        max_threshold: float = 0.99,
+        min_evidence: float = 5.0,
+        half_life_hours: float = 72.0,
+        auto_publish: bool = True,
+        alert_sample: Optional[Callable[[], Iterable[Dict[str, Any]]]] = None
+    ):
+        """
+        Initialize threshold service.
+
+        Args:
+            params_path: Parameter snapshot file the rule engine reads
+            base_threshold: Threshold with no feedback (RuleEvaluator's default)
+            gain: Threshold offset when all evidence points one way
+            max_step: Largest threshold change per signal
+            min_threshold: Lowest threshold ever published
+            max_threshold: Highest threshold ever published
+            min_evidence: Decayed signal weight required before adapting
+            half_life_hours: Half-life of evidence and pressure
+            auto_publish: Apply each call's signals to the shared snapshot and
+                          publish it (safe with several processes)
+            alert_sample: Returns recent formatted alerts; when set, every
+                          snapshot carries the projected alert-volume change
+        """
+        self.params_path = params_path
+        self.base_threshold = base_threshold
+        self.gain = gain
+        self.max_step = max_step
+        self.min_threshold = min_threshold
+        self.max_threshold = max_threshold
+        self.min_evidence = min_evidence
+        self.decay_per_second = math.log(2) / (half_life_hours * 3600)
+        self.auto_publish = auto_publish
+        self.alert_sample = alert_sample
+        self.version = 0
+        self.projected_volume_change: Optional[Dict[str, Dict[str, Any]]] = None
+        self._state: Dict[str, _KeyState] = {}
+        self._lock = threading.Lock()
+        self._loaded: Optional[Tuple[int, int, int]] = None  # (inode, mtime_ns, size) of the state held
+        with self._file_lock():
+            self._load()
+
+    def _stamp(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.params_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Exclusive flock serialising snapshot read-modify-writes across processes."""
+        directory = os.path.dirname(os.path.abspath(self.params_path))
+        os.makedirs(directory, exist_ok=True)
+        with open(self.params_path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _load(self) -> None:
+        """Replace the in-memory state with the published snapshot, if any (file lock held)."""
+        stamp = self._stamp()
+        if stamp is None:
+            return
+        try:
+            with open(self.params_path, "r") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable threshold snapshot {self.params_path}: {e}")
+            return
+        self.version = max(self.version, snapshot.get("version", 0))
+        self._state = {}
+        for key, values in snapshot.get("state", {}).items():
+            state = self._state[key] = _KeyState(values["threshold"], values["updated_at"])
+            state.evidence = values["evidence"]
+            state.pressure = values["pressure"]
+            state.signals = values.get("signals", 0)
+        self._loaded = stamp
+
+    def _sync(self) -> None:
+        """Pick up a snapshot another process published since we last read or wrote it."""
+        if self._stamp() != self._loaded:
+            self._load()
+
+    def _decay(self, state: _KeyState, now: float) -> None:
+        elapsed = now - state.updated_at
+        if elapsed > 0:
+            factor = math.exp(-self.decay_per_second * elapsed)
+            state.evidence *= factor
+            state.pressure *= factor
+            state.updated_at = now
+
+    def apply_signal(
+        self,
+        signal: Dict[str, Any],
+        zone_id: Optional[str],
+        rule_id: Optional[str],
+        now: Optional[float] = None
+    ) -> Optional[float]:
+        """
+        Fold one learning signal (FeedbackProcessor.generate_learning_signal).
+
+        Args:
+            signal: Learning signal with threshold_adjustment_direction,
+                    weight_adjustment_factor and confidence_score
+            zone_id: Zone of the reviewed alert
+            rule_id: Rule that produced the alert
+            now: Signal time in epoch seconds (None = now)
+
+        Returns:
+            The new threshold if it changed, else None
+        """
+        return self.apply_signals([(signal, zone_id, rule_id, now)])[0]
+
+    def apply_signals(
+        self,
+        signals: Iterable[Tuple[Dict[str, Any], Optional[str], Optional[str], Optional[float]]]
+    ) -> List[Optional[float]]:
+        """
+        Fold a batch of learning signals, publishing (with auto_publish) once.
+
+        Args:
+            signals: (signal, zone_id, rule_id, now) tuples as for apply_signal
+
+        Returns:
+            Per signal, the new threshold if it changed, else None
+        """
+        folds = []
+        for signal, zone_id, rule_id, now in signals:
+            now = time.time() if now is None else now
+            direction = DIRECTIONS.get(signal.get("threshold_adjustment_direction"), 0.0)
+            confidence = float(signal.get("confidence_score", 0.5))
+            # |factor - 1| is 0.05 for a fully confident VALID/INVALID review and
+            # already scales with confidence, so pressure must not multiply it in again
+            magnitude = min(abs(float(signal.get("weight_adjustment_factor", 1.0)) - 1.0) / 0.05, 3.0)
+            folds.append((threshold_key(zone_id, rule_id), direction, magnitude, confidence, now))
+        if not folds:
+            return []
+
+        with self._lock:
+            if not self.auto_publish:
+                return [self._fold(*fold) for fold in folds]
+            with self._file_lock():
+                self._sync()
+                thresholds = [self._fold(*fold) for fold in folds]
+                # Evidence changed even if no threshold did; share it
+                self._write_snapshot(None)
+            return thresholds
+
+    def _fold(self, key: str, direction: float, magnitude: float, confidence: float, now: float) -> Optional[float]:
+        """Apply one signal to the in-memory state; the new threshold if it changed (lock held)."""
+        state = self._state.get(key)
+        if state is None:
+            state = self._state[key] = _KeyState(self.base_threshold, now)
+        self._decay(state, now)
+        state.evidence += confidence
+        state.pressure += direction * magnitude
+        state.signals += 1
+        if state.evidence < self.min_evidence:
+            # Too little (recent) evidence: drift back towards the base
+            target = self.base_threshold
+        else:
+            target = self.base_threshold + self.gain * max(-1.0, min(1.0, state.pressure / state.evidence))
+        step = max(-self.max_step, min(self.max_step, target - state.threshold))
+        threshold = max(self.min_threshold, min(self.max_threshold, state.threshold + step))
+        if abs(threshold - state.threshold) < 1e-6:
+            return None
+        state.threshold = round(threshold, 6)
+        return state.threshold
+
+    def reset(self) -> None:
+        """Forget all adapted thresholds (the snapshot version keeps counting)."""
+        with self._lock:
+            self._state.clear()
+
+    def replay(self, feedback: Iterable[Dict[str, Any]], processor: Any) -> int:
+        """
+        Fold historical feedback records, e.g. to seed a new snapshot.
+
+        Args:
+            feedback: Feedback records in time order
+            processor: FeedbackProcessor used to derive learning signals
+
+        Returns:
+            Number of signals applied
+        """
+        auto_publish, self.auto_publish = self.auto_publish, False
+        applied = 0
+        try:
+            for record in feedback:
+                signal = processor.generate_learning_signal(
+                    alert_id=record.get("alert_id"),
+                    feedback_type=record.get("feedback_type"),
+                    confidence_score=float(record.get("confidence_score", 0.5))
+                )
+                ts = _epoch(record.get("timestamp"))
+                self.apply_signal(signal, record.get("zone_id"), record.get("rule_id"), now=ts)
+                applied += 1
+        finally:
+            self.auto_publish = auto_publish
+        return applied
+
+    def thresholds(self) -> Dict[str, float]:
+        """Current threshold per zone/rule key."""
+        with self._lock:
+            return {key: state.threshold for key, state in self._state.items()}
+
+    def publish(self, sample_alerts: Optional[Iterable[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Atomically write a new versioned parameter snapshot.
+
+        Args:
+            sample_alerts: Recent alerts to project the alert-volume change on
+                           (None = alert_sample, if set)
+
+        Returns:
+            The published snapshot
+        """
+        with self._lock, self._file_lock():
+            if self.auto_publish:
+                self._sync()
+            return self._write_snapshot(sample_alerts)
+
+    def stats(self) -> Dict[str, Any]:
+        """Version, per-key thresholds and signal counts, and the latest projected alert-volume change."""
+        with self._lock:
+            return {
+                "version": self.version,
+                "thresholds": {key: state.threshold for key, state in self._state.items()},
+                "signals": {key: state.signals for key, state in self._state.items()},
+                "projected_volume_change": self.projected_volume_change
+            }
+
+    def _write_snapshot(self, sample_alerts: Optional[Iterable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Write the next snapshot version (both locks held)."""
+        # Another owner may have published meanwhile; versions only go up
+        published = self._stamp()
+        if published is not None and published != self._loaded:
+            try:
+                with open(self.params_path, "r") as f:
+                    self.version = max(self.version, json.load(f).get("version", 0))
+            except (OSError, ValueError):
+                pass
+        self.version += 1
+        snapshot = {
+            "version": self.version,
+            "published_at": datetime.utcnow().isoformat() + "Z",
+            "base_threshold": self.base_threshold,
+            "thresholds": {key: state.threshold for key, state in self._state.items()},
+            "state": {
+                key: {
+                    "threshold": state.threshold,
+                    "evidence": state.evidence,
+                    "pressure": state.pressure,
+                    "updated_at": state.updated_at,
+                    "signals": state.signals
+                }
+                for key, state in self._state.items()
+            }
+        }
+        if sample_alerts is None and self.alert_sample is not None:
+            sample_alerts = self.alert_sample()
+        if sample_alerts is not None:
+            self.projected_volume_change = project_alert_volume(
+                sample_alerts, snapshot["thresholds"], self.base_threshold
+            )
+            snapshot["projected_volume_change"] = self.projected_volume_change
+
+        tmp_path = f"{self.params_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.params_path)
+        self._loaded = self._stamp()
+        logger.info(f"Published threshold snapshot v{self.version} ({len(snapshot['thresholds'])} keys)")
+        return snapshot
+
+
+def project_alert_volume(
+    alerts: Iterable[Dict[str, Any]],
+    thresholds: Dict[str, float],
+    base_threshold: float
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Projected alert-volume change per zone/rule from a sample of logged alerts.
+
+    Logged alerts all passed the threshold in force when they fired (assumed
+    to be base_threshold), so a raised threshold is projected exactly by the
+    alerts whose detection confidence falls below it. Detections rejected by
+    the old threshold are not logged, so for a lowered threshold the
+    projection is a lower bound.
+
+    Args:
+        alerts: Formatted alerts (zone_id, metadata.evaluated_rules, data.confidence)
+        thresholds: Threshold per zone/rule key
+        base_threshold: Threshold the sample was produced under
+
+    Returns:
+        {key: {"current", "projected", "change_pct", "estimate"}}
+    """
+    confidences: Dict[str, List[float]] = {}
+    for alert in alerts:
+        confidence = (alert.get("data") or {}).get("confidence")
+        if confidence is None:
+            continue
+        for rule_id in (alert.get("metadata") or {}).get("evaluated_rules", []):
+            confidences.setdefault(threshold_key(alert.get("zone_id"), rule_id), []).append(confidence)
+
+    projection = {}
+    for key, values in confidences.items():
+        threshold = thresholds.get(key, base_threshold)
+        projected = sum(1 for c in values if c >= threshold)
+        projection[key] = {
+            "current": len(values),
+            "projected": projected,
+            "change_pct": round(100.0 * (projected - len(values)) / len(values), 1),
+            "estimate": "exact" if threshold >= base_threshold else "lower_bound"
+        }
+    return projection
+
+
+def _epoch(value: Any) -> Optional[float]:
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+class ThresholdSnapshotReader:
+    """
+    Read side of the snapshot for RuleEvaluator: get(zone_id, rule_id, default).
+
+    The file's inode/mtime/size are checked at most every check_interval
+    seconds; a changed file is parsed off to the side and swapped in as one
+    reference assignment, so evaluations never see a half-applied snapshot.
+    Content is compared, not just the version number, so a snapshot is never
+    skipped for reusing a version.
+    """
+
+    def __init__(self, params_path: str, check_interval: float = 1.0):
+        self.params_path = params_path
+        self.check_interval = check_interval
+        self.version = 0
+        self._thresholds: Dict[str, float] = {}
+        self._stamp: Optional[Tuple[int, int, int]] = None
+        self._next_check = 0.0
+        self.refresh()
+
+    def refresh(self) -> bool:
+        """Reload the snapshot if the file changed. Returns True if the thresholds or version changed."""
+        self._next_check = time.monotonic() + self.check_interval
+        try:
+            st = os.stat(self.params_path)
+        except FileNotFoundError:
+            return False
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stamp == self._stamp:
+            return False
+        try:
+            with open(self.params_path, "r") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Keeping threshold snapshot v{self.version}: {e}")
+            return False
+        self._stamp = stamp
+        thresholds = dict(snapshot.get("thresholds", {}))
+        version = snapshot.get("version", 0)
+        if thresholds == self._thresholds and version == self.version:
+            return False
+        self._thresholds = thresholds
+        self.version = version
+        logger.info(f"Loaded threshold snapshot v{self.version}")
+        return True
+
+    def get(self, zone_id: Optional[str], rule_id: Optional[str], default: float) -> float:
+        if time.monotonic() >= self._next_check:
+            self.refresh()
+        thresholds = self._thresholds
+        threshold = thresholds.get(threshold_key(zone_id, rule_id))
+        if threshold is None:
+            threshold = thresholds.get(threshold_key(None, rule_id), default)
+        return threshold
+
+
+def main() -> None:
+    import argparse
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from feedback_manager import FeedbackProcessor
+
+    parser = argparse.ArgumentParser(description="Rebuild confidence thresholds from stored feedback")
+    parser.add_argument("--logs-dir", default="./logs")
+    parser.add_argument("--params", default=os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "thresholds.json"
+    ))
+    parser.add_argument("--alerts", help="NDJSON alerts to project the alert-volume change on")
+    args = parser.parse_args()
+
+    processor = FeedbackProcessor(logs_dir=args.logs_dir)
+    service = ThresholdService(args.params, auto_publish=False)
+    service.reset()
+    with open(processor.store.feedback_file, "r") as f:
+        applied = service.replay((json.loads(line) for line in f if line.strip()), processor)
+
+    sample = None
+    if args.alerts:
+        with open(args.alerts, "r") as f:
+            sample = [json.loads(line) for line in f if line.strip()]
+    snapshot = service.publish(sample)
+    print(f"✓ Applied {applied} feedback signals, published v{snapshot['version']} to {args.params}")
+    print(json.dumps({k: snapshot[k] for k in snapshot if k != "state"}, indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main()
@@ -0,0 +1,428 @@
+"""
+Alert Dispatcher Module
+Delivers formatted alerts to multiple sinks concurrently (local file, HTTP webhook,
+Unix socket) with per-sink bounded queues, batch delivery, exponential-backoff
+retries and a spill-to-disk queue for sinks that are down.
+
+dispatch() never waits: it only enqueues, so rule evaluation is never blocked by a
+slow or failing sink. Alerts that don't fit in a sink's queue, or whose delivery
+keeps failing, are spilled to disk and replayed when the dispatcher starts, after
+the next successful delivery, and every replay_interval while the sink is idle.
+Spill file I/O runs in worker threads, never on the event loop.
+"""
+
+import os
+import json
+import random
+import asyncio
+import logging
+import threading
+import urllib.request
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AlertSink:
+    """Base sink: subclasses deliver a batch or raise."""
+
+    name = "sink"
+
+    async def send_batch(self, alerts: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class FileSink(AlertSink):
+    """Appends alerts to a local NDJSON file."""
+
+    def __init__(self, path: str, name: str = "file"):
+        self.path = path
+        self.name = name
+
+    async def send_batch(self, alerts: List[Dict[str, Any]]) -> None:
+        chunk = "".join(json.dumps(a, separators=(",", ":"), default=str) + "\n" for a in alerts)
+        await asyncio.to_thread(self._append, chunk)
+
+    def _append(self, chunk: str) -> None:
+        with open(self.path, "a") as f:
+            f.write(chunk)
+
+
+class WebhookSink(AlertSink):
+    """POSTs each batch as a JSON array to an HTTP endpoint."""
+
+    def __init__(self, url: str, timeout: float = 5.0, name: str = "webhook"):
+        self.url = url
+        self.timeout = timeout
+        self.name = name
+
+    async def send_batch(self, alerts: List[Dict[str, Any]]) -> None:
+        body = json.dumps(alerts, separators=(",", ":"), default=str).encode("utf-8")
+        await asyncio.to_thread(self._post, body)
+
+    def _post(self, body: bytes) -> None:
+        request = urllib.request.Request(
+            self.url,
+            data=body,
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        # urlopen raises HTTPError for non-2xx responses
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class UnixSocketSink(AlertSink):
+    """Streams alerts as NDJSON over a Unix socket, reconnecting after errors."""
+
+    def __init__(self, path: str, name: str = "socket"):
+        self.path = path
+        self.name = name
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def send_batch(self, alerts: List[Dict[str, Any]]) -> None:
+        if self._writer is None or self._writer.is_closing():
+            _, self._writer = await asyncio.open_unix_connection(self.path)
+        chunk = "".join(json.dumps(a, separators=(",", ":"), default=str) + "\n" for a in alerts)
+        try:
+            self._writer.write(chunk.encode("utf-8"))
+            await self._writer.drain()
+        except (ConnectionError, OSError):
+            self._writer.close()
+            self._writer = None
+            raise
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class _SinkState:
+    """Queue, spill file and counters for one sink."""
+
+    def __init__(self, sink: AlertSink, queue_size: int, spill_dir: str):
+        self.sink = sink
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.spill_path = os.path.join(spill_dir, f"{sink.name}.spill.ndjson")
+        self.replay_path = self.spill_path + ".replay"
+        self.healthy = True
+        self.task: Optional[asyncio.Task] = None
+        # Batch taken off the queue but not yet delivered or spilled
+        self.in_flight: Optional[List[Dict[str, Any]]] = None
+        self.next_replay = 0.0
+        # Alerts that overflowed the queue, waiting for the overflow task to spill them
+        self.overflow: List[Dict[str, Any]] = []
+        self.overflow_task: Optional[asyncio.Task] = None
+        self.stats = {"sent": 0, "batches": 0, "retries": 0, "spilled": 0, "replayed": 0}
+        self._file_lock = threading.Lock()
+
+    def spill(self, alerts: List[Dict[str, Any]]) -> None:
+        """Append alerts to the spill file (blocking; call via asyncio.to_thread)."""
+        chunk = "".join(json.dumps(a, separators=(",", ":"), default=str) + "\n" for a in alerts)
+        with self._file_lock:
+            with open(self.spill_path, "a") as f:
+                f.write(chunk)
+            self.stats["spilled"] += len(alerts)
+
+    def take_spill(self) -> List[str]:
+        """Move the spill file aside for replay and read it (blocking)."""
+        with self._file_lock:
+            if not os.path.exists(self.replay_path):
+                if not os.path.exists(self.spill_path):
+                    return []
+                os.replace(self.spill_path, self.replay_path)
+            with open(self.replay_path, "r") as f:
+                return [line for line in f if line.strip()]
+
+    def return_spill(self, lines: List[str]) -> None:
+        """Put undelivered replay lines back in the spill file and drop the replay file (blocking)."""
+        with self._file_lock:
+            if lines:
+                with open(self.spill_path, "a") as f:
+                    f.writelines(lines)
+            if os.path.exists(self.replay_path):
+                os.remove(self.replay_path)
+
+    def has_spill(self) -> bool:
+        # A leftover replay file means a replay was interrupted
+        return os.path.exists(self.replay_path) or (
+            os.path.exists(self.spill_path) and os.path.getsize(self.spill_path) > 0
+        )
+
+
+class AlertDispatcher:
+    """Fans formatted alerts out to sinks without blocking the caller."""
+
+    def __init__(
+        self,
+        sinks: List[AlertSink],
+        queue_size: int = 10000,
+        batch_size: int = 100,
+        batch_interval: float = 0.5,
+        max_retries: int = 5,
+        base_backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        spill_dir: str = "./logs/spill",
+        replay_interval: float = 5.0
+    ):
+        """
+        Args:
+            sinks: Sinks to deliver to (names must be unique)
+            queue_size: Maximum queued alerts per sink before spilling to disk
+            batch_size: Maximum alerts per delivery
+            batch_interval: Seconds to wait for a batch to fill
+            max_retries: Delivery attempts before a batch is spilled
+            base_backoff: First retry delay in seconds (doubles per attempt)
+            max_backoff: Upper bound on the retry delay
+            spill_dir: Directory for per-sink spill files
+            replay_interval: Seconds between replay attempts while a sink is
+                             idle and its spill file is not empty
+        """
+        os.makedirs(spill_dir, exist_ok=True)
+        self.states = [_SinkState(sink, queue_size, spill_dir) for sink in sinks]
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.replay_interval = replay_interval
+        self._running = False
+
+    def dispatch(self, alert: Dict[str, Any]) -> None:
+        """Queue an alert for every sink. Must be called from the event loop thread."""
+        for state in self.states:
+            try:
+                state.queue.put_nowait(alert)
+            except asyncio.QueueFull:
+                # Spilling is file I/O: hand it to the overflow task, off the loop thread
+                state.overflow.append(alert)
+                if state.overflow_task is None or state.overflow_task.done():
+                    state.overflow_task = asyncio.get_running_loop().create_task(self._spill_overflow(state))
+
+    def dispatch_threadsafe(self, alert: Dict[str, Any], loop: asyncio.AbstractEventLoop) -> None:
+        """Queue an alert from a thread other than the event loop's."""
+        loop.call_soon_threadsafe(self.dispatch, alert)
+
+    async def start(self) -> None:
+        self._running = True
+        for state in self.states:
+            state.task = asyncio.create_task(self._run_sink(state))
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """
+        Deliver queued alerts (up to timeout), spill the rest and close sinks.
+
+        Sink tasks still running at the deadline are cancelled; the batch each
+        one was holding is spilled along with whatever is left in its queue.
+        """
+        self._running = False
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        for state in self.states:
+            if state.task is None or state.task.done():
+                continue
+            try:
+                # A full queue only drains while its sink task runs, so bound the wait
+                await asyncio.wait_for(state.queue.put(None), max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                pass
+
+        tasks = [s.task for s in self.states if s.task is not None and not s.task.done()]
+        pending = []
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=max(0.0, deadline - loop.time()))
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        for state in self.states:
+            if state.task is not None and not state.task.cancelled() and state.task.exception() is not None:
+                logger.error(f"Sink {state.sink.name} task failed: {state.task.exception()}")
+            if state.overflow_task is not None:
+                await state.overflow_task
+            remaining = state.in_flight or []
+            state.in_flight = None
+            remaining.extend(state.overflow)
+            state.overflow = []
+            while not state.queue.empty():
+                alert = state.queue.get_nowait()
+                if alert is not None:
+                    remaining.append(alert)
+            if remaining:
+                await asyncio.to_thread(state.spill, remaining)
+            await state.sink.close()
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            state.sink.name: {**state.stats, "queued": state.queue.qsize(), "healthy": state.healthy}
+            for state in self.states
+        }
+
+    async def _spill_overflow(self, state: _SinkState) -> None:
+        while state.overflow:
+            batch, state.overflow = state.overflow, []
+            await asyncio.to_thread(state.spill, batch)
+
+    async def _next_batch(self, state: _SinkState, wait: Optional[float] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Collect up to batch_size alerts; None once the stop sentinel arrives.
+
+        Args:
+            state: Sink to collect for
+            wait: Seconds to wait for the first alert (None = no limit); an
+                  empty batch is returned if none arrives
+        """
+        try:
+            first = await asyncio.wait_for(state.queue.get(), wait)
+        except asyncio.TimeoutError:
+            return []
+        if first is None:
+            return None
+
+        batch = [first]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_interval
+        while len(batch) < self.batch_size:
+            if state.queue.empty():
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    alert = await asyncio.wait_for(state.queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                alert = state.queue.get_nowait()
+            if alert is None:
+                # Put the sentinel back so the loop ends after this batch
+                state.queue.put_nowait(None)
+                break
+            batch.append(alert)
+        return batch
+
+    async def _run_sink(self, state: _SinkState) -> None:
+        loop = asyncio.get_running_loop()
+        if state.has_spill():
+            await self._replay_spill(state)
+
+        while True:
+            wait = None
+            if state.has_spill():
+                wait = max(0.0, state.next_replay - loop.time())
+            batch = await self._next_batch(state, wait)
+            if batch is None:
+                return
+            if not batch:
+                # Idle with a spill pending: try the sink again
+                await self._replay_spill(state)
+                continue
+
+            state.in_flight = batch
+            if await self._deliver(state, batch):
+                state.in_flight = None
+                if state.has_spill():
+                    await self._replay_spill(state)
+            else:
+                # The spill thread finishes even if this task is cancelled meanwhile
+                state.in_flight = None
+                await asyncio.to_thread(state.spill, batch)
+
+    async def _deliver(self, state: _SinkState, batch: List[Dict[str, Any]]) -> bool:
+        """Send a batch with exponential backoff; False if every attempt failed."""
+        for attempt in range(self.max_retries):
+            try:
+                await state.sink.send_batch(batch)
+                state.stats["sent"] += len(batch)
+                state.stats["batches"] += 1
+                if not state.healthy:
+                    logger.info(f"Sink {state.sink.name} recovered")
+                state.healthy = True
+                return True
+            except Exception as e:
+                state.stats["retries"] += 1
+                if state.healthy:
+                    logger.warning(f"Sink {state.sink.name} delivery failed: {e}")
+                if attempt + 1 == self.max_retries or not self._running:
+                    break
+                delay = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+
+        state.healthy = False
+        return False
+
+    async def _replay_spill(self, state: _SinkState) -> None:
+        """Re-send spilled alerts; anything still undelivered goes back to the spill file."""
+        lines = await asyncio.to_thread(state.take_spill)
+
+        delivered = 0
+        for i in range(0, len(lines), self.batch_size):
+            batch = [json.loads(line) for line in lines[i:i + self.batch_size]]
+            if not await self._deliver(state, batch):
+                break
+            delivered = i + len(batch)
+            state.stats["replayed"] += len(batch)
+
+        await asyncio.to_thread(state.return_spill, lines[delivered:])
+        state.next_replay = asyncio.get_running_loop().time() + self.replay_interval
+
+
+if __name__ == "__main__":
+    import tempfile
+    import threading
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    logging.basicConfig(level=logging.INFO)
+
+    received = []
+
+    class StubWebhook(BaseHTTPRequestHandler):
+        """Local stub that rejects the first few requests."""
+        failures_left = 3
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            if StubWebhook.failures_left > 0:
+                StubWebhook.failures_left -= 1
+                self.send_response(503)
+            else:
+                received.extend(json.loads(body))
+                self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), StubWebhook)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    async def demo() -> None:
+        workdir = tempfile.mkdtemp()
+        dispatcher = AlertDispatcher(
+            [
+                FileSink(os.path.join(workdir, "alerts.ndjson")),
+                WebhookSink(f"http://127.0.0.1:{server.server_port}/alerts"),
+            ],
+            batch_size=50,
+            batch_interval=0.05,
+            max_retries=2,
+            base_backoff=0.05,
+            spill_dir=os.path.join(workdir, "spill")
+        )
+        await dispatcher.start()
+
+        for i in range(500):
+            dispatcher.dispatch({"alert_id": f"ALT-{i}", "zone_id": "ZONE_A", "severity": "HIGH"})
+            if i % 100 == 0:
+                await asyncio.sleep(0.2)
+
+        await asyncio.sleep(0.5)
+        await dispatcher.stop()
+        print(f"✓ Webhook received {len(received)} alerts")
+        print(f"✓ Stats: {json.dumps(dispatcher.get_stats(), indent=2)}")
+
+    asyncio.run(demo())
+    server.shutdown()
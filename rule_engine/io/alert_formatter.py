@@ -4,12 +4,15 @@ Creates structured alert JSON with severity, reason, timestamp, and rule evaluat
 """
 
 import json
+import time
 import logging
-from typing import Dict, Any, Optional, List, Tuple
-from datetime import datetime
+from typing import Dict, Any, Optional, List, Tuple, Iterable, Iterator, Callable, Union, TextIO
+from datetime import datetime, timezone
 from dataclasses import dataclass, asdict
 from enum import Enum
 
+from id_generator import SnowflakeGenerator
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -47,14 +50,18 @@ class AlertContent:
 class AlertFormatter:
     """Formats validated input into structured alert JSON."""
     
-    def __init__(self):
+    def __init__(self, worker_id: Optional[int] = None):
+        """
+        Args:
+            worker_id: Snowflake worker ID (0-1023), unique per running formatter process
+        """
         self.alert_counter = 0
+        self.id_generator = SnowflakeGenerator(worker_id)
     
     def create_alert_id(self) -> str:
-        """Generate unique alert ID."""
+        """Generate unique alert ID (snowflake: time + worker ID + sequence)."""
         self.alert_counter += 1
-        timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-        return f"ALT-{timestamp}-{self.alert_counter:05d}"
+        return f"ALT-{self.id_generator.next_id()}"
     
     def format_alert(
         self,
@@ -64,7 +71,9 @@ class AlertFormatter:
         original_data: Dict[str, Any],
         rule_results: Dict[str, Any],
         received_at: str,
-        evaluated_rules: Optional[List[str]] = None
+        evaluated_rules: Optional[List[str]] = None,
+        received_monotonic_ns: Optional[int] = None,
+        trace: Any = None
     ) -> Dict[str, Any]:
         """
         Create structured alert JSON.
@@ -77,20 +86,23 @@ class AlertFormatter:
             rule_results: Results from rule evaluation (from Isha's evaluator)
             received_at: Timestamp when input was received
             evaluated_rules: List of rule IDs that were evaluated
+            received_monotonic_ns: time.monotonic_ns() taken at ingest; preferred
+                over received_at for processing time when available
+            trace: Sampled TraceContext; its stage timings so far are recorded
+                under metadata["trace"]
             
         Returns:
             Formatted alert dictionary
         """
         alert_id = self.create_alert_id()
-        created_at = datetime.utcnow().isoformat() + "Z"
+        created_dt = datetime.now(timezone.utc)
+        created_at = created_dt.replace(tzinfo=None).isoformat() + "Z"
         
         # Calculate processing time
-        try:
-            received_dt = datetime.fromisoformat(received_at.replace('Z', '+00:00'))
-            created_dt = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-            processing_time_ms = (created_dt - received_dt).total_seconds() * 1000
-        except Exception:
-            processing_time_ms = 0.0
+        if received_monotonic_ns is not None:
+            processing_time_ms = (time.monotonic_ns() - received_monotonic_ns) / 1e6
+        else:
+            processing_time_ms = self._elapsed_ms(received_at, created_dt)
         
         # Construct alert
         alert = {
@@ -109,10 +121,25 @@ class AlertFormatter:
             "rule_results": rule_results,
             "status": "GENERATED"
         }
+
+        if trace is not None and trace.sampled:
+            trace.mark("format")
+            alert["metadata"]["trace"] = trace.summary()
         
-        logger.info(f"Alert created: {alert_id} (Zone: {zone_id}, Severity: {severity})")
+        logger.debug(f"Alert created: {alert_id} (Zone: {zone_id}, Severity: {severity})")
         return alert
     
+    @staticmethod
+    def _elapsed_ms(received_at: str, created_dt: datetime) -> float:
+        """Wall-clock ms between an ISO receive time (naive = UTC) and creation."""
+        try:
+            received_dt = datetime.fromisoformat(received_at.replace('Z', '+00:00'))
+        except (AttributeError, ValueError):
+            return 0.0
+        if received_dt.tzinfo is None:
+            received_dt = received_dt.replace(tzinfo=timezone.utc)
+        return (created_dt - received_dt).total_seconds() * 1000
+    
     @staticmethod
     def _normalize_severity(severity: str) -> str:
         """Normalize severity to valid level."""
@@ -120,6 +147,30 @@ class AlertFormatter:
         normalized = severity.upper()
         return normalized if normalized in valid_severities else 'MEDIUM'
     
+    def iter_batch_alerts(
+        self,
+        alerts_data: Iterable[Dict[str, Any]]
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Format alerts lazily, one at a time.
+        
+        Args:
+            alerts_data: Iterable of alert data dictionaries
+            
+        Yields:
+            Formatted alert dictionaries
+        """
+        for alert in alerts_data:
+            yield self.format_alert(
+                zone_id=alert['zone_id'],
+                severity=alert['severity'],
+                reason=alert['reason'],
+                original_data=alert['data'],
+                rule_results=alert.get('rule_results', {}),
+                received_at=alert.get('received_at', datetime.utcnow().isoformat()),
+                received_monotonic_ns=alert.get('received_monotonic_ns')
+            )
+    
     def format_batch_alerts(
         self,
         alerts_data: List[Dict[str, Any]]
@@ -127,23 +178,15 @@ class AlertFormatter:
         """
         Format multiple alerts as a batch.
         
+        Holds the whole batch in memory; use stream_batch_alerts for large bursts.
+        
         Args:
             alerts_data: List of alert data dictionaries
             
         Returns:
             Batch alert structure
         """
-        alerts = [
-            self.format_alert(
-                zone_id=alert['zone_id'],
-                severity=alert['severity'],
-                reason=alert['reason'],
-                original_data=alert['data'],
-                rule_results=alert.get('rule_results', {}),
-                received_at=alert.get('received_at', datetime.utcnow().isoformat())
-            )
-            for alert in alerts_data
-        ]
+        alerts = list(self.iter_batch_alerts(alerts_data))
         
         return {
             "batch_id": f"BATCH-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}",
@@ -152,17 +195,124 @@ class AlertFormatter:
             "alerts": alerts
         }
     
-    def format_for_output(self, alert: Dict[str, Any]) -> str:
+    def stream_batch_alerts(
+        self,
+        alerts_data: Iterable[Dict[str, Any]],
+        writer: "AlertStreamWriter"
+    ) -> int:
+        """
+        Format alerts and write each to a stream writer as it is produced.
+        
+        Args:
+            alerts_data: Iterable of alert data dictionaries
+            writer: Destination NDJSON writer
+            
+        Returns:
+            Number of alerts written
+        """
+        count = 0
+        for alert in self.iter_batch_alerts(alerts_data):
+            writer.write(alert)
+            count += 1
+        return count
+    
+    def format_for_output(self, alert: Dict[str, Any], pretty: bool = False) -> str:
         """
         Format alert for downstream output (UI, captioning, etc).
         
         Args:
             alert: Alert dictionary
+            pretty: Indent the JSON (debugging only; slower and larger)
             
         Returns:
             JSON string representation
         """
-        return json.dumps(alert, indent=2, default=str)
+        if pretty:
+            return json.dumps(alert, indent=2, default=str)
+        return json.dumps(alert, separators=(',', ':'), default=str)
+
+
+class AlertStreamWriter:
+    """
+    Writes alerts to a sink as compact NDJSON, buffering between flushes.
+    
+    A flush happens when the buffer reaches `max_bytes` or `max_alerts`, or when
+    `flush_interval` seconds have passed since the last flush (checked on write
+    and by `maybe_flush`, which idle callers can invoke periodically).
+    """
+    
+    def __init__(
+        self,
+        sink: Union[TextIO, Callable[[str], Any]],
+        max_bytes: int = 64 * 1024,
+        max_alerts: int = 500,
+        flush_interval: float = 1.0,
+        pretty: bool = False
+    ):
+        """
+        Args:
+            sink: Text file object, or callable receiving each flushed chunk
+            max_bytes: Buffered bytes that trigger a flush
+            max_alerts: Buffered alerts that trigger a flush
+            flush_interval: Maximum seconds an alert waits in the buffer
+            pretty: Indented JSON records (debugging only; not valid NDJSON)
+        """
+        self._write = sink if callable(sink) else sink.write
+        self._sink_flush = getattr(sink, 'flush', None)
+        self.max_bytes = max_bytes
+        self.max_alerts = max_alerts
+        self.flush_interval = flush_interval
+        self.pretty = pretty
+        
+        self._buffer: List[str] = []
+        self._buffered_bytes = 0
+        self._last_flush = time.monotonic()
+        self.alerts_written = 0
+        self.flushes = 0
+    
+    def write(self, alert: Dict[str, Any]) -> None:
+        """Serialize one alert into the buffer, flushing if a threshold is hit."""
+        if self.pretty:
+            line = json.dumps(alert, indent=2, default=str) + '\n'
+        else:
+            line = json.dumps(alert, separators=(',', ':'), default=str) + '\n'
+        
+        self._buffer.append(line)
+        self._buffered_bytes += len(line)
+        self.alerts_written += 1
+        
+        if (self._buffered_bytes >= self.max_bytes
+                or len(self._buffer) >= self.max_alerts
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+    
+    def maybe_flush(self) -> None:
+        """Flush if the time threshold has passed."""
+        if self._buffer and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+    
+    def flush(self) -> None:
+        """Write all buffered alerts to the sink in one call."""
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        
+        chunk = ''.join(self._buffer)
+        self._buffer.clear()
+        self._buffered_bytes = 0
+        self._write(chunk)
+        if self._sink_flush is not None:
+            self._sink_flush()
+        self.flushes += 1
+    
+    def close(self) -> None:
+        self.flush()
+    
+    def __enter__(self) -> "AlertStreamWriter":
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.close()
 
 
 class AlertValidator:
@@ -196,7 +346,7 @@ class AlertValidator:
             logger.error(error_msg)
             return False, error_msg
         
-        logger.info(f"Alert {alert['alert_id']} validation successful")
+        logger.debug(f"Alert {alert['alert_id']} validation successful")
         return True, ""
 
 
@@ -218,8 +368,20 @@ if __name__ == "__main__":
     )
     
     print("✓ Formatted Alert:")
-    print(json.dumps(alert, indent=2))
+    print(formatter.format_for_output(alert, pretty=True))
     
     # Validate
     is_valid, error = AlertValidator.validate_alert(alert)
     print(f"\n✓ Alert validation: {'PASSED' if is_valid else f'FAILED - {error}'}")
+    
+    # Stream a burst of alerts as compact NDJSON
+    from io import StringIO
+    sink = StringIO()
+    burst = (
+        {'zone_id': 'ZONE_A', 'severity': 'LOW', 'reason': f'Burst {i}', 'data': {'i': i}}
+        for i in range(2000)
+    )
+    logging.getLogger(__name__).setLevel(logging.WARNING)
+    with AlertStreamWriter(sink, max_alerts=500) as writer:
+        count = formatter.stream_batch_alerts(burst, writer)
+    print(f"✓ Streamed {count} alerts in {writer.flushes} flushes ({len(sink.getvalue())} bytes NDJSON)")
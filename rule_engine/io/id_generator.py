@@ -0,0 +1,240 @@
+"""
+ID Generator Module
+Snowflake-style 63-bit IDs: millisecond timestamp + worker ID + per-millisecond sequence.
+IDs are unique across threads and, given distinct worker IDs, across processes and hosts.
+
+Worker IDs are held as flock'd slot files (`worker-<id>.lock`) in a lock
+directory, so two live processes on a host can never issue IDs under the same
+worker ID. Explicit IDs (argument or SNOWFLAKE_WORKER_ID) claim their slot and
+fail loudly if another process holds it; otherwise a free slot is leased,
+counting down from 1023 to stay clear of small explicit IDs such as shard
+slots. Across hosts, assign explicit IDs.
+
+Generators in one process that claim the same worker ID share one sequence.
+In a forked child, generators with a leased ID lease a fresh slot; those
+with an explicit ID stop issuing IDs (the slot still belongs to the parent),
+so the child must create its own generator with an ID of its own.
+"""
+
+import os
+import time
+import fcntl
+import weakref
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+# Custom epoch (2025-01-01T00:00:00Z) keeps 41 timestamp bits good for ~69 years
+EPOCH_MS = 1735689600000
+
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+
+DEFAULT_LOCK_DIR = os.path.join(tempfile.gettempdir(), "snowflake-workers")
+
+
+
+class _Slot:
+    """A worker ID held by this process: its slot lock fd, holder count and shared sequence."""
+
+    __slots__ = ("fd", "holders", "lock", "last_ms", "sequence")
+
+    def __init__(self, fd: int):
+        self.fd = fd
+        self.holders = 1
+        self.lock = threading.Lock()
+        self.last_ms = -1
+        self.sequence = 0
+
+
+# (lock_dir, worker_id) -> slot held by this process
+_claims: Dict[Tuple[str, int], _Slot] = {}
+_claims_lock = threading.Lock()
+_generators: "weakref.WeakSet[SnowflakeGenerator]" = weakref.WeakSet()
+
+
+def _lock_dir(lock_dir: Optional[str]) -> str:
+    return os.path.abspath(lock_dir or os.environ.get("SNOWFLAKE_LOCK_DIR") or DEFAULT_LOCK_DIR)
+
+
+def _try_lock(lock_dir: str, worker_id: int) -> Optional[int]:
+    """fd holding the slot file's exclusive flock, or None if it is taken."""
+    os.makedirs(lock_dir, exist_ok=True)
+    fd = os.open(os.path.join(lock_dir, f"worker-{worker_id}.lock"), os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def claim_worker_id(worker_id: Optional[int] = None, lock_dir: Optional[str] = None) -> int:
+    """
+    Hold a worker ID slot for this process.
+
+    Args:
+        worker_id: Slot to claim (shared by later claims in this process), or
+                   None to lease a free slot of its own
+        lock_dir: Slot file directory (default SNOWFLAKE_LOCK_DIR or <tmp>/snowflake-workers)
+
+    Returns:
+        The worker ID
+
+    Raises:
+        RuntimeError: The slot is held by another process, or none is free
+    """
+    return _claim(worker_id, lock_dir)[0]
+
+
+def _claim(worker_id: Optional[int], lock_dir: Optional[str]) -> Tuple[int, _Slot]:
+    lock_dir = _lock_dir(lock_dir)
+    with _claims_lock:
+        if worker_id is not None:
+            slot = _claims.get((lock_dir, worker_id))
+            if slot is not None:
+                slot.holders += 1
+                return worker_id, slot
+            fd = _try_lock(lock_dir, worker_id)
+            if fd is None:
+                raise RuntimeError(f"Snowflake worker ID {worker_id} is held by another process ({lock_dir})")
+            slot = _claims[(lock_dir, worker_id)] = _Slot(fd)
+            return worker_id, slot
+
+        for candidate in range(MAX_WORKER_ID, -1, -1):
+            if (lock_dir, candidate) in _claims:
+                continue
+            fd = _try_lock(lock_dir, candidate)
+            if fd is not None:
+                slot = _claims[(lock_dir, candidate)] = _Slot(fd)
+                return candidate, slot
+        raise RuntimeError(f"No free Snowflake worker ID in {lock_dir}")
+
+
+def release_worker_id(worker_id: int, lock_dir: Optional[str] = None) -> None:
+    """Drop one hold on a claimed slot; the slot is freed when the last hold goes."""
+    lock_dir = _lock_dir(lock_dir)
+    with _claims_lock:
+        slot = _claims.get((lock_dir, worker_id))
+        if slot is None:
+            return
+        slot.holders -= 1
+        if slot.holders <= 0:
+            del _claims[(lock_dir, worker_id)]
+            os.close(slot.fd)
+
+
+def _after_fork_in_child() -> None:
+    # Inherited slot locks are the parent's: leased generators take fresh slots,
+    # explicit ones are retired rather than share the parent's worker ID
+    global _claims_lock
+    _claims_lock = threading.Lock()
+    for slot in _claims.values():
+        os.close(slot.fd)
+    _claims.clear()
+    for generator in list(_generators):
+        generator._reset_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def _env_worker_id() -> Optional[int]:
+    env = os.environ.get("SNOWFLAKE_WORKER_ID")
+    return int(env) if env is not None else None
+
+
+class SnowflakeGenerator:
+    """Thread-safe generator of time-ordered unique integer IDs."""
+
+    def __init__(self, worker_id: Optional[int] = None, lock_dir: Optional[str] = None):
+        """
+        Args:
+            worker_id: 0-1023; unique per concurrently running process.
+                       Defaults to SNOWFLAKE_WORKER_ID, else a leased free slot.
+            lock_dir: Slot file directory; generators whose IDs only need to
+                      be unique among writers of one store can pass a
+                      directory next to it
+        """
+        if worker_id is None:
+            worker_id = _env_worker_id()
+        if worker_id is not None and not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"worker_id must be in [0, {MAX_WORKER_ID}], got {worker_id}")
+
+        self._auto_worker = worker_id is None
+        self._lock_dir = lock_dir
+        self.worker_id, self._slot = _claim(worker_id, lock_dir)
+        self._release = weakref.finalize(self, release_worker_id, self.worker_id, lock_dir)
+        # A forked child must not keep issuing IDs under its parent's worker ID
+        _generators.add(self)
+
+    def _reset_after_fork(self) -> None:
+        self._release.detach()
+        if not self._auto_worker:
+            self._slot = None
+            return
+        self.worker_id, self._slot = _claim(None, self._lock_dir)
+        self._release = weakref.finalize(self, release_worker_id, self.worker_id, self._lock_dir)
+
+    def close(self) -> None:
+        """Release the worker ID slot (also done when the generator is collected)."""
+        self._release()
+        _generators.discard(self)
+
+    def next_id(self) -> int:
+        slot = self._slot
+        if slot is None:
+            raise RuntimeError(
+                f"Snowflake worker ID {self.worker_id} belongs to the parent process; "
+                "create a new generator after fork"
+            )
+        with slot.lock:
+            now_ms = time.time_ns() // 1_000_000 - EPOCH_MS
+
+            if now_ms <= slot.last_ms:
+                # Same millisecond, or the wall clock stepped back: keep counting
+                # on the last timestamp so IDs stay unique and ordered.
+                now_ms = slot.last_ms
+                slot.sequence = (slot.sequence + 1) & SEQUENCE_MASK
+                if slot.sequence == 0:
+                    # 4096 IDs issued this millisecond; borrow the next one
+                    now_ms += 1
+            else:
+                slot.sequence = 0
+
+            slot.last_ms = now_ms
+            return (now_ms << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | slot.sequence
+
+
+def id_timestamp(snowflake: int) -> datetime:
+    """UTC creation time encoded in a snowflake ID."""
+    ms = (snowflake >> (WORKER_BITS + SEQUENCE_BITS)) + EPOCH_MS
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+
+
+def id_worker(snowflake: int) -> int:
+    """Worker ID encoded in a snowflake ID."""
+    return (snowflake >> SEQUENCE_BITS) & MAX_WORKER_ID
+
+
+if __name__ == "__main__":
+    generator = SnowflakeGenerator(worker_id=7)
+    ids = set()
+
+    def issue(count: int) -> None:
+        for _ in range(count):
+            ids.add(generator.next_id())
+
+    threads = [threading.Thread(target=issue, args=(50000,)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    sample = max(ids)
+    print(f"✓ {len(ids)} unique IDs from 4 threads (expected 200000)")
+    print(f"✓ Latest ID {sample}: worker {id_worker(sample)}, created {id_timestamp(sample).isoformat()}")
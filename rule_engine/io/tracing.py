@@ -0,0 +1,199 @@
+"""
+Tracing Module
+Lightweight trace context carried from frame capture to alert logging. Each stage
+boundary is a `mark(stage)` call that adds the monotonic time since the previous
+mark to that stage, so interleaved per-detection work (zone lookup, rule
+evaluation, ...) accumulates per stage across a whole frame.
+
+Only sampled frames carry a real context; the rest get NULL_TRACE, whose mark()
+does nothing, so tracing is cheap at full load. Timestamps use the system-wide
+monotonic clock and are comparable across processes on the same host.
+"""
+
+import math
+import time
+from typing import Dict, Any, Optional
+
+from id_generator import SnowflakeGenerator
+
+
+class TraceContext:
+    """Per-frame stage timings (nanoseconds, accumulated per stage)."""
+
+    __slots__ = ("trace_id", "start_ns", "checkpoint_ns", "stages")
+    sampled = True
+
+    def __init__(self, trace_id: int, start_ns: Optional[int] = None):
+        self.trace_id = trace_id
+        self.start_ns = time.monotonic_ns() if start_ns is None else start_ns
+        self.checkpoint_ns = self.start_ns
+        self.stages: Dict[str, int] = {}
+
+    def mark(self, stage: str, at_ns: Optional[int] = None) -> None:
+        """
+        Close the current stage: time since the previous mark is added to it.
+
+        Args:
+            stage: Stage name
+            at_ns: time.monotonic_ns() at which the stage ended (None = now)
+        """
+        now = time.monotonic_ns() if at_ns is None else max(at_ns, self.checkpoint_ns)
+        self.stages[stage] = self.stages.get(stage, 0) + now - self.checkpoint_ns
+        self.checkpoint_ns = now
+
+    def total_ms(self) -> float:
+        return (self.checkpoint_ns - self.start_ns) / 1e6
+
+    def stage_ms(self) -> Dict[str, float]:
+        return {stage: round(ns / 1e6, 3) for stage, ns in self.stages.items()}
+
+    def summary(self) -> Dict[str, Any]:
+        """Alert metadata form."""
+        return {"trace_id": str(self.trace_id), "stages_ms": self.stage_ms(), "total_ms": round(self.total_ms(), 3)}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Wire form for carrying the trace inside detection events."""
+        return {"trace_id": self.trace_id, "start_ns": self.start_ns,
+                "checkpoint_ns": self.checkpoint_ns, "stages": dict(self.stages)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TraceContext":
+        trace = cls(data["trace_id"], data["start_ns"])
+        trace.checkpoint_ns = data.get("checkpoint_ns", trace.start_ns)
+        trace.stages = dict(data.get("stages", {}))
+        return trace
+
+
+class _NullTrace:
+    """Stand-in for unsampled frames."""
+
+    __slots__ = ()
+    sampled = False
+    trace_id = None
+
+    def mark(self, stage: str, at_ns: Optional[int] = None) -> None:
+        pass
+
+    def summary(self) -> None:
+        return None
+
+    def to_dict(self) -> None:
+        return None
+
+
+NULL_TRACE = _NullTrace()
+
+
+class LatencyReport:
+    """
+    Aggregated per-stage latency using fixed log-scale histograms.
+
+    Recording is O(1) and memory is constant; percentiles are accurate to one
+    bucket (a factor of 2^(1/4) ≈ 19%).
+    """
+
+    BUCKETS_PER_OCTAVE = 4
+    NUM_BUCKETS = 120  # up to ~2^30 µs
+
+    def __init__(self):
+        self.histograms: Dict[str, list] = {}
+        self.counts: Dict[str, int] = {}
+        self.sums_us: Dict[str, float] = {}
+        self.max_us: Dict[str, float] = {}
+
+    def record(self, stage: str, duration_us: float) -> None:
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = [0] * self.NUM_BUCKETS
+            self.counts[stage] = 0
+            self.sums_us[stage] = 0.0
+            self.max_us[stage] = 0.0
+
+        index = int(math.log2(duration_us) * self.BUCKETS_PER_OCTAVE) if duration_us > 1 else 0
+        histogram[min(index, self.NUM_BUCKETS - 1)] += 1
+        self.counts[stage] += 1
+        self.sums_us[stage] += duration_us
+        if duration_us > self.max_us[stage]:
+            self.max_us[stage] = duration_us
+
+    def record_trace(self, trace: TraceContext) -> None:
+        for stage, ns in trace.stages.items():
+            self.record(stage, ns / 1000)
+        self.record("total", (trace.checkpoint_ns - trace.start_ns) / 1000)
+
+    def _percentile_us(self, stage: str, pct: float) -> float:
+        target = self.counts[stage] * pct / 100
+        seen = 0
+        for index, count in enumerate(self.histograms[stage]):
+            seen += count
+            if count and seen >= target:
+                # Upper edge of the bucket
+                return 2 ** ((index + 1) / self.BUCKETS_PER_OCTAVE)
+        return self.max_us[stage]
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage count, mean, p50/p95/p99 and max in milliseconds."""
+        return {
+            stage: {
+                "count": self.counts[stage],
+                "mean_ms": round(self.sums_us[stage] / self.counts[stage] / 1000, 3),
+                "p50_ms": round(min(self._percentile_us(stage, 50), self.max_us[stage]) / 1000, 3),
+                "p95_ms": round(min(self._percentile_us(stage, 95), self.max_us[stage]) / 1000, 3),
+                "p99_ms": round(min(self._percentile_us(stage, 99), self.max_us[stage]) / 1000, 3),
+                "max_ms": round(self.max_us[stage] / 1000, 3)
+            }
+            for stage in self.histograms
+        }
+
+
+class Tracer:
+    """Starts sampled traces and aggregates finished ones into a LatencyReport."""
+
+    def __init__(self, sample_rate: float = 0.01, worker_id: Optional[int] = None):
+        """
+        Args:
+            sample_rate: Fraction of frames traced (deterministic every-Nth sampling)
+            worker_id: Snowflake worker ID for trace IDs
+        """
+        self.sample_every = max(1, round(1 / sample_rate)) if sample_rate > 0 else 0
+        self.ids = SnowflakeGenerator(worker_id)
+        self.report = LatencyReport()
+        self._count = 0
+
+    def start(self, start_ns: Optional[int] = None):
+        """New trace for a frame, or NULL_TRACE if the frame isn't sampled."""
+        if not self.sample_every:
+            return NULL_TRACE
+        self._count += 1
+        if self._count % self.sample_every:
+            return NULL_TRACE
+        return TraceContext(self.ids.next_id(), start_ns)
+
+    def resume(self, data: Optional[Dict[str, Any]], start_ns: Optional[int] = None):
+        """Continue an upstream trace carried in an event, or sample a new one."""
+        if data:
+            return TraceContext.from_dict(data)
+        return self.start(start_ns)
+
+    def finish(self, trace) -> None:
+        if trace.sampled:
+            self.report.record_trace(trace)
+
+
+if __name__ == "__main__":
+    tracer = Tracer(sample_rate=0.5)
+
+    for frame in range(1000):
+        trace = tracer.start()
+        time.sleep(0)
+        trace.mark("detection")
+        for _ in range(5):
+            sum(range(200))
+            trace.mark("zone_lookup")
+            sum(range(100))
+            trace.mark("rule_eval")
+        trace.mark("format")
+        tracer.finish(trace)
+
+    for stage, stats in tracer.report.summary().items():
+        print(f"✓ {stage:12s} {stats}")
@@ -0,0 +1,274 @@
+"""
+Wire Format Module
+Versioned binary frame format for detection events between the YOLO service and
+the rule engine, with a JSON fallback for debugging.
+
+Frame layout (little-endian):
+    header (32 bytes)
+        magic        4s   b"DETF"
+        version      u8
+        flags        u8   bit 0: boxes are float32 (otherwise int32)
+        camera_len   u16  length of the UTF-8 camera ID
+        frame_size   u32  total frame size in bytes, header included
+        timestamp    f64  frame capture time (seconds since epoch)
+        frame_id     u64
+        count        u32  number of detections
+    camera_id    camera_len bytes, zero-padded to a multiple of 8
+    boxes        count x 4 int32/float32 (x1, y1, x2, y2)
+    track_ids    count int32 (-1 = untracked)
+    confidences  count float32
+    class_ids    count int16
+
+Decoding returns NumPy views over the buffer, so no Python object is created per
+detection until a consumer asks for dicts.
+"""
+
+import json
+import struct
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Iterator, Tuple, Union
+
+import numpy as np
+
+MAGIC = b"DETF"
+VERSION = 1
+FLAG_FLOAT_BOXES = 0x01
+
+HEADER = struct.Struct("<4sBBHIdQI")
+HEADER_SIZE = HEADER.size  # 32
+
+MEDIA_TYPE = "application/x-detection-frame"
+
+
+@dataclass
+class DetectionFrame:
+    """One camera frame of detections backed by NumPy arrays."""
+    camera_id: str
+    timestamp: float
+    frame_id: int
+    boxes: np.ndarray        # (N, 4) int32 or float32
+    track_ids: np.ndarray    # (N,) int32, -1 = untracked
+    class_ids: np.ndarray    # (N,) int16
+    confidences: np.ndarray  # (N,) float32
+
+    def __len__(self) -> int:
+        return len(self.track_ids)
+
+    def to_detections(self) -> List[Dict[str, Any]]:
+        """Materialise per-detection dicts in the shape the rule pipeline expects."""
+        boxes = self.boxes.tolist()
+        track_ids = self.track_ids.tolist()
+        class_ids = self.class_ids.tolist()
+        confidences = self.confidences.tolist()
+
+        return [
+            {
+                "id": track_ids[i] if track_ids[i] >= 0 else None,
+                "bbox": boxes[i],
+                "class_id": class_ids[i],
+                "confidence": round(confidences[i], 4)
+            }
+            for i in range(len(track_ids))
+        ]
+
+    def detection(self, index: int) -> Dict[str, Any]:
+        """One detection as a dict (same shape as to_detections entries)."""
+        track_id = int(self.track_ids[index])
+        return {
+            "id": track_id if track_id >= 0 else None,
+            "bbox": self.boxes[index].tolist(),
+            "class_id": int(self.class_ids[index]),
+            "confidence": round(float(self.confidences[index]), 4)
+        }
+
+    def to_json(self) -> Dict[str, Any]:
+        """JSON-friendly dict (same shape as the YOLO service JSON response)."""
+        return {
+            "camera_id": self.camera_id,
+            "timestamp": self.timestamp,
+            "frame_id": self.frame_id,
+            "detections": self.to_detections()
+        }
+
+
+def encode_frame(
+    camera_id: str,
+    timestamp: float,
+    boxes: Any,
+    track_ids: Any = None,
+    class_ids: Any = None,
+    confidences: Any = None,
+    frame_id: int = 0
+) -> bytes:
+    """
+    Encode one frame of detections.
+
+    Args:
+        camera_id: Camera identifier
+        timestamp: Frame capture time in seconds
+        boxes: (N, 4) array-like of x1, y1, x2, y2; integer boxes are sent as int32
+        track_ids: (N,) tracker IDs, None = all untracked
+        class_ids: (N,) class indices, None = all 0 (person)
+        confidences: (N,) detection confidences, None = all 1.0
+        frame_id: Monotonic frame counter
+
+    Returns:
+        Encoded frame bytes
+    """
+    boxes = np.asarray(boxes)
+    if boxes.size == 0:
+        boxes = boxes.reshape(0, 4)
+    n = boxes.shape[0]
+
+    flags = 0
+    if np.issubdtype(boxes.dtype, np.integer):
+        boxes = boxes.astype("<i4", copy=False)
+    else:
+        boxes = boxes.astype("<f4", copy=False)
+        flags |= FLAG_FLOAT_BOXES
+
+    track_ids = (np.full(n, -1, dtype="<i4") if track_ids is None
+                 else np.asarray(track_ids).astype("<i4", copy=False))
+    class_ids = (np.zeros(n, dtype="<i2") if class_ids is None
+                 else np.asarray(class_ids).astype("<i2", copy=False))
+    confidences = (np.ones(n, dtype="<f4") if confidences is None
+                   else np.asarray(confidences).astype("<f4", copy=False))
+
+    camera = camera_id.encode("utf-8")
+    padded_len = (len(camera) + 7) & ~7
+    frame_size = HEADER_SIZE + padded_len + n * (16 + 4 + 4 + 2)
+
+    out = bytearray(frame_size)
+    HEADER.pack_into(out, 0, MAGIC, VERSION, flags, len(camera), frame_size,
+                     float(timestamp), frame_id, n)
+    offset = HEADER_SIZE
+    out[offset:offset + len(camera)] = camera
+    offset += padded_len
+
+    for array in (boxes, track_ids, confidences, class_ids):
+        raw = np.ascontiguousarray(array).tobytes()
+        out[offset:offset + len(raw)] = raw
+        offset += len(raw)
+
+    return bytes(out)
+
+
+def peek_frame_size(header: bytes) -> int:
+    """Total frame size from the first HEADER_SIZE bytes (for stream framing)."""
+    magic, version, _, _, frame_size, _, _, _ = HEADER.unpack_from(header, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a detection frame (bad magic)")
+    if version != VERSION:
+        raise ValueError(f"Unsupported detection frame version: {version}")
+    return frame_size
+
+
+def decode_frame(buffer: Union[bytes, bytearray, memoryview], offset: int = 0) -> Tuple[DetectionFrame, int]:
+    """
+    Decode one frame as zero-copy NumPy views.
+
+    Args:
+        buffer: Buffer holding one or more frames
+        offset: Byte offset of the frame
+
+    Returns:
+        Tuple of (frame, offset of the next frame)
+    """
+    if len(buffer) - offset < HEADER_SIZE:
+        raise ValueError("Truncated detection frame header")
+
+    magic, version, flags, camera_len, frame_size, timestamp, frame_id, n = HEADER.unpack_from(buffer, offset)
+    if magic != MAGIC:
+        raise ValueError("Not a detection frame (bad magic)")
+    if version != VERSION:
+        raise ValueError(f"Unsupported detection frame version: {version}")
+    if len(buffer) - offset < frame_size:
+        raise ValueError("Truncated detection frame")
+
+    pos = offset + HEADER_SIZE
+    camera_id = bytes(buffer[pos:pos + camera_len]).decode("utf-8")
+    pos += (camera_len + 7) & ~7
+
+    box_dtype = "<f4" if flags & FLAG_FLOAT_BOXES else "<i4"
+    boxes = np.frombuffer(buffer, dtype=box_dtype, count=n * 4, offset=pos).reshape(n, 4)
+    pos += n * 16
+    track_ids = np.frombuffer(buffer, dtype="<i4", count=n, offset=pos)
+    pos += n * 4
+    confidences = np.frombuffer(buffer, dtype="<f4", count=n, offset=pos)
+    pos += n * 4
+    class_ids = np.frombuffer(buffer, dtype="<i2", count=n, offset=pos)
+
+    frame = DetectionFrame(camera_id, timestamp, frame_id, boxes, track_ids, class_ids, confidences)
+    return frame, offset + frame_size
+
+
+def iter_frames(buffer: Union[bytes, bytearray, memoryview]) -> Iterator[DetectionFrame]:
+    """Decode a buffer of back-to-back frames."""
+    offset = 0
+    while offset < len(buffer):
+        frame, offset = decode_frame(buffer, offset)
+        yield frame
+
+
+def encode_json(frame: DetectionFrame) -> str:
+    """JSON fallback for debugging."""
+    return json.dumps(frame.to_json())
+
+
+def decode_json(text: Union[str, bytes]) -> DetectionFrame:
+    """Parse a JSON frame (YOLO service JSON response shape) into a DetectionFrame."""
+    data = json.loads(text)
+    detections = data.get("detections", [])
+
+    def _track_id(det: Dict[str, Any]) -> int:
+        tid = det.get("track_id", det.get("id"))
+        return -1 if tid is None else tid
+
+    boxes = np.array([d["bbox"] for d in detections]).reshape(-1, 4)
+    boxes = boxes.astype("<i4" if np.issubdtype(boxes.dtype, np.integer) or not len(boxes) else "<f4")
+
+    return DetectionFrame(
+        camera_id=data.get("camera_id", "default"),
+        timestamp=float(data.get("timestamp", 0.0)),
+        frame_id=int(data.get("frame_id", 0)),
+        boxes=boxes,
+        track_ids=np.array([_track_id(d) for d in detections], dtype="<i4"),
+        class_ids=np.array([d.get("class_id", 0) for d in detections], dtype="<i2"),
+        confidences=np.array([d.get("confidence", 1.0) for d in detections], dtype="<f4")
+    )
+
+
+def decode_any(payload: Union[str, bytes], content_type: Optional[str] = None) -> DetectionFrame:
+    """Decode a binary frame, or JSON when the payload doesn't carry the frame magic."""
+    if content_type == MEDIA_TYPE or (isinstance(payload, (bytes, bytearray)) and payload[:4] == MAGIC):
+        return decode_frame(payload)[0]
+    return decode_json(payload)
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(0)
+    n = 20
+    xy = rng.integers(0, 600, size=(n, 2))
+    boxes = np.hstack([xy, xy + 40]).astype(np.int32)
+
+    payload = encode_frame("cam0", time.time(), boxes,
+                           track_ids=np.arange(n), confidences=rng.random(n), frame_id=42)
+    frame, _ = decode_frame(payload)
+    as_json = encode_json(frame)
+
+    print(f"✓ Binary frame: {len(payload)} bytes, JSON: {len(as_json)} bytes for {n} detections")
+    print(f"✓ Round trip boxes equal: {np.array_equal(frame.boxes, boxes)}")
+    print(f"✓ JSON fallback round trip: {np.array_equal(decode_json(as_json).boxes, boxes)}")
+
+    iterations = 20000
+    start = time.perf_counter()
+    for _ in range(iterations):
+        decode_frame(payload)
+    binary_us = (time.perf_counter() - start) / iterations * 1e6
+    start = time.perf_counter()
+    for _ in range(iterations):
+        json.loads(as_json)
+    json_us = (time.perf_counter() - start) / iterations * 1e6
+    print(f"✓ Decode per frame: binary {binary_us:.1f}µs, JSON {json_us:.1f}µs")
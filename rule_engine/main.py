@@ -1,18 +1,22 @@
 from core.zone_checker import ZoneChecker
 from core.rule_evaluator import RuleEvaluator
 from core.cooldown_manager import CooldownManager
+from core.temporal_rules import TemporalRuleEngine
 
 def main():
     # Initialize components
     zone_checker = ZoneChecker("config/zones.json")
     rule_eval = RuleEvaluator(confidence_threshold=0.8)
     cooldown = CooldownManager(cooldown_seconds=60)
+    temporal = TemporalRuleEngine.from_config("config/zones.json")
 
     # Mock input (from detection/action modules)
     bbox = [120, 100, 200, 260]
     action = "climbing"
     confidence = 0.92
     person_detected = True
+    camera_id = "cam0"
+    track_id = 1
 
     # Zone detection
     zone = zone_checker.get_zone(bbox)
@@ -35,5 +39,10 @@ def main():
     else:
         print("✅ NO ALERT")
 
+    # Temporal rules (dwell, transitions, occupancy) per tracked person
+    for event in temporal.update(camera_id, track_id, zone_checker.get_zone_name(bbox)):
+        if cooldown.is_allowed(f"{event['rule_id']}_{event['track_id']}"):
+            print("🚨 TEMPORAL ALERT:", event["reason"])
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,254 @@
+"""
+Rule Pipeline Module
+Runs zone lookup → rule evaluation → temporal rules → cooldown → alert formatting
+for one frame of detections. Shared by the service, sharded workers and replay tools.
+
+Sampled frames carry a trace (io/tracing.py) that times each of these stages; the
+pipeline's tracer aggregates finished traces into a latency report.
+"""
+
+import os
+import sys
+import time
+import logging
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+from datetime import datetime
+
+import numpy as np
+
+from core.zone_checker import ZoneChecker
+from core.rule_evaluator import RuleEvaluator
+from core.cooldown_manager import CooldownManager
+from core.temporal_rules import TemporalRuleEngine
+
+# rule_engine/io shares its name with the stdlib io module, so its modules
+# are imported from their directory rather than as a package.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "io"))
+from alert_formatter import AlertFormatter  # noqa: E402
+from tracing import Tracer, NULL_TRACE  # noqa: E402
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "feedback"))
+from threshold_service import ThresholdSnapshotReader  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "zones.json")
+
+
+def group_frames(
+    events: List[Dict[str, Any]]
+) -> Iterator[Tuple[str, Optional[float], List[Dict[str, Any]], Optional[int], Optional[Dict[str, Any]]]]:
+    """
+    Group detection events by (camera, frame).
+
+    Events are either single detections carrying `camera_id`, `frame_id` and/or
+    `timestamp`, or whole frames with a `detections` list (YOLO service output).
+    A `received_ns` stamp (time.monotonic_ns() at ingest) and an upstream `trace`
+    (TraceContext.to_dict()) are carried per group.
+
+    Yields:
+        Tuples of (camera_id, timestamp, detections, received_ns, trace)
+    """
+    frames: Dict[Any, List[Dict[str, Any]]] = {}
+    frame_times: Dict[Any, Optional[float]] = {}
+    received: Dict[Any, Optional[int]] = {}
+    traces: Dict[Any, Optional[Dict[str, Any]]] = {}
+
+    for event in events:
+        camera_id = event.get("camera_id", "default")
+        timestamp = event.get("timestamp")
+
+        if "detections" in event:
+            key = (camera_id, event.get("frame_id", timestamp), id(event))
+            frames[key] = event["detections"]
+        else:
+            key = (camera_id, event.get("frame_id", timestamp))
+            frames.setdefault(key, []).append(event)
+        frame_times[key] = timestamp
+        if key not in received:
+            received[key] = event.get("received_ns")
+            traces[key] = event.get("trace")
+
+    for key, detections in frames.items():
+        yield key[0], frame_times[key], detections, received[key], traces[key]
+
+
+def _public(det: Dict[str, Any]) -> Dict[str, Any]:
+    """Detection fields without the internal ingest stamp and trace."""
+    return {k: v for k, v in det.items() if k != "received_ns" and k != "trace"}
+
+
+class RulePipeline:
+    """Evaluates detection frames and returns formatted alerts."""
+
+    def __init__(
+        self,
+        zone_config_path: str = DEFAULT_CONFIG,
+        confidence_threshold: float = 0.8,
+        cooldown_seconds: float = 60,
+        track_timeout: float = 5.0,
+        worker_id: Optional[int] = None,
+        trace_sample_rate: float = 0.01,
+        thresholds_path: Optional[str] = None
+    ):
+        self.zone_checker = ZoneChecker(zone_config_path)
+        # Feedback-adapted per-zone/per-rule thresholds, reloaded when republished
+        thresholds = ThresholdSnapshotReader(thresholds_path) if thresholds_path else None
+        self.rule_eval = RuleEvaluator(confidence_threshold=confidence_threshold, thresholds=thresholds)
+        self.cooldown = CooldownManager(cooldown_seconds=cooldown_seconds)
+        self.temporal = TemporalRuleEngine.from_config(zone_config_path, track_timeout=track_timeout)
+        self.formatter = AlertFormatter(worker_id=worker_id)
+        self.tracer = Tracer(sample_rate=trace_sample_rate, worker_id=worker_id)
+
+    def start_trace(self, upstream: Optional[Dict[str, Any]] = None, received_ns: Optional[int] = None):
+        """
+        Trace for a frame arriving at ingest.
+
+        Continues a trace started upstream (e.g. at capture in the YOLO service),
+        closing its "transport" stage at received_ns; otherwise samples a new trace
+        starting at received_ns. Returns NULL_TRACE for unsampled frames.
+        """
+        trace = self.tracer.resume(upstream, received_ns)
+        if upstream and received_ns is not None:
+            trace.mark("transport", received_ns)
+        return trace
+
+    def process_frame(
+        self,
+        camera_id: str,
+        timestamp: Optional[float],
+        detections: List[Dict[str, Any]],
+        received_ns: Optional[int] = None,
+        trace=NULL_TRACE
+    ) -> List[Dict[str, Any]]:
+        """
+        Evaluate all detections of one camera frame.
+
+        Args:
+            camera_id: Camera identifier
+            timestamp: Frame time in seconds (None = now)
+            detections: Dicts with `bbox` and optional `track_id`/`id`, `action`, `confidence`
+            received_ns: time.monotonic_ns() when the frame was ingested (None = now)
+            trace: Trace from start_trace(); the caller finishes it
+
+        Returns:
+            List of formatted alerts
+        """
+        alerts = []
+        received_at = None
+        if received_ns is None:
+            received_ns = time.monotonic_ns()
+        trace.mark("queue")
+
+        for det in detections:
+            zone = self.zone_checker.get_zone_info(det["bbox"])
+            trace.mark("zone_lookup")
+            zone_type = zone["type"] if zone else "none"
+            zone_name = zone["name"] if zone else "none"
+            action = det.get("action")
+            confidence = det.get("confidence", 0.0)
+            track_id = det.get("track_id", det.get("id"))
+
+            if action is not None:
+                alert, reason = self.rule_eval.evaluate(
+                    person_detected=True,
+                    action=action,
+                    zone=zone_type,
+                    confidence=confidence,
+                    zone_id=zone_name
+                )
+                trace.mark("rule_eval")
+                allowed = alert and self.cooldown.is_allowed(f"{camera_id}_{zone_name}_{action}")
+                trace.mark("cooldown")
+                if allowed:
+                    received_at = received_at or datetime.utcnow().isoformat() + "Z"
+                    alerts.append(self.formatter.format_alert(
+                        zone_id=zone_name,
+                        severity="HIGH",
+                        reason=reason,
+                        original_data={"camera_id": camera_id, "timestamp": timestamp, **_public(det)},
+                        rule_results={"suspicious_action": True},
+                        received_at=received_at,
+                        evaluated_rules=["suspicious_action"],
+                        received_monotonic_ns=received_ns,
+                        trace=trace
+                    ))
+
+            if track_id is None:
+                continue
+
+            events = self.temporal.update(camera_id, track_id, zone_name, timestamp)
+            trace.mark("temporal")
+            received_at = self._temporal_alerts(alerts, events, camera_id, timestamp, det, received_at, received_ns, trace)
+
+        return alerts
+
+    def process_detection_frame(
+        self,
+        frame: Any,
+        received_ns: Optional[int] = None,
+        trace=NULL_TRACE
+    ) -> List[Dict[str, Any]]:
+        """
+        Evaluate a decoded binary frame (wire_format.DetectionFrame) on its arrays.
+
+        Zones are looked up for all boxes in one vectorised pass and detection
+        dicts are only built for detections that raise an alert. Binary frames
+        carry no action, so only temporal rules apply (to tracked detections),
+        exactly as process_frame does for the same detections.
+
+        Returns:
+            List of formatted alerts
+        """
+        alerts = []
+        received_at = None
+        if received_ns is None:
+            received_ns = time.monotonic_ns()
+        trace.mark("queue")
+
+        camera_id, timestamp = frame.camera_id, frame.timestamp
+        zone_names = [zone["name"] for zone in self.zone_checker.zones] + ["none"]
+        zone_index = self.zone_checker.get_zone_indices(frame.boxes)
+        trace.mark("zone_lookup")
+
+        track_ids = frame.track_ids.tolist()
+        for i in np.flatnonzero(frame.track_ids >= 0).tolist():
+            events = self.temporal.update(camera_id, track_ids[i], zone_names[zone_index[i]], timestamp)
+            trace.mark("temporal")
+            if events:
+                received_at = self._temporal_alerts(
+                    alerts, events, camera_id, timestamp, frame.detection(i), received_at, received_ns, trace
+                )
+
+        return alerts
+
+    def _temporal_alerts(
+        self,
+        alerts: List[Dict[str, Any]],
+        events: List[Dict[str, Any]],
+        camera_id: str,
+        timestamp: Optional[float],
+        det: Dict[str, Any],
+        received_at: Optional[str],
+        received_ns: int,
+        trace
+    ) -> Optional[str]:
+        """Append alerts for temporal rule events that pass cooldown; returns received_at."""
+        for event in events:
+            allowed = self.cooldown.is_allowed(f"{camera_id}_{event['rule_id']}_{event['track_id']}")
+            trace.mark("cooldown")
+            if not allowed:
+                continue
+            received_at = received_at or datetime.utcnow().isoformat() + "Z"
+            alerts.append(self.formatter.format_alert(
+                zone_id=event["zone"],
+                severity="MEDIUM",
+                reason=event["reason"],
+                original_data={"camera_id": camera_id, "timestamp": timestamp, **_public(det)},
+                rule_results={event["rule_id"]: True},
+                received_at=received_at,
+                evaluated_rules=[event["rule_id"]],
+                received_monotonic_ns=received_ns,
+                trace=trace
+            ))
+        return received_at
@@ -0,0 +1,474 @@
+"""
+Rule Engine Service Module
+Long-running asyncio service that consumes detection events from local sources,
+groups them by camera/frame, runs the rule pipeline and emits alerts.
+
+Detection events are JSON objects, either one per detection:
+    {"camera_id": "cam0", "frame_id": 12, "timestamp": 1738060200.1,
+     "track_id": 3, "bbox": [x1, y1, x2, y2], "action": "climbing", "confidence": 0.92}
+or one per frame, as returned by the YOLO service:
+    {"camera_id": "cam0", "timestamp": 1738060200.1, "detections": [{...}, ...]}
+BinarySocketSource accepts the packed frame format from io/wire_format.py instead;
+those frames are queued as {"frame": DetectionFrame} and evaluated on their arrays.
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import logging
+import argparse
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+from pipeline import RulePipeline, DEFAULT_CONFIG, group_frames
+from core.incident_aggregator import IncidentAggregator
+
+# rule_engine/io shadows the stdlib io module, so it is imported from its directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "io"))
+from wire_format import HEADER_SIZE, peek_frame_size, decode_frame  # noqa: E402
+from alert_formatter import AlertStreamWriter  # noqa: E402
+from alert_dispatcher import AlertDispatcher, FileSink, WebhookSink, UnixSocketSink  # noqa: E402
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs"))
+from logging_system import AlertLogger  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_line(line) -> Optional[Dict[str, Any]]:
+    """Decode one NDJSON line, returning None for blank or invalid lines."""
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        event = json.loads(line)
+    except ValueError:
+        logger.warning(f"Dropping invalid detection line: {line[:80]!r}")
+        return None
+    return event if isinstance(event, dict) else None
+
+
+class QueueSource:
+    """In-process source: producers put detection dicts on `self.queue`."""
+
+    def __init__(self, maxsize: int = 10000):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._in_flight: Optional[Dict[str, Any]] = None
+
+    async def run(self, service: "RuleEngineService") -> None:
+        while True:
+            self._in_flight = await self.queue.get()
+            await service.submit(self._in_flight)
+            self._in_flight = None
+
+    async def drain(self, service: "RuleEngineService") -> None:
+        """Hand everything still queued to the service (after run() is cancelled)."""
+        if self._in_flight is not None:
+            # Cancelled while waiting for room in the service queue
+            await service.submit(self._in_flight)
+            self._in_flight = None
+        while not self.queue.empty():
+            await service.submit(self.queue.get_nowait())
+
+
+class NDJSONTailSource:
+    """Follows an NDJSON file, reopening it when it is rotated or truncated."""
+
+    def __init__(self, path: str, poll_interval: float = 0.2, from_start: bool = False):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.from_start = from_start
+
+    async def run(self, service: "RuleEngineService") -> None:
+        f = None
+        inode = None
+        try:
+            while True:
+                if f is None:
+                    if not os.path.exists(self.path):
+                        await asyncio.sleep(self.poll_interval)
+                        continue
+                    f = open(self.path, "rb")
+                    inode = os.fstat(f.fileno()).st_ino
+                    if not self.from_start:
+                        f.seek(0, os.SEEK_END)
+                    # Follow-up opens (after rotation) always read the new file fully
+                    self.from_start = True
+
+                lines = f.readlines(1 << 20)
+                if lines and not lines[-1].endswith(b"\n"):
+                    # Partial line still being written; re-read it next time
+                    f.seek(-len(lines.pop()), os.SEEK_CUR)
+
+                for line in lines:
+                    event = _parse_line(line)
+                    if event is not None:
+                        await service.submit(event)
+
+                if not lines:
+                    try:
+                        st = os.stat(self.path)
+                        if st.st_ino != inode or st.st_size < f.tell():
+                            f.close()
+                            f = None
+                            continue
+                    except FileNotFoundError:
+                        pass
+                    await asyncio.sleep(self.poll_interval)
+        finally:
+            if f is not None:
+                f.close()
+
+
+class UnixSocketSource:
+    """Accepts NDJSON detection streams on a Unix domain socket."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    async def run(self, service: "RuleEngineService") -> None:
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            try:
+                # Awaiting submit() stops reading from the socket when the
+                # service queue is full, which pushes back on the producer.
+                async for line in reader:
+                    event = _parse_line(line)
+                    if event is not None:
+                        await service.submit(event)
+            finally:
+                writer.close()
+
+        server = await asyncio.start_unix_server(handle, path=self.path)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+
+class BinarySocketSource:
+    """Accepts back-to-back binary detection frames (wire_format) on a Unix socket."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    async def run(self, service: "RuleEngineService") -> None:
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            try:
+                while True:
+                    try:
+                        header = await reader.readexactly(HEADER_SIZE)
+                        body = await reader.readexactly(peek_frame_size(header) - HEADER_SIZE)
+                    except asyncio.IncompleteReadError:
+                        break
+                    frame, _ = decode_frame(header + body)
+                    await service.submit({"frame": frame})
+            except ValueError as e:
+                logger.warning(f"Closing binary detection stream: {e}")
+            finally:
+                writer.close()
+
+        server = await asyncio.start_unix_server(handle, path=self.path)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+
+class RuleEngineService:
+    """Bounded-queue detection consumer driving a RulePipeline."""
+
+    def __init__(
+        self,
+        pipeline: RulePipeline,
+        sources: List[Any],
+        emit: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        queue_size: int = 10000,
+        batch_size: int = 1024,
+        incidents: Optional[IncidentAggregator] = None,
+        alert_logger: Optional[AlertLogger] = None
+    ):
+        """
+        Args:
+            pipeline: Rule pipeline evaluating frames
+            sources: Objects with an async `run(service)` method
+            emit: Alert callback (sync or async), e.g. AlertDispatcher.dispatch;
+                  defaults to NDJSON on stdout
+            queue_size: Maximum buffered detection events
+            batch_size: Maximum events processed per loop iteration
+            incidents: Coalesce alerts into incidents and emit open/update/close
+                       events instead of individual alerts
+            alert_logger: Record every alert in the alert history; sampled
+                          frames time this as their "logging" stage
+        """
+        self.pipeline = pipeline
+        self.sources = sources
+        self._writer = None if emit else AlertStreamWriter(sys.stdout)
+        self.emit = emit or self._writer.write
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.incidents = incidents
+        self.alert_logger = alert_logger
+        self.stats = {"events": 0, "frames": 0, "alerts": 0, "errors": 0}
+        # Incident clock: latest frame timestamp seen and the monotonic time it was seen at
+        self._frame_time: Optional[float] = None
+        self._frame_seen = 0.0
+        self._stopping: Optional[asyncio.Event] = None
+
+    async def submit(self, event: Dict[str, Any]) -> None:
+        """Enqueue a detection event, waiting while the queue is full."""
+        # Stamped before waiting so processing time includes queueing
+        event.setdefault("received_ns", time.monotonic_ns())
+        await self.queue.put(event)
+
+    def stop(self) -> None:
+        """Request shutdown; queued events are drained before run() returns."""
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def run(self) -> Dict[str, int]:
+        self._stopping = asyncio.Event()
+        source_tasks = [asyncio.create_task(source.run(self)) for source in self.sources]
+        worker = asyncio.create_task(self._process())
+
+        await self._stopping.wait()
+        logger.info("Stopping sources and draining queue")
+
+        for task in source_tasks:
+            task.cancel()
+        await asyncio.gather(*source_tasks, return_exceptions=True)
+
+        # Sources that buffer events themselves (QueueSource) hand them over
+        for source in self.sources:
+            drain = getattr(source, "drain", None)
+            if drain is not None:
+                await drain(self)
+
+        await self.queue.put(None)
+        await worker
+        logger.info(f"Rule engine stopped: {self.stats}")
+        logger.info(f"Stage latency: {json.dumps(self.pipeline.tracer.report.summary())}")
+        return self.stats
+
+    async def _process(self) -> None:
+        while True:
+            if self.incidents is None:
+                first = await self.queue.get()
+            else:
+                try:
+                    # Wake up while idle so quiet incidents still close on time
+                    first = await asyncio.wait_for(self.queue.get(), self.incidents.window_seconds / 2)
+                except asyncio.TimeoutError:
+                    await self._emit_all(self.incidents.expire(now=self._incident_now()))
+                    self._flush_writer(idle=True)
+                    continue
+
+            batch = [first]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            done = batch[-1] is None
+            if done:
+                batch.pop()
+
+            alerts, traces = self._evaluate(batch)
+            self.stats["alerts"] += len(alerts)
+
+            if self.incidents is None:
+                await self._emit_all(alerts)
+            else:
+                for alert in alerts:
+                    await self._emit_all(self.incidents.add(alert, now=self._incident_now(alert)))
+                if done:
+                    await self._emit_all(self.incidents.close_all())
+
+            # Buffer output under load; flush as soon as the queue goes idle
+            self._flush_writer(idle=done or self.queue.empty())
+
+            for trace in traces:
+                trace.mark("emit")
+                self.pipeline.tracer.finish(trace)
+
+            if done:
+                return
+
+            # Let producers refill the queue between batches
+            await asyncio.sleep(0)
+
+    def _saw_frame(self, timestamp: Any) -> None:
+        if isinstance(timestamp, (int, float)) and (self._frame_time is None or timestamp >= self._frame_time):
+            self._frame_time = timestamp
+            self._frame_seen = time.monotonic()
+
+    def _incident_now(self, alert: Optional[Dict[str, Any]] = None) -> float:
+        """
+        Incident time on the frames' clock, so replayed or non-wall-clock
+        timestamps age incidents correctly: an alert's own frame timestamp, or
+        the latest frame timestamp plus the monotonic time elapsed since.
+        """
+        if alert is not None:
+            frame_time = (alert.get("data") or {}).get("timestamp")
+            if isinstance(frame_time, (int, float)):
+                return frame_time
+        if self._frame_time is None:
+            return time.time()
+        return self._frame_time + (time.monotonic() - self._frame_seen)
+
+    async def _emit_all(self, items: List[Dict[str, Any]]) -> None:
+        if asyncio.iscoroutinefunction(self.emit):
+            for item in items:
+                await self.emit(item)
+        else:
+            for item in items:
+                self.emit(item)
+
+    def _flush_writer(self, idle: bool) -> None:
+        if self._writer is None:
+            return
+        if idle:
+            self._writer.flush()
+        else:
+            self._writer.maybe_flush()
+
+    def _log(self, alerts: List[Dict[str, Any]], trace: Any) -> List[Dict[str, Any]]:
+        """Hand a frame's alerts to the alert logger (an enqueue) under its trace."""
+        if self.alert_logger is not None:
+            for alert in alerts:
+                self.alert_logger.log_alert(alert, trace)
+        return alerts
+
+    def _evaluate(self, batch: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Any]]:
+        """Group events by (camera, frame) and run the pipeline per group.
+
+        Returns:
+            Tuple of (alerts, sampled traces still open for the emit stage)
+        """
+        alerts = []
+        traces = []
+        events = []
+        for event in batch:
+            frame = event.get("frame")
+            if frame is None:
+                events.append(event)
+                continue
+            # Binary frames skip per-detection dicts (see RulePipeline.process_detection_frame)
+            self._saw_frame(frame.timestamp)
+            self.stats["frames"] += 1
+            self.stats["events"] += len(frame)
+            trace = self.pipeline.start_trace(None, event.get("received_ns"))
+            if trace.sampled:
+                traces.append(trace)
+            try:
+                alerts.extend(self._log(self.pipeline.process_detection_frame(frame, event.get("received_ns"), trace), trace))
+            except (KeyError, TypeError, ValueError, IndexError) as e:
+                self.stats["errors"] += 1
+                logger.error(f"Failed to evaluate frame ({frame.camera_id}, {frame.timestamp}): {e}")
+
+        for camera_id, timestamp, detections, received_ns, upstream in group_frames(events):
+            self._saw_frame(timestamp)
+            self.stats["frames"] += 1
+            self.stats["events"] += len(detections)
+            trace = self.pipeline.start_trace(upstream, received_ns)
+            if trace.sampled:
+                traces.append(trace)
+            try:
+                alerts.extend(self._log(self.pipeline.process_frame(camera_id, timestamp, detections, received_ns, trace), trace))
+            except (KeyError, TypeError, ValueError, IndexError) as e:
+                self.stats["errors"] += 1
+                logger.error(f"Failed to evaluate frame ({camera_id}, {timestamp}): {e}")
+
+        return alerts, traces
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    sources: List[Any] = []
+    if args.socket:
+        sources.append(UnixSocketSource(args.socket))
+    if args.binary_socket:
+        sources.append(BinarySocketSource(args.binary_socket))
+    if args.tail:
+        sources.append(NDJSONTailSource(args.tail, from_start=args.from_start))
+
+    sinks = []
+    if args.alerts_file:
+        sinks.append(FileSink(args.alerts_file))
+    if args.webhook:
+        sinks.append(WebhookSink(args.webhook))
+    if args.alerts_socket:
+        sinks.append(UnixSocketSink(args.alerts_socket))
+
+    dispatcher = AlertDispatcher(sinks, spill_dir=args.spill_dir) if sinks else None
+    if dispatcher is not None:
+        await dispatcher.start()
+
+    # Incidents replace cooldown suppression, so they see every alerting frame
+    incidents = IncidentAggregator(window_seconds=args.incident_window) if args.incident_window else None
+    cooldown = args.cooldown if args.cooldown is not None else (0 if incidents else 60)
+
+    alert_logger = AlertLogger(args.logs_dir) if args.logs_dir else None
+    service = RuleEngineService(
+        RulePipeline(
+            args.config,
+            cooldown_seconds=cooldown,
+            trace_sample_rate=args.trace_sample_rate,
+            thresholds_path=args.thresholds
+        ),
+        sources,
+        emit=dispatcher.dispatch if dispatcher else None,
+        queue_size=args.queue_size,
+        incidents=incidents,
+        alert_logger=alert_logger
+    )
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, service.stop)
+
+    await service.run()
+
+    if alert_logger is not None:
+        alert_logger.close()
+
+    if dispatcher is not None:
+        await dispatcher.stop()
+        logger.info(f"Alert dispatcher stopped: {dispatcher.get_stats()}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Rule engine detection-stream service")
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="Zone/rule config (zones.json)")
+    parser.add_argument("--socket", help="Unix socket path to accept NDJSON detections on")
+    parser.add_argument("--binary-socket", help="Unix socket path to accept binary detection frames on")
+    parser.add_argument("--tail", help="NDJSON detection file to follow")
+    parser.add_argument("--from-start", action="store_true", help="Read the tailed file from the beginning")
+    parser.add_argument("--alerts-file", help="Deliver alerts to this NDJSON file")
+    parser.add_argument("--webhook", help="Deliver alert batches to this HTTP endpoint")
+    parser.add_argument("--alerts-socket", help="Deliver alerts to this Unix socket")
+    parser.add_argument("--logs-dir", help="Record alerts in the alert history here (logs/logging_system.py)")
+    parser.add_argument("--spill-dir", default="./logs/spill", help="Spill queue for unavailable sinks")
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--cooldown", type=float, help="Alert cooldown seconds (default 60, or 0 with incidents)")
+    parser.add_argument("--incident-window", type=float, help="Coalesce alerts into incidents closing after this idle gap")
+    parser.add_argument("--trace-sample-rate", type=float, default=0.01,
+                        help="Fraction of frames traced per stage (0 disables tracing)")
+    parser.add_argument("--thresholds", help="Feedback-adapted threshold snapshot (threshold_service.py); "
+                                             "new versions are picked up while running")
+    args = parser.parse_args()
+
+    if not (args.socket or args.binary_socket or args.tail):
+        parser.error("at least one of --socket, --binary-socket or --tail is required")
+
+    asyncio.run(_serve(args))
@@ -0,0 +1,294 @@
+"""
+Sharded Rule Engine Module
+Supervisor that runs N rule-pipeline worker processes, routes detection events to
+workers by a stable hash of camera ID and aggregates their alerts into one stream.
+
+Each camera is owned by exactly one worker, so its track and cooldown state stays
+local to that process. Ownership uses rendezvous hashing: when a worker is retired
+only the cameras it owned move, every other camera keeps its worker.
+"""
+
+import time
+import hashlib
+import queue
+import logging
+import multiprocessing as mp
+from typing import Dict, Any, List, Optional, Iterator
+
+from pipeline import RulePipeline, group_frames
+
+logger = logging.getLogger(__name__)
+
+
+def _worker_main(
+    slot: int,
+    in_queue: "mp.Queue",
+    out_queue: "mp.Queue",
+    pipeline_kwargs: Dict[str, Any]
+) -> None:
+    """Worker loop: evaluate event batches until a None sentinel arrives."""
+    # Slot doubles as the snowflake worker ID so alert IDs never collide across workers
+    pipeline = RulePipeline(**{"worker_id": slot, **pipeline_kwargs})
+
+    while True:
+        batch = in_queue.get()
+        if batch is None:
+            break
+
+        alerts = []
+        for camera_id, timestamp, detections, received_ns, upstream in group_frames(batch):
+            # CLOCK_MONOTONIC is system-wide, so the supervisor's stamp is valid here
+            trace = pipeline.start_trace(upstream, received_ns)
+            try:
+                alerts.extend(pipeline.process_frame(camera_id, timestamp, detections, received_ns, trace))
+            except (KeyError, TypeError, ValueError, IndexError) as e:
+                logger.error(f"Worker {slot} failed on frame ({camera_id}, {timestamp}): {e}")
+            pipeline.tracer.finish(trace)
+
+        if alerts:
+            out_queue.put(alerts)
+
+    logger.info(f"Worker {slot} stage latency: {pipeline.tracer.report.summary()}")
+    out_queue.put(slot)
+
+
+def _rendezvous_weight(camera_id: str, slot: int) -> int:
+    # crc32 is too linear here: similar camera IDs would all pick the same slot
+    digest = hashlib.blake2b(f"{camera_id}:{slot}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+class ShardedRuleEngine:
+    """Routes detections to rule-engine worker processes partitioned by camera."""
+
+    def __init__(
+        self,
+        num_workers: int = None,
+        pipeline_kwargs: Optional[Dict[str, Any]] = None,
+        queue_size: int = 256,
+        batch_size: int = 512,
+        max_restarts: int = 3
+    ):
+        """
+        Args:
+            num_workers: Worker processes (defaults to CPU count)
+            pipeline_kwargs: Keyword arguments for each worker's RulePipeline
+            queue_size: Maximum pending batches per worker
+            batch_size: Events buffered per worker before sending
+            max_restarts: Restarts per slot before its cameras are rebalanced away
+        """
+        self.num_workers = num_workers or mp.cpu_count()
+        self.pipeline_kwargs = pipeline_kwargs or {}
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.max_restarts = max_restarts
+
+        self.out_queue: "mp.Queue" = mp.Queue()
+        self.workers: Dict[int, mp.Process] = {}
+        self.in_queues: Dict[int, "mp.Queue"] = {}
+        self.restarts: Dict[int, int] = {}
+        self.live_slots: List[int] = []
+        self.pending: Dict[int, List[Dict[str, Any]]] = {}
+        self._owners: Dict[str, int] = {}
+        self.stats = {"events": 0, "batches": 0, "restarts": 0, "rebalances": 0, "resubmitted": 0}
+
+    def start(self) -> None:
+        for slot in range(self.num_workers):
+            self._spawn(slot)
+            self.restarts[slot] = 0
+        self.live_slots = list(range(self.num_workers))
+
+    def _spawn(self, slot: int) -> None:
+        in_queue = mp.Queue(maxsize=self.queue_size)
+        process = mp.Process(
+            target=_worker_main,
+            args=(slot, in_queue, self.out_queue, self.pipeline_kwargs),
+            name=f"rule-engine-{slot}",
+            daemon=True
+        )
+        process.start()
+        self.in_queues[slot] = in_queue
+        self.workers[slot] = process
+        self.pending.setdefault(slot, [])
+
+    def owner(self, camera_id: str) -> int:
+        """Worker slot owning a camera."""
+        slot = self._owners.get(camera_id)
+        if slot is None:
+            slot = max(self.live_slots, key=lambda s: _rendezvous_weight(camera_id, s))
+            self._owners[camera_id] = slot
+        return slot
+
+    def submit(self, event: Dict[str, Any]) -> None:
+        """Route one detection event (or whole frame) to its camera's worker."""
+        slot = self.owner(event.get("camera_id", "default"))
+        event.setdefault("received_ns", time.monotonic_ns())
+        pending = self.pending[slot]
+        pending.append(event)
+        self.stats["events"] += 1
+        if len(pending) >= self.batch_size:
+            self._send(slot)
+
+    def flush(self) -> None:
+        """Send all buffered events to their workers."""
+        for slot in list(self.live_slots):
+            if self.pending[slot]:
+                self._send(slot)
+
+    def _send(self, slot: int) -> None:
+        batch, self.pending[slot] = self.pending[slot], []
+
+        while True:
+            if not self.workers[slot].is_alive():
+                # Hand the batch back; check_workers resubmits it in order
+                self.pending[slot] = batch + self.pending[slot]
+                self.check_workers()
+                return
+
+            try:
+                # Blocks while the worker is behind, pushing back on the caller
+                self.in_queues[slot].put(batch, timeout=0.5)
+                self.stats["batches"] += 1
+                return
+            except queue.Full:
+                continue
+
+    def _salvage(self, slot: int) -> List[Dict[str, Any]]:
+        """
+        Events a dead worker never took: batches left in its queue, then its pending buffer.
+
+        The batch the worker was evaluating when it died cannot be recovered.
+        """
+        old_queue = self.in_queues[slot]
+        stranded = []
+        # Read the pipe directly: an idle worker dies holding the queue's read lock,
+        # and nothing else reads this queue any more
+        reader = old_queue._reader
+        try:
+            while reader.poll(0.1):
+                batch = reader.recv()
+                if batch is not None:
+                    stranded.extend(batch)
+        except Exception as e:
+            # The worker may have died part-way through reading a batch
+            logger.warning(f"Worker {slot} queue unreadable after crash: {e}")
+        old_queue.close()
+        old_queue.cancel_join_thread()
+        stranded.extend(self.pending.pop(slot, []))
+        return stranded
+
+    def check_workers(self) -> List[int]:
+        """
+        Restart dead workers, retiring slots that exceed max_restarts.
+
+        Events still queued to a dead worker are resubmitted, to its replacement
+        or to the cameras' new owners if the slot is retired.
+
+        Returns:
+            Slots that were found dead
+        """
+        dead = [s for s in self.live_slots if not self.workers[s].is_alive()]
+
+        for slot in dead:
+            logger.warning(f"Worker {slot} died (exit code {self.workers[slot].exitcode})")
+            stranded = self._salvage(slot)
+            if self.restarts[slot] < self.max_restarts:
+                # A fresh queue: the old one may be left locked by the dead process
+                self.restarts[slot] += 1
+                self.stats["restarts"] += 1
+                self._spawn(slot)
+            elif len(self.live_slots) > 1:
+                self.live_slots.remove(slot)
+                self._owners = {c: s for c, s in self._owners.items() if s != slot}
+                self.stats["rebalances"] += 1
+                logger.warning(f"Worker {slot} retired; rebalancing its cameras")
+            else:
+                raise RuntimeError("All rule-engine workers have failed")
+
+            self.stats["resubmitted"] += len(stranded)
+            for event in stranded:
+                self.stats["events"] -= 1
+                self.submit(event)
+
+        return dead
+
+    def iter_alerts(self, timeout: float = 0.0) -> Iterator[Dict[str, Any]]:
+        """Yield alerts aggregated from all workers until none arrive within timeout."""
+        while True:
+            try:
+                item = self.out_queue.get(timeout=timeout) if timeout else self.out_queue.get_nowait()
+            except queue.Empty:
+                return
+            if isinstance(item, list):
+                yield from item
+
+    def stop(self, timeout: float = 10.0) -> List[Dict[str, Any]]:
+        """
+        Flush pending events, stop workers after they drain, and collect remaining alerts.
+
+        Returns:
+            Alerts produced while draining
+        """
+        # Restart or retire dead workers first: their queues never drain
+        self.check_workers()
+        self.flush()
+        deadline = time.monotonic() + timeout
+        for slot in self.live_slots:
+            while self.workers[slot].is_alive():
+                try:
+                    self.in_queues[slot].put(None, timeout=max(0.01, min(0.5, deadline - time.monotonic())))
+                    break
+                except queue.Full:
+                    if time.monotonic() >= deadline:
+                        break
+
+        alerts = []
+        remaining = set(self.live_slots)
+        while remaining and time.monotonic() < deadline:
+            try:
+                item = self.out_queue.get(timeout=0.2)
+            except queue.Empty:
+                remaining = {s for s in remaining if self.workers[s].is_alive()}
+                continue
+            if isinstance(item, list):
+                alerts.extend(item)
+            else:
+                remaining.discard(item)
+
+        for process in self.workers.values():
+            process.join(timeout=1.0)
+            if process.is_alive():
+                process.terminate()
+
+        return alerts
+
+
+if __name__ == "__main__":
+    import random
+
+    logging.basicConfig(level=logging.WARNING)
+
+    engine = ShardedRuleEngine(num_workers=4)
+    engine.start()
+
+    n_events = 200000
+    start = time.perf_counter()
+    alert_count = 0
+    for i in range(n_events):
+        x, y = random.randint(0, 600), random.randint(0, 440)
+        engine.submit({
+            "camera_id": f"cam{i % 16}",
+            "frame_id": i // 64,
+            "timestamp": i / 640,
+            "track_id": i % 4,
+            "bbox": [x, y, x + 40, y + 40],
+            "action": "climbing",
+            "confidence": 0.9
+        })
+        if i % 10000 == 0:
+            alert_count += sum(1 for _ in engine.iter_alerts())
+
+    alert_count += len(engine.stop())
+    elapsed = time.perf_counter() - start
+    print(f"✓ {n_events} events in {elapsed:.2f}s ({n_events / elapsed:,.0f}/s), {alert_count} alerts")
+    print(f"✓ Stats: {engine.stats}")
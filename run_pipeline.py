@@ -4,6 +4,8 @@ Processes video frames and runs YOLO detection on clean frames
 """
 import cv2
 import os
+import json
+import gzip
 from ultralytics import YOLO
 import glob
 
@@ -23,6 +25,7 @@ if not cap.isOpened():
     print("ERROR: Video source not opened")
     exit()
 
+fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
 frame_id = 0
 saved = 0
 while True:
@@ -103,6 +106,10 @@ if len(frame_files) == 0:
     motion_frames_dir = "data_preparation/clean_frames"
     frame_files = sorted(glob.glob(os.path.join(motion_frames_dir, "*.jpg")))
 
+# Detections are also recorded for rule_engine/replay.py (gzip'd NDJSON, one frame per line)
+recording_path = os.path.join(output_dir, "detections.ndjson.gz")
+recording = gzip.open(recording_path, "wt", encoding="utf-8")
+
 detection_count = 0
 for frame_path in frame_files:
     frame = cv2.imread(frame_path)
@@ -118,14 +125,29 @@ for frame_path in frame_files:
     output_path = os.path.join(output_dir, f"detected_{filename}")
     cv2.imwrite(output_path, annotated_frame)
     
+    # Record detections with the source frame time (frame_XXXXX = saved index)
+    saved_index = int(os.path.splitext(filename)[0].split("_")[-1])
+    boxes = results[0].boxes
+    recording.write(json.dumps({
+        "camera_id": video_source,
+        "timestamp": saved_index * frame_skip / fps,
+        "detections": [
+            {"bbox": [int(v) for v in xyxy], "class_id": int(cls), "confidence": round(float(conf), 3)}
+            for xyxy, cls, conf in zip(boxes.xyxy, boxes.cls, boxes.conf)
+        ]
+    }, separators=(",", ":")) + "\n")
+
     # Count detections
     if len(results[0].boxes) > 0:
         detection_count += 1
         print(f"  {filename}: {len(results[0].boxes)} objects detected")
 
+recording.close()
+
 print(f"\n✓ Processed {len(frame_files)} frames")
 print(f"✓ Frames with detections: {detection_count}")
 print(f"✓ Results saved to: {output_dir}")
+print(f"✓ Detections recorded to: {recording_path}")
 
 print("\n" + "=" * 60)
 print("PIPELINE COMPLETE")
@@ -0,0 +1,436 @@
+"""
+X3D Evaluation Module - ISHTA (Action Recognition)
+Evaluates an action model on a UCF-style dataset and writes a JSON report.
+
+* The backbone runs once per evaluation clip. Pooled features are cached
+  under `<feature cache>/<model checksum + sampling>/`, keyed by clip ID, so
+  re-running with the same model or sweeping thresholds needs no backbone.
+* Clips without cached features are spread over a process pool. Work is split
+  by video, so each video is decoded by one process.
+* The head runs on all features in one call. The confusion matrix,
+  per-class precision/recall/F1, top-k accuracy and the confidence-threshold
+  sweep are computed with vectorised NumPy.
+* `--baseline` adds the deltas against an earlier report, for comparing
+  model versions.
+
+Usage:
+    python evaluate_x3d.py /data/ucf_eval --output report.json --model stub --workers 4
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ucf_dataset import UCFClipDataset, to_model_input  # noqa: E402
+from inference_x3d import StubActionModel, X3DModel, softmax  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLDS = [round(t, 2) for t in np.arange(0.0, 1.0, 0.05)]
+
+
+def build_model(spec: Dict[str, Any], threads: Optional[int] = None) -> Any:
+    """
+    Build a model from a picklable spec (so pool workers can build their own).
+
+    Args:
+        spec: {"type": "stub" | "x3d", "class_names": [...], plus "seed" (stub)
+              or "checkpoint" / "model_name" (x3d; the checkpoint must be
+              fine-tuned on class_names)}
+        threads: torch threads for X3D
+
+    Returns:
+        Model with features/head/class_names/checksum
+    """
+    if spec["type"] == "stub":
+        return StubActionModel(class_names=spec["class_names"], seed=spec.get("seed", 0))
+    if spec["type"] == "x3d":
+        return X3DModel(
+            spec["class_names"],
+            checkpoint=spec.get("checkpoint"),
+            model_name=spec.get("model_name", "x3d_s"),
+            threads=threads
+        )
+    raise ValueError(f"Unknown model type: {spec['type']}")
+
+
+class FeatureCache:
+    """
+    Pooled clip features for one model checksum and sampling setup.
+
+    Features are stored as append-only `part-*.npz` files (clip IDs +
+    float32 matrix) in the namespace directory, loaded into memory on open.
+    """
+
+    def __init__(self, cache_dir: str, namespace: str):
+        self.path = os.path.join(cache_dir, namespace)
+        os.makedirs(self.path, exist_ok=True)
+        self.features: Dict[str, np.ndarray] = {}
+        self._parts = 0
+        for name in sorted(os.listdir(self.path)):
+            if not (name.startswith("part-") and name.endswith(".npz")):
+                continue
+            try:
+                with np.load(os.path.join(self.path, name)) as part:
+                    self.features.update(zip(part["clip_ids"].tolist(), part["features"]))
+                self._parts += 1
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Skipping unreadable feature part {name}: {e}")
+
+    def __contains__(self, clip_id: str) -> bool:
+        return clip_id in self.features
+
+    def add(self, clip_ids: List[str], features: np.ndarray) -> None:
+        """Store features for clip_ids (one new part file, written atomically)."""
+        features = np.asarray(features, dtype=np.float32)
+        name = f"part-{time.time_ns()}-{os.getpid()}-{self._parts}.npz"
+        tmp_path = os.path.join(self.path, name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, clip_ids=np.array(clip_ids), features=features)
+        os.replace(tmp_path, os.path.join(self.path, name))
+        self._parts += 1
+        self.features.update(zip(clip_ids, features))
+
+    def matrix(self, clip_ids: List[str]) -> np.ndarray:
+        return np.stack([self.features[clip_id] for clip_id in clip_ids])
+
+
+def clip_ids(dataset: UCFClipDataset) -> List[str]:
+    """
+    Stable evaluation clip IDs (`<class>/<video>@<size>:<mtime>#<window>`), known before decoding.
+
+    File size and mtime come from the manifest, so a video replaced under the
+    same name gets new IDs instead of its predecessor's cached features.
+    """
+    return [
+        f"{video['clip_id']}@{video['size']}:{video['mtime']}#{window}"
+        for video in dataset.videos
+        for window in range(dataset.windows_per_video)
+    ]
+
+
+def cache_namespace(checksum: str, dataset: UCFClipDataset) -> str:
+    """Cache directory name: model checksum plus everything that changes a clip."""
+    height, width = dataset.cache.size
+    return (
+        f"{checksum}-f{dataset.frames_per_clip}s{dataset.stride}"
+        f"-{height}x{width}-w{dataset.windows_per_video}"
+    ).replace(os.sep, "_")
+
+
+def classification_metrics(
+    labels: np.ndarray,
+    probs: np.ndarray,
+    class_names: Sequence[str],
+    thresholds: Sequence[float] = DEFAULT_THRESHOLDS,
+    top_k: int = 5
+) -> Dict[str, Any]:
+    """
+    Confusion matrix, per-class precision/recall/F1, top-k accuracy and a
+    confidence-threshold sweep.
+
+    Args:
+        labels: (N,) true class indices
+        probs: (N, C) class probabilities
+        class_names: C class names
+        thresholds: Confidence thresholds to sweep
+        top_k: k for top-k accuracy (capped at C)
+
+    Returns:
+        Metrics dictionary
+    """
+    num_classes = len(class_names)
+    preds = probs.argmax(axis=1)
+    confusion = np.bincount(labels * num_classes + preds, minlength=num_classes ** 2).reshape(num_classes, num_classes)
+
+    tp = np.diag(confusion).astype(np.float64)
+    predicted = confusion.sum(axis=0)
+    support = confusion.sum(axis=1)
+    precision = np.divide(tp, predicted, out=np.zeros_like(tp), where=predicted > 0)
+    recall = np.divide(tp, support, out=np.zeros_like(tp), where=support > 0)
+    denom = precision + recall
+    f1 = np.divide(2 * precision * recall, denom, out=np.zeros_like(tp), where=denom > 0)
+    present = support > 0
+
+    k = min(top_k, num_classes)
+    top = np.argpartition(-probs, k - 1, axis=1)[:, :k]
+    top_k_accuracy = float((top == labels[:, None]).any(axis=1).mean()) if len(labels) else 0.0
+
+    confidence = probs.max(axis=1)
+    correct = preds == labels
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    kept = confidence[None, :] >= thresholds[:, None]            # (T, N)
+    kept_count = kept.sum(axis=1)
+    kept_correct = (kept & correct[None, :]).sum(axis=1)
+    n = max(len(labels), 1)
+
+    return {
+        "clips": int(len(labels)),
+        "accuracy": round(float(correct.mean()) if len(labels) else 0.0, 4),
+        f"top{k}_accuracy": round(top_k_accuracy, 4),
+        "macro_precision": round(float(precision[present].mean()) if present.any() else 0.0, 4),
+        "macro_recall": round(float(recall[present].mean()) if present.any() else 0.0, 4),
+        "macro_f1": round(float(f1[present].mean()) if present.any() else 0.0, 4),
+        "per_class": {
+            name: {
+                "precision": round(float(precision[i]), 4),
+                "recall": round(float(recall[i]), 4),
+                "f1": round(float(f1[i]), 4),
+                "support": int(support[i])
+            }
+            for i, name in enumerate(class_names)
+        },
+        "confusion_matrix": {"labels": list(class_names), "matrix": confusion.tolist()},
+        "threshold_sweep": [
+            {
+                "threshold": round(float(t), 4),
+                "coverage": round(float(kept_count[i] / n), 4),
+                "accuracy": round(float(kept_correct[i] / kept_count[i]), 4) if kept_count[i] else None
+            }
+            for i, t in enumerate(thresholds)
+        ]
+    }
+
+
+def compare_reports(report: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """Metric deltas of report against baseline (positive = report is better)."""
+    metrics, base = report["metrics"], baseline["metrics"]
+    deltas = {
+        key: round(metrics[key] - base[key], 4)
+        for key in ("accuracy", "macro_precision", "macro_recall", "macro_f1")
+        if key in base
+    }
+    per_class = {
+        name: round(stats["recall"] - base["per_class"][name]["recall"], 4)
+        for name, stats in metrics["per_class"].items()
+        if name in base.get("per_class", {})
+    }
+    base_speed = baseline.get("throughput", {}).get("backbone_clips_per_sec")
+    speed = report["throughput"].get("backbone_clips_per_sec")
+    return {
+        "baseline_model": baseline.get("model", {}).get("checksum"),
+        "metric_deltas": deltas,
+        "recall_deltas": per_class,
+        "backbone_speedup": round(speed / base_speed, 3) if speed and base_speed else None
+    }
+
+
+# Per-process state of pool workers
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(root: str, dataset_kwargs: Dict[str, Any], spec: Dict[str, Any], threads: Optional[int]) -> None:
+    _worker["dataset"] = UCFClipDataset(root, train=False, **dataset_kwargs)
+    _worker["model"] = build_model(spec, threads)
+
+
+def _extract(indices: List[int], batch_size: int, dataset=None, model=None) -> Tuple[List[int], np.ndarray, float]:
+    """Backbone features for dataset indices (in a pool worker unless dataset/model are given)."""
+    dataset = dataset or _worker["dataset"]
+    model = model or _worker["model"]
+    start = time.perf_counter()
+    features = []
+    for i in range(0, len(indices), batch_size):
+        clips = np.stack([dataset[index][0] for index in indices[i:i + batch_size]])
+        features.append(model.features(to_model_input(clips)))
+    return indices, np.concatenate(features), time.perf_counter() - start
+
+
+def _chunks(indices: List[int], per_video: int, videos_per_chunk: int) -> List[List[int]]:
+    """Split indices into chunks that never split one video across workers."""
+    chunks: List[List[int]] = []
+    current: List[int] = []
+    videos = 0
+    last_video = None
+    for index in indices:
+        video = index // per_video
+        if video != last_video:
+            if videos == videos_per_chunk:
+                chunks.append(current)
+                current, videos = [], 0
+            videos += 1
+            last_video = video
+        current.append(index)
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def evaluate(
+    root: str,
+    model_spec: Dict[str, Any],
+    feature_cache_dir: Optional[str] = None,
+    workers: int = 0,
+    batch_size: int = 8,
+    videos_per_chunk: int = 4,
+    thresholds: Sequence[float] = DEFAULT_THRESHOLDS,
+    **dataset_kwargs: Any
+) -> Dict[str, Any]:
+    """
+    Evaluate a model on a UCF-style dataset.
+
+    Args:
+        root: Dataset root with one sub-folder per class
+        model_spec: Model spec for build_model (class_names default to the dataset's)
+        feature_cache_dir: Feature cache (default `<root>/.feature_cache`)
+        workers: Most backbone worker processes (0 = run in this process);
+                 the pool is only started when more than one chunk is missing
+        batch_size: Clips per backbone call
+        videos_per_chunk: Videos per work item sent to a worker
+        thresholds: Confidence thresholds to sweep
+        **dataset_kwargs: UCFClipDataset options (frames_per_clip, stride,
+                          size, windows_per_video, split_file, cache_dir)
+
+    Returns:
+        Report dictionary
+    """
+    total_start = time.perf_counter()
+    dataset = UCFClipDataset(root, train=False, **dataset_kwargs)
+    model_spec = {"class_names": dataset.classes, **model_spec}
+    model = build_model(model_spec)
+    ids = clip_ids(dataset)
+    labels = np.repeat([video["label"] for video in dataset.videos], dataset.windows_per_video).astype(np.int64)
+    cache = FeatureCache(feature_cache_dir or os.path.join(root, ".feature_cache"), cache_namespace(model.checksum, dataset))
+
+    missing = [index for index, clip_id in enumerate(ids) if clip_id not in cache]
+    logger.info(f"{len(ids)} clips, {len(ids) - len(missing)} with cached features, {len(missing)} to extract")
+
+    backbone_start = time.perf_counter()
+    worker_seconds = 0.0
+    chunks = _chunks(missing, dataset.windows_per_video, videos_per_chunk)
+    # Each pool worker loads its own model: not worth it for one chunk or a cached re-run
+    workers = min(workers, len(chunks))
+    if workers > 1:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        import multiprocessing
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(root, dataset_kwargs, model_spec, threads)
+        ) as pool:
+            futures = [pool.submit(_extract, chunk, batch_size) for chunk in chunks]
+            for future in as_completed(futures):
+                indices, features, seconds = future.result()
+                cache.add([ids[index] for index in indices], features)
+                worker_seconds += seconds
+    else:
+        for chunk in chunks:
+            indices, features, seconds = _extract(chunk, batch_size, dataset, model)
+            cache.add([ids[index] for index in indices], features)
+            worker_seconds += seconds
+    backbone_seconds = time.perf_counter() - backbone_start
+
+    head_start = time.perf_counter()
+    probs = softmax(np.asarray(model.head(cache.matrix(ids)), dtype=np.float64))
+    head_seconds = time.perf_counter() - head_start
+
+    metrics = classification_metrics(labels, probs, dataset.classes, thresholds)
+    total_seconds = time.perf_counter() - total_start
+    return {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "dataset": {
+            "root": os.path.abspath(root),
+            "videos": len(dataset.videos),
+            "classes": dataset.classes,
+            "frames_per_clip": dataset.frames_per_clip,
+            "stride": dataset.stride,
+            "size": list(dataset.cache.size),
+            "windows_per_video": dataset.windows_per_video
+        },
+        "model": {
+            "type": model_spec["type"],
+            "checksum": model.checksum,
+            **{k: v for k, v in model_spec.items() if k not in ("type", "class_names")}
+        },
+        "features": {
+            "cache": cache.path,
+            "cached": len(ids) - len(missing),
+            "extracted": len(missing)
+        },
+        "throughput": {
+            "workers": workers,
+            "backbone_seconds": round(backbone_seconds, 3),
+            "backbone_worker_seconds": round(worker_seconds, 3),
+            "backbone_clips_per_sec": round(len(missing) / backbone_seconds, 2) if missing and backbone_seconds > 0 else None,
+            "head_seconds": round(head_seconds, 4),
+            "total_seconds": round(total_seconds, 3),
+            "clips_per_sec": round(len(ids) / total_seconds, 2) if total_seconds > 0 else None
+        },
+        "metrics": metrics
+    }
+
+
+def write_report(report: Dict[str, Any], output_file: str) -> None:
+    """Write a report atomically."""
+    tmp_path = f"{output_file}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, output_file)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Evaluate an action model on a UCF-style dataset")
+    parser.add_argument("root", help="Dataset root with one sub-folder per class")
+    parser.add_argument("--output", default="x3d_eval_report.json")
+    parser.add_argument("--model", choices=["stub", "x3d"], default="x3d")
+    parser.add_argument("--checkpoint", help="X3D state dict fine-tuned on the dataset's classes (required for x3d)")
+    parser.add_argument("--model-name", default="x3d_s")
+    parser.add_argument("--seed", type=int, default=0, help="Stub model seed")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Backbone worker processes (0 = in-process); capped by the chunks to extract")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--frames-per-clip", type=int, default=16)
+    parser.add_argument("--stride", type=int, default=5)
+    parser.add_argument("--size", type=int, default=160)
+    parser.add_argument("--windows-per-video", type=int, default=1)
+    parser.add_argument("--split-file", help="Restrict to the `<class>/<video>` entries listed")
+    parser.add_argument("--feature-cache", help="Feature cache directory (default <root>/.feature_cache)")
+    parser.add_argument("--thresholds", help="Comma-separated confidence thresholds to sweep")
+    parser.add_argument("--baseline", help="Earlier report to compare against")
+    args = parser.parse_args()
+
+    if args.model == "x3d" and not args.checkpoint:
+        parser.error("--model x3d needs --checkpoint: the pretrained head predicts Kinetics-400 classes")
+    if args.model == "stub":
+        spec = {"type": "stub", "seed": args.seed}
+    else:
+        spec = {"type": "x3d", "checkpoint": args.checkpoint, "model_name": args.model_name}
+    thresholds = [float(t) for t in args.thresholds.split(",")] if args.thresholds else DEFAULT_THRESHOLDS
+
+    report = evaluate(
+        args.root,
+        spec,
+        feature_cache_dir=args.feature_cache,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        thresholds=thresholds,
+        frames_per_clip=args.frames_per_clip,
+        stride=args.stride,
+        size=(args.size, args.size),
+        windows_per_video=args.windows_per_video,
+        split_file=args.split_file
+    )
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            report["comparison"] = compare_reports(report, json.load(f))
+    write_report(report, args.output)
+
+    metrics, speed = report["metrics"], report["throughput"]
+    print(f"✓ {metrics['clips']} clips: accuracy {metrics['accuracy']}, macro F1 {metrics['macro_f1']}")
+    print(f"✓ {report['features']['extracted']} extracted, {report['features']['cached']} cached, "
+          f"{speed['clips_per_sec']} clips/s overall")
+    print(f"✓ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
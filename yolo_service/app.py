@@ -1,35 +1,89 @@
-from fastapi import FastAPI
+import os
+import sys
+import time
+
+from fastapi import FastAPI, Response
 from ultralytics import YOLO
 import cv2
 
+# Shared detection wire format lives with the rule engine's I/O modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "rule_engine", "io"))
+from wire_format import encode_frame, MEDIA_TYPE  # noqa: E402
+from tracing import Tracer  # noqa: E402
+
 app = FastAPI(title="YOLO Detection Service")
 
 model = YOLO("yolov10n.pt")
+PERSON_CLASS = 0  # COCO "person"; the rule engine treats every detection as a person
+frame_counter = 0
+tracer = Tracer(sample_rate=float(os.environ.get("TRACE_SAMPLE_RATE", "0.01")))
 
 @app.get("/")
 def health():
     return {"status": "YOLO service running"}
 
 @app.post("/detect")
-def detect():
+def detect(camera_id: str = "cam0", format: str = "json"):
+    global frame_counter
+
+    # Trace starts at capture; the rule engine continues it from the JSON response
+    trace = tracer.start()
     cap = cv2.VideoCapture(0)
     ret, frame = cap.read()
+    timestamp = time.time()
     cap.release()
+    frame_counter += 1
+    trace.mark("capture")
 
     results = model.track(
         frame,
         persist=True
     )
+    trace.mark("detection")
+
+    if format == "binary":
+        # Packed arrays straight from the tracker tensors, no per-box Python objects.
+        # Same selection as the JSON path: tracked person boxes only.
+        boxes = results[0].boxes
+        if boxes.id is not None:
+            keep = (boxes.cls == PERSON_CLASS).cpu().numpy()
+            xyxy = boxes.xyxy.cpu().numpy()[keep].astype("int32")
+            track_ids = boxes.id.cpu().numpy()[keep]
+            class_ids = boxes.cls.cpu().numpy()[keep]
+            confidences = boxes.conf.cpu().numpy()[keep]
+        else:
+            xyxy = track_ids = class_ids = confidences = []
+        payload = encode_frame(
+            camera_id,
+            timestamp,
+            xyxy,
+            track_ids=track_ids,
+            class_ids=class_ids,
+            confidences=confidences,
+            frame_id=frame_counter
+        )
+        return Response(content=payload, media_type=MEDIA_TYPE)
 
     detections = []
     for r in results:
         if r.boxes.id is None:
             continue
-        for box, tid in zip(r.boxes.xyxy, r.boxes.id):
+        for box, tid, cls in zip(r.boxes.xyxy, r.boxes.id, r.boxes.cls):
+            if int(cls) != PERSON_CLASS:
+                continue
             x1, y1, x2, y2 = map(int, box)
             detections.append({
                 "id": int(tid),
                 "bbox": [x1, y1, x2, y2]
             })
 
-    return {"detections": detections}
+    # Track IDs + frame time let the rule engine keep per-track temporal state
+    response = {
+        "camera_id": camera_id,
+        "timestamp": timestamp,
+        "frame_id": frame_counter,
+        "detections": detections
+    }
+    if trace.sampled:
+        response["trace"] = trace.to_dict()
+    return response